@@ -1,125 +1,109 @@
+from datetime import datetime
 from typing import Dict, Any, List
 from crewai import Agent
+from config.settings import settings
 from tools.supabase_tool import SupabaseTool
-from utils.logger import logger
+from utils.logger import get_logger
+from utils.metrics import instrument_stage
+from utils.error_handlers import KnowledgeBaseError
+from utils.document import analyze_email
+from utils.knowledge_chunks import knowledge_index
+from utils.memo_cache import response_memo, knowledge_key
+
+logger = get_logger(__name__)
 
 class KnowledgeRetrieverAgent(Agent):
     def __init__(self):
-            super().__init__(
-                        role='Knowledge Base Specialist',
-                                    goal='Find relevant information from the knowledge base to assist with responses',
-                                                backstory='You specialize in quickly finding the most relevant information to answer customer inquiries.',
-                                                            tools=[SupabaseTool()],
-                                                                        verbose=True
-                                                                                )
-                                                                                    
-                                                                                        def retrieve_knowledge(self, email_data: Dict[str, Any], categorization: Dict[str, Any]) -> Dict[str, Any]:
-                                                                                                """Retrieve relevant knowledge based on email content and categorization"""
-                                                                                                        try:
-                                                                                                                    logger.info("Retrieving knowledge", email_id=email_data['id'])
-                                                                                                                                
-                                                                                                                                            # Build search query from email content
-                                                                                                                                                        search_query = self._build_search_query(email_data, categorization)
-                                                                                                                                                                    
-                                                                                                                                                                                # Search knowledge base
-                                                                                                                                                                                            supabase_tool = SupabaseTool()
-                                                                                                                                                                                                        knowledge_results = supabase_tool._run("search_knowledge", query=search_query, limit=5)
-                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                # Process and rank results
-                                                                                                                                                                                                                                            processed_knowledge = self._process_knowledge_results(knowledge_results, email_data)
-                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                    knowledge_result = {
-                                                                                                                                                                                                                                                                                    'email_id': email_data['id'],
-                                                                                                                                                                                                                                                                                                    'search_query': search_query,
-                                                                                                                                                                                                                                                                                                                    'knowledge_found': len(processed_knowledge) > 0,
-                                                                                                                                                                                                                                                                                                                                    'knowledge_items': processed_knowledge,
-                                                                                                                                                                                                                                                                                                                                                    'retrieved_at': datetime.utcnow().isoformat()
-                                                                                                                                                                                                                                                                                                                                                                }
-                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                        # Update database with knowledge retrieval results
-                                                                                                                                                                                                                                                                                                                                                                                                    supabase_tool._run("update_email",
-                                                                                                                                                                                                                                                                                                                                                                                                                                  email_id=email_data['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                update_data={
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  'knowledge_retrieved': knowledge_result['knowledge_found'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'knowledge_items': processed_knowledge
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  })
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          logger.info("Knowledge retrieval completed",
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                 email_id=email_data['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        items_found=len(processed_knowledge))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                return knowledge_result
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    except Exception as e:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                logger.error("Failed to retrieve knowledge",
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        email_id=email_data['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                error=str(e))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            raise KnowledgeBaseError(f"Failed to retrieve knowledge: {e}")
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    def _build_search_query(self, email_data: Dict[str, Any], categorization: Dict[str, Any]) -> str:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            """Build search query from email content and categorization"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    # Extract key terms from email
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            subject = email_data['subject']
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    body = email_data['body']
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            category = categorization['category']
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            # Simple keyword extraction (in production, use NLP)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    key_terms = []
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    # Add category-specific terms
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            if category == "Sales":
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        key_terms.extend(["pricing", "services", "solutions", "demo"])
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                elif category == "Customer Service":
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            key_terms.extend(["support", "troubleshooting", "help", "issue"])
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            # Extract nouns and important terms from subject and body
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    # This is a simplified approach
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            words = (subject + " " + body).split()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    important_words = [word for word in words if len(word) > 4 and word.isalpha()]
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    # Combine terms
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            search_terms = key_terms + important_words[:10]  # Limit to avoid overly broad searches
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            return " ".join(search_terms)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    def _process_knowledge_results(self, knowledge_results: List[Dict[str, Any]], email_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            """Process and rank knowledge base results"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    processed_items = []
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    for item in knowledge_results:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                # Calculate relevance score (simplified)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            relevance_score = self._calculate_relevance(item, email_data)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    processed_item = {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'id': item.get('id'),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'title': item.get('title', ''),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'content': item.get('content', ''),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'category': item.get('category', ''),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'relevance_score': relevance_score,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'source': item.get('source', '')
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                }
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        processed_items.append(processed_item)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        # Sort by relevance score
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                processed_items.sort(key=lambda x: x['relevance_score'], reverse=True)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                return processed_items
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        def _calculate_relevance(self, knowledge_item: Dict[str, Any], email_data: Dict[str, Any]) -> float:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                """Calculate relevance score for knowledge item"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        # Simple relevance calculation based on keyword overlap
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                email_text = (email_data['subject'] + " " + email_data['body']).lower()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        knowledge_text = (knowledge_item.get('title', '') + " " + knowledge_item.get('content', '')).lower()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        email_words = set(email_text.split())
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                knowledge_words = set(knowledge_text.split())
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                # Calculate Jaccard similarity
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        intersection = email_words.intersection(knowledge_words)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                union = email_words.union(knowledge_words)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                if len(union) == 0:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            return 0.0
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            return len(intersection) / len(union)
\ No newline at end of file
+        super().__init__(
+            role='Knowledge Base Specialist',
+            goal='Find relevant information from the knowledge base to assist with responses',
+            backstory='You specialize in quickly finding the most relevant information to answer customer inquiries.',
+            tools=[SupabaseTool()],
+            verbose=True
+        )
+
+    @instrument_stage("retrieve_knowledge")
+    def retrieve_knowledge(self, email_data: Dict[str, Any], categorization: Dict[str, Any],
+                           shared_knowledge: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Retrieve relevant knowledge based on email content and categorization"""
+        try:
+            logger.info("Retrieving knowledge", email_id=email_data['id'])
+
+            supabase_tool = SupabaseTool()
+
+            if shared_knowledge is not None:
+                # Near-duplicates of a cluster leader reuse its retrieval
+                cached = shared_knowledge
+            else:
+                # Identical content in the same category against the same knowledge base
+                # retrieves the same items
+                memo_key = knowledge_key(email_data, categorization['category'])
+                cached = response_memo.get('knowledge', memo_key)
+
+            if cached is not None:
+                search_query = cached['search_query']
+                processed_knowledge = cached['knowledge_items']
+            else:
+                # Build search query from email content
+                search_query = self._build_search_query(email_data, categorization)
+
+                # Best passages from the local chunk index, with their parent articles;
+                # the index follows the knowledge snapshot, so this never leaves the process
+                processed_knowledge = knowledge_index.search(search_query, limit=settings.knowledge_passages)
+
+                response_memo.put('knowledge', memo_key, {
+                    'search_query': search_query,
+                    'knowledge_items': processed_knowledge
+                })
+
+            knowledge_result = {
+                'email_id': email_data['id'],
+                'search_query': search_query,
+                'knowledge_found': len(processed_knowledge) > 0,
+                'knowledge_items': processed_knowledge,
+                'retrieved_at': datetime.utcnow().isoformat()
+            }
+
+            # Update database with knowledge retrieval results
+            supabase_tool._run("update_email",
+                              email_id=email_data['id'],
+                              update_data={
+                                  'knowledge_retrieved': knowledge_result['knowledge_found'],
+                                  'knowledge_items': processed_knowledge
+                              })
+
+            logger.info("Knowledge retrieval completed",
+                       email_id=email_data['id'],
+                       items_found=len(processed_knowledge))
+
+            return knowledge_result
+
+        except Exception as e:
+            logger.error("Failed to retrieve knowledge",
+                        email_id=email_data['id'],
+                        error=str(e))
+            raise KnowledgeBaseError(f"Failed to retrieve knowledge: {e}")
+
+    def _build_search_query(self, email_data: Dict[str, Any], categorization: Dict[str, Any]) -> str:
+        """Build search query from email content and categorization"""
+        # Extract key terms from email
+        analysis = analyze_email(email_data)
+        category = categorization['category']
+
+        # Simple keyword extraction (in production, use NLP)
+        key_terms = []
+
+        # Add category-specific terms
+        if category == "Sales":
+            key_terms.extend(["pricing", "services", "solutions", "demo"])
+        elif category == "Customer Service":
+            key_terms.extend(["support", "troubleshooting", "help", "issue"])
+
+        # Extract nouns and important terms from subject and body
+        # This is a simplified approach
+        important_words = [word for word in analysis.tokens if len(word) > 4 and word.isalpha()]
+
+        # Combine terms
+        search_terms = key_terms + important_words[:10]  # Limit to avoid overly broad searches
+
+        return " ".join(search_terms)
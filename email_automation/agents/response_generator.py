@@ -1,195 +1,302 @@
-from typing import Dict, Any, List
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from typing import Dict, Any, List, Optional
 from crewai import Agent
 from tools.gmail_tool import GmailTool
 from tools.hubspot_tool import HubSpotTool
 from tools.supabase_tool import SupabaseTool
 from tools.calendar_tool import CalendarTool
-from utils.logger import logger
+from utils.logger import get_logger
+from utils.metrics import instrument_stage
 from utils.security import SecurityManager
+from utils.error_handlers import EmailProcessingError
+from utils.context_assembler import context_assembler
+from utils.knowledge_chunks import assemble_snippets
+from utils.document import analyze_email
+from utils.busy_intervals import parse_time
+from utils.slot_proposals import slot_proposer
+from utils.llm_client import llm_client
+from utils.memo_cache import personalize, SENDER_PLACEHOLDER
+from utils.response_cache import llm_response_cache
+from config.settings import settings
+
+logger = get_logger(__name__)
+
+RESPONSE_INSTRUCTIONS = f"""You draft email replies for the Neswave team.
+Start the reply with "Hi {SENDER_PLACEHOLDER}," exactly as written; the name is filled in later.
+Answer the sender's questions using only the relevant knowledge provided, and do not promise anything it does not cover.
+Keep a professional, warm tone and sign off with "Best regards,\nAbdullah\nNeswave Team"."""
 
 class ResponseGeneratorAgent(Agent):
     def __init__(self):
-            super().__init__(
-                        role='Response Generation Expert',
-                                    goal='Create appropriate, human-like responses to customer emails',
-                                                backstory='You excel at crafting professional yet natural-sounding email responses that address customer needs.',
-                                                            tools=[GmailTool(), HubSpotTool(), SupabaseTool(), CalendarTool()],
-                                                                        verbose=True
-                                                                                )
-                                                                                    
-                                                                                        def generate_response(self, email_data: Dict[str, Any], categorization: Dict[str, Any], knowledge: Dict[str, Any]) -> Dict[str, Any]:
-                                                                                                """Generate appropriate response based on email content and context"""
-                                                                                                        try:
-                                                                                                                    logger.info("Generating response", email_id=email_data['id'])
-                                                                                                                                
-                                                                                                                                            # Determine response type based on category
-                                                                                                                                                        response_type = self._determine_response_type(categorization['category'])
-                                                                                                                                                                    
-                                                                                                                                                                                # Generate response content
-                                                                                                                                                                                            response_content = self._generate_response_content(
-                                                                                                                                                                                                            email_data, categorization, knowledge, response_type
-                                                                                                                                                                                                                        )
-                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                # Check if calendar action is needed
-                                                                                                                                                                                                                                                            calendar_action = None
-                                                                                                                                                                                                                                                                        if response_type == "scheduling":
-                                                                                                                                                                                                                                                                                        calendar_action = self._handle_scheduling_request(email_data, response_content)
-                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                response_result = {
-                                                                                                                                                                                                                                                                                                                                'email_id': email_data['id'],
-                                                                                                                                                                                                                                                                                                                                                'response_type': response_type,
-                                                                                                                                                                                                                                                                                                                                                                'response_content': response_content,
-                                                                                                                                                                                                                                                                                                                                                                                'calendar_action': calendar_action,
-                                                                                                                                                                                                                                                                                                                                                                                                'generated_at': datetime.utcnow().isoformat()
-                                                                                                                                                                                                                                                                                                                                                                                                            }
-                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                    # Update database with response
-                                                                                                                                                                                                                                                                                                                                                                                                                                                supabase_tool = SupabaseTool()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                            supabase_tool._run("update_email",
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          email_id=email_data['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        update_data={
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          'draft_response': response_content,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            'response_type': response_type,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              'calendar_action': calendar_action
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            })
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    logger.info("Response generated",
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                           email_id=email_data['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response_type=response_type)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          return response_result
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              except Exception as e:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          logger.error("Failed to generate response",
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  email_id=email_data['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          error=str(e))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      raise EmailProcessingError(f"Failed to generate response: {e}")
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              def _determine_response_type(self, category: str) -> str:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      """Determine the type of response needed"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              if category == "Sales":
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          return "sales_inquiry"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  elif category == "Customer Service":
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              return "support_response"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      else:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  return "general_response"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          def _generate_response_content(self, email_data: Dict[str, Any], categorization: Dict[str, Any], knowledge: Dict[str, Any], response_type: str) -> str:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  """Generate the actual response content"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          # Extract relevant information
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  subject = email_data['subject']
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          sender_name = self._extract_sender_name(email_data['from'])
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  email_body = email_data['body']
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  # Get knowledge items
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          knowledge_items = knowledge.get('knowledge_items', [])
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  knowledge_content = "\n\n".join([item['content'] for item in knowledge_items[:3]])
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  # Build response based on type
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          if response_type == "sales_inquiry":
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      return self._generate_sales_response(sender_name, email_body, knowledge_content)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              elif response_type == "support_response":
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          return self._generate_support_response(sender_name, email_body, knowledge_content)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  elif response_type == "scheduling":
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              return self._generate_scheduling_response(sender_name, email_body)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      else:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  return self._generate_general_response(sender_name, email_body)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          def _generate_sales_response(self, sender_name: str, email_body: str, knowledge_content: str) -> str:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  """Generate sales inquiry response"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response = f"Hi {sender_name},\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "Thank you for your interest in our services! "
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "I'd be happy to provide you with more information.\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          if knowledge_content:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      response += "Based on your inquiry, here's some relevant information:\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += knowledge_content
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              response += "\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              response += "I'd love to schedule a brief call to discuss your specific needs in more detail. "
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      response += "Would you be available for a 15-20 minute call sometime next week?\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              response += "Looking forward to hearing from you!\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      response += "Best regards,\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              response += "Abdullah\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      response += "Neswave Team"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      return response
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              def _generate_support_response(self, sender_name: str, email_body: str, knowledge_content: str) -> str:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      """Generate support response"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              response = f"Hi {sender_name},\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      response += "Thank you for reaching out to our support team. "
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              response += "I'm sorry to hear you're experiencing this issue.\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              if knowledge_content:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "Based on your description, here are some steps that might help:\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      response += knowledge_content
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "If the issue persists after trying these steps, please let me know "
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "and I'll be happy to investigate further. It would also be helpful "
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "if you could share any error messages or screenshots.\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "We're committed to resolving this for you as quickly as possible.\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "Best regards,\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "Abdullah\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "Neswave Support"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  return response
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          def _generate_scheduling_response(self, sender_name: str, email_body: str) -> str:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  """Generate scheduling response"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response = f"Hi {sender_name},\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "Thank you for your email! I'd be happy to schedule a call with you.\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "I've checked my calendar and have the following availability:\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "- [Date] at [Time]\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "- [Date] at [Time]\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "- [Date] at [Time]\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "Please let me know which of these times works best for you, or if you'd "
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "prefer to suggest alternative times.\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "Looking forward to speaking with you!\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "Best regards,\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "Abdullah\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "Neswave Team"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  return response
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          def _generate_general_response(self, sender_name: str, email_body: str) -> str:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  """Generate general response"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response = f"Hi {sender_name},\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "Thank you for your email! I've received your message and will "
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "get back to you as soon as possible.\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "If your matter is urgent, please don't hesitate to call our "
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "office directly at [phone number].\n\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "Best regards,\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          response += "Abdullah\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  response += "Neswave Team"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  return response
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          def _handle_scheduling_request(self, email_data: Dict[str, Any], response_content: str) -> Dict[str, Any]:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  """Handle scheduling requests and check calendar availability"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          # This is a simplified implementation
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  # In production, you'd parse the email for date/time preferences
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          # and check actual calendar availability
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          return {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      'action': 'check_availability',
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  'status': 'pending',
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              'message': 'Calendar availability check required'
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      }
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              def _extract_sender_name(self, from_header: str) -> str:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      """Extract sender name from From header"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              import re
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              # Try to extract name from "Name <email@domain.com>" format
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      match = re.match(r'(.+?)\s*<.+?>', from_header)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              if match:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          return match.group(1).strip()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          # If no name found, use email address
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                  email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', from_header)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                          if email_match:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      return email_match.group(0)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                              
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                      return "there"
\ No newline at end of file
+        super().__init__(
+            role='Response Generation Expert',
+            goal='Create appropriate, human-like responses to customer emails',
+            backstory='You excel at crafting professional yet natural-sounding email responses that address customer needs.',
+            tools=[GmailTool(), HubSpotTool(), SupabaseTool(), CalendarTool()],
+            verbose=True
+        )
+
+    @instrument_stage("generate_response")
+    def generate_response(self, email_data: Dict[str, Any], categorization: Dict[str, Any], knowledge: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate appropriate response based on email content and context"""
+        try:
+            logger.info("Generating response", email_id=email_data['id'])
+
+            # Determine response type based on category and meeting requests
+            response_type = self._determine_response_type(categorization['category'], email_data)
+
+            # Meeting requests are offered real free slots, allocated for the whole cycle when possible
+            slots = self._take_slots(email_data) if response_type == "scheduling" else None
+
+            # Generate response content
+            response_content = self._generate_response_content(
+                email_data, categorization, knowledge, response_type, slots
+            )
+
+            # Check if calendar action is needed
+            calendar_action = None
+            if response_type == "scheduling":
+                calendar_action = self._handle_scheduling_request(email_data, slots)
+
+            response_result = {
+                'email_id': email_data['id'],
+                'response_type': response_type,
+                'response_content': response_content,
+                'calendar_action': calendar_action,
+                'generated_at': datetime.utcnow().isoformat()
+            }
+
+            # Update database with response
+            supabase_tool = SupabaseTool()
+            supabase_tool._run("update_email",
+                              email_id=email_data['id'],
+                              update_data={
+                                  'draft_response': response_content,
+                                  'response_type': response_type,
+                                  'calendar_action': calendar_action
+                              })
+
+            logger.info("Response generated",
+                       email_id=email_data['id'],
+                       response_type=response_type)
+
+            return response_result
+
+        except Exception as e:
+            logger.error("Failed to generate response",
+                        email_id=email_data['id'],
+                        error=str(e))
+            raise EmailProcessingError(f"Failed to generate response: {e}")
+
+    @instrument_stage("allocate_slots")
+    def allocate_slots(self, emails: List[Dict[str, Any]], categorizations: List[Dict[str, Any]]) -> int:
+        """Allocate non-overlapping slot offers for every scheduling request among the emails; returns how many"""
+        request_ids = [
+            email_data['id'] for email_data, categorization in zip(emails, categorizations)
+            if self._determine_response_type(categorization['category'], email_data) == "scheduling"
+        ]
+        if request_ids:
+            self._calendar_tool()._run("propose_slots", request_ids=request_ids)
+        return len(request_ids)
+
+    def _calendar_tool(self) -> CalendarTool:
+        """The agent's own calendar tool, so batch and single-email allocations share one client"""
+        return next(tool for tool in self.tools if isinstance(tool, CalendarTool))
+
+    def _take_slots(self, email_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Slots allocated for this email by allocate_slots, or a single-email allocation"""
+        slots = slot_proposer.take(email_data['id'])
+        if slots is not None:
+            return slots
+        try:
+            self._calendar_tool()._run("propose_slots", request_ids=[email_data['id']])
+            return slot_proposer.take(email_data['id']) or []
+        except Exception as e:
+            logger.warning("Slot proposal failed, asking for the sender's availability",
+                          email_id=email_data['id'],
+                          error=str(e))
+            return []
+
+    def _determine_response_type(self, category: str, email_data: Dict[str, Any] = None) -> str:
+        """Determine the type of response needed"""
+        if email_data is not None and analyze_email(email_data).email_hits['scheduling']:
+            return "scheduling"
+        elif category == "Sales":
+            return "sales_inquiry"
+        elif category == "Customer Service":
+            return "support_response"
+        else:
+            return "general_response"
+
+    def _generate_response_content(self, email_data: Dict[str, Any], categorization: Dict[str, Any], knowledge: Dict[str, Any], response_type: str,
+                                   slots: List[Dict[str, str]] = None) -> str:
+        """Generate the actual response content"""
+        # Extract relevant information
+        subject = email_data['subject']
+        sender_name = self._extract_sender_name(email_data['from'])
+        email_body = email_data['body']
+
+        # Get knowledge items
+        knowledge_items = knowledge.get('knowledge_items', [])
+        knowledge_content = assemble_snippets(knowledge_items)
+
+        # Draft with the LLM when enabled; the templates below remain the fallback
+        if settings.llm_generation_enabled and response_type != "scheduling":
+            llm_response = self._generate_llm_response(email_data, categorization, knowledge_content, sender_name)
+            if llm_response:
+                return llm_response
+
+        # Build response based on type
+        if response_type == "sales_inquiry":
+            return self._generate_sales_response(sender_name, email_body, knowledge_content)
+        elif response_type == "support_response":
+            return self._generate_support_response(sender_name, email_body, knowledge_content)
+        elif response_type == "scheduling":
+            return self._generate_scheduling_response(sender_name, email_body, slots or [])
+        else:
+            return self._generate_general_response(sender_name, email_body)
+
+    def _generate_llm_response(self, email_data: Dict[str, Any], categorization: Dict[str, Any],
+                               knowledge_content: str, sender_name: str) -> Optional[str]:
+        """Draft a reply with the LLM, reusing cached drafts for identical or paraphrased emails"""
+        sections = context_assembler.assemble(email_data)
+        prompt = (
+            f"Category: {categorization['category']}\n"
+            f"Subject: {email_data['subject']}\n"
+            f"Email:\n{sections['body']}\n\n"
+            f"Previous thread:\n{sections['thread_summary']}\n\n"
+            f"Relevant knowledge:\n{knowledge_content or 'None'}"
+        )
+        query_text = email_data['subject'] + "\n" + email_data['body']
+
+        template = llm_response_cache.get('response', prompt, query_text, categorization['category'])
+        if template is None:
+            started = time.perf_counter()
+            try:
+                template, _ = llm_client.complete(
+                    [{'role': 'system', 'content': RESPONSE_INSTRUCTIONS}, {'role': 'user', 'content': prompt}],
+                    temperature=settings.temperature
+                )
+            except Exception as e:
+                logger.warning("LLM response generation failed, using template",
+                              email_id=email_data['id'],
+                              error=str(e))
+                return None
+            llm_response_cache.put('response', prompt, template, query_text, categorization['category'],
+                                   latency_seconds=time.perf_counter() - started)
+
+        return personalize(template, sender_name)
+
+    def _generate_sales_response(self, sender_name: str, email_body: str, knowledge_content: str) -> str:
+        """Generate sales inquiry response"""
+        response = f"Hi {sender_name},\n\n"
+        response += "Thank you for your interest in our services! "
+        response += "I'd be happy to provide you with more information.\n\n"
+
+        if knowledge_content:
+            response += "Based on your inquiry, here's some relevant information:\n"
+            response += knowledge_content
+            response += "\n\n"
+
+        response += "I'd love to schedule a brief call to discuss your specific needs in more detail. "
+        response += "Would you be available for a 15-20 minute call sometime next week?\n\n"
+        response += "Looking forward to hearing from you!\n\n"
+        response += "Best regards,\n"
+        response += "Abdullah\n"
+        response += "Neswave Team"
+
+        return response
+
+    def _generate_support_response(self, sender_name: str, email_body: str, knowledge_content: str) -> str:
+        """Generate support response"""
+        response = f"Hi {sender_name},\n\n"
+        response += "Thank you for reaching out to our support team. "
+        response += "I'm sorry to hear you're experiencing this issue.\n\n"
+
+        if knowledge_content:
+            response += "Based on your description, here are some steps that might help:\n"
+            response += knowledge_content
+            response += "\n\n"
+
+        response += "If the issue persists after trying these steps, please let me know "
+        response += "and I'll be happy to investigate further. It would also be helpful "
+        response += "if you could share any error messages or screenshots.\n\n"
+        response += "We're committed to resolving this for you as quickly as possible.\n\n"
+        response += "Best regards,\n"
+        response += "Abdullah\n"
+        response += "Neswave Support"
+
+        return response
+
+    def _generate_scheduling_response(self, sender_name: str, email_body: str, slots: List[Dict[str, str]]) -> str:
+        """Generate scheduling response"""
+        response = f"Hi {sender_name},\n\n"
+        response += "Thank you for your email! I'd be happy to schedule a call with you.\n\n"
+        if slots:
+            response += "I've checked my calendar and have the following availability:\n\n"
+            for slot in slots:
+                response += f"- {self._format_slot(slot)}\n"
+            response += "\nPlease let me know which of these times works best for you, or if you'd "
+            response += "prefer to suggest alternative times.\n\n"
+        else:
+            response += "Could you let me know a few times that work for you? "
+            response += "I'll confirm one as soon as possible.\n\n"
+        response += "Looking forward to speaking with you!\n\n"
+        response += "Best regards,\n"
+        response += "Abdullah\n"
+        response += "Neswave Team"
+
+        return response
+
+    def _generate_general_response(self, sender_name: str, email_body: str) -> str:
+        """Generate general response"""
+        response = f"Hi {sender_name},\n\n"
+        response += "Thank you for your email! I've received your message and will "
+        response += "get back to you as soon as possible.\n\n"
+        response += "If your matter is urgent, please don't hesitate to call our "
+        response += "office directly at [phone number].\n\n"
+        response += "Best regards,\n"
+        response += "Abdullah\n"
+        response += "Neswave Team"
+
+        return response
+
+    def _format_slot(self, slot: Dict[str, str]) -> str:
+        """Slot start in settings.timezone, e.g. 'Tuesday, October 20 at 10:00 AM (UTC)'"""
+        start = datetime.fromtimestamp(parse_time(slot['start']), ZoneInfo(settings.timezone))
+        hour = start.strftime('%I').lstrip('0')
+        return f"{start:%A, %B} {start.day} at {hour}:{start:%M %p} ({settings.timezone})"
+
+    def _handle_scheduling_request(self, email_data: Dict[str, Any], slots: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Calendar action recording the slots offered to the sender"""
+        if not slots:
+            return {
+                'action': 'request_availability',
+                'status': 'pending',
+                'message': 'No free slots found; asked the sender for their availability'
+            }
+
+        return {
+            'action': 'offer_slots',
+            'status': 'offered',
+            'slots': slots,
+            'message': f"Offered {len(slots)} slots, held for {settings.slot_offer_hold_hours:g} hours"
+        }
+
+    def _extract_sender_name(self, from_header: str) -> str:
+        """Extract sender name from From header"""
+        import re
+
+        # Try to extract name from "Name <email@domain.com>" format
+        match = re.match(r'(.+?)\s*<.+?>', from_header)
+        if match:
+            return match.group(1).strip()
+
+        # If no name found, use email address
+        email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', from_header)
+        if email_match:
+            return email_match.group(0)
+
+        return "there"
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""Throughput and cost of one-email-per-request vs. packed LLM categorization, and with the response cache.
+
+Run from the email_automation directory (starts benchmarks.fake_llm_server locally):
+
+    python -m benchmarks.bench_llm_categorization [--emails 2000] [--garble-rate 0.05]
+
+Costs use the llm_prompt_cost_per_1k / llm_completion_cost_per_1k settings.
+"""
+import argparse
+import time
+from benchmarks.fake_llm_server import FakeLLMConfig, serve
+from scripts.train_categorizer import synthetic_emails
+from utils.llm_categorizer import LLMBatchCategorizer
+from utils.llm_client import LLMClient
+from utils.response_cache import llm_response_cache
+
+def run(label, categorizer, emails):
+    started = time.perf_counter()
+    results = categorizer.predict(emails)
+    seconds = time.perf_counter() - started
+    metrics = categorizer.get_metrics()
+    fallbacks = sum(1 for result in results if result is None)
+    print(f"{label:<12} {len(emails) / seconds:>9,.0f} emails/s  {metrics['requests']:>6} requests  "
+          f"{metrics['prompt_tokens'] + metrics['completion_tokens']:>9,} tokens  "
+          f"${metrics['cost_per_email']:.5f}/email  {fallbacks / len(emails):.1%} rule fallback")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--emails', type=int, default=2000)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--garble-rate', type=float, default=0.05)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    server = serve(args.port, FakeLLMConfig(garble_rate=args.garble_rate))
+    emails = synthetic_emails(args.emails)
+    api_base = f"http://127.0.0.1:{args.port}/v1"
+
+    # Re-sent mail: the same emails with a sign-off added, answered from the response cache
+    resent = [dict(email, id=f"{email['id']}-resent", body=email["body"] + " Best regards, Dana") for email in emails]
+
+    def categorizer(**kwargs):
+        return LLMBatchCategorizer(LLMClient(api_base=api_base, api_key="test"), enabled=True,
+                                   concurrency=args.concurrency, **kwargs)
+
+    try:
+        llm_response_cache.enabled = False
+        run("per-email", categorizer(max_emails=1), emails)
+        run("packed", categorizer(), emails)
+
+        llm_response_cache.enabled = True
+        run("cache cold", categorizer(), emails)
+        run("re-sent", categorizer(), resent)
+        print(llm_response_cache.get_metrics()['namespaces']['categorization'])
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Throughput benchmark for near-duplicate clustering of a cycle's emails.
+
+Run from the email_automation directory:
+
+    python -m benchmarks.bench_near_duplicates [--emails 10000]
+
+Generates campaign-style mail, i.e. a few templates with per-sender names,
+order numbers and small edits, mixed with unique emails. It then reports
+clustering throughput and cluster purity against the generating template.
+"""
+import argparse
+import random
+import time
+from utils.document import analyze_email
+from utils.near_duplicates import NearDuplicateClusterer
+
+WORDS = ['account', 'billing', 'order', 'delivery', 'product', 'invoice', 'payment', 'refund', 'issue',
+         'support', 'update', 'release', 'pricing', 'meeting', 'contract', 'renewal', 'feature', 'request',
+         'report', 'login', 'password', 'error', 'shipment', 'warehouse', 'team', 'customer', 'service',
+         'integration', 'dashboard', 'export', 'import', 'settings', 'permission', 'upgrade', 'plan']
+NAMES = ['Alice', 'Bob', 'Carol', 'Dave', 'Erin', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy', 'Mallory']
+
+def make_templates(rng, count, length):
+    return [[rng.choice(WORDS) for _ in range(length)] for _ in range(count)]
+
+def render(rng, template, index):
+    words = list(template)
+    # Small per-email edits: a couple of substituted words
+    for _ in range(rng.randint(0, 2)):
+        words[rng.randrange(len(words))] = rng.choice(WORDS)
+    name = rng.choice(NAMES)
+    body = f"Hi team, my name is {name} and my order {rng.randint(1000, 99999)} " + " ".join(words) + f" Thanks, {name}"
+    return {'id': f"m{index}", 'subject': 'Regarding my order', 'body': body}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--emails', type=int, default=10_000)
+    parser.add_argument('--templates', type=int, default=50)
+    parser.add_argument('--unique-share', type=float, default=0.3)
+    parser.add_argument('--length', type=int, default=120, help='words per template body')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    templates = make_templates(rng, args.templates, args.length)
+    emails, truth = [], {}
+    for index in range(args.emails):
+        if rng.random() < args.unique_share:
+            email = render(rng, make_templates(rng, 1, args.length)[0], index)
+            truth[email['id']] = f"unique-{index}"
+        else:
+            template_index = rng.randrange(len(templates))
+            email = render(rng, templates[template_index], index)
+            truth[email['id']] = f"template-{template_index}"
+        emails.append(email)
+
+    clusterer = NearDuplicateClusterer(enabled=True)
+
+    # Analysis (tokenization) normally happens at ingestion; time it separately
+    started = time.perf_counter()
+    for email in emails:
+        analyze_email(email)
+    analysis_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    clusters = clusterer.cluster(emails)
+    cluster_seconds = time.perf_counter() - started
+
+    impure = sum(1 for members in clusters if len({truth[m['id']] for m in members}) > 1)
+    expected = args.templates + sum(1 for label in truth.values() if label.startswith('unique'))
+
+    print(f"emails:              {len(emails)}")
+    print(f"analysis:            {analysis_seconds:.3f}s (at ingestion)")
+    print(f"clustering:          {cluster_seconds:.3f}s ({len(emails) / cluster_seconds:,.0f} emails/s)")
+    print(f"clusters:            {len(clusters)} (generated groups: {expected})")
+    print(f"impure clusters:     {impure}")
+    print(f"stage runs saved:    {len(emails) - len(clusters)} categorizations and retrievals")
+
+if __name__ == '__main__':
+    main()
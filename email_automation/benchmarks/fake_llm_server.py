@@ -0,0 +1,95 @@
+"""Local stand-in for an OpenAI-compatible chat completions endpoint.
+
+It answers batched categorization prompts with the keyword rules, and it
+simulates latency that grows with prompt and completion tokens. It can also
+garble part of its replies, so throughput, cost and the rule fallback can be
+measured offline:
+
+    python -m benchmarks.fake_llm_server --port 8765
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.tokenizer import count_tokens
+from utils.rules import CATEGORY_KEYWORDS, rule_categorization
+
+EMAIL_BLOCK = re.compile(r'^### (\d+)\n(.*?)(?=^### \d+\n|\Z)', re.S | re.M)
+
+class FakeLLMConfig:
+    def __init__(self, base_latency: float = 0.05, prompt_token_latency: float = 0.00002,
+                 completion_token_latency: float = 0.0005, garble_rate: float = 0.0, seed: int = 0):
+        self.base_latency = base_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.completion_token_latency = completion_token_latency
+        self.garble_rate = garble_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+def make_handler(config: FakeLLMConfig):
+    class FakeLLMHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            prompt = "".join(message['content'] for message in request['messages'])
+            user = request['messages'][-1]['content']
+
+            entries = []
+            for number, block in EMAIL_BLOCK.findall(user):
+                category, importance = rule_categorization(CATEGORY_KEYWORDS.match(block))
+                entries.append({'n': int(number), 'category': category, 'importance': importance,
+                                'reasoning': f"Keywords suggest {category}"})
+
+            with config.lock:
+                garble = config.rng.random() < config.garble_rate
+                dropped = config.rng.randrange(len(entries)) if garble and entries else None
+            if garble:
+                # A fenced reply with prose around it and one entry missing
+                content = ("Here are the results:\n```json\n"
+                           + json.dumps([e for i, e in enumerate(entries) if i != dropped]) + "\n```")
+            else:
+                content = json.dumps(entries)
+
+            prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(content)
+            time.sleep(config.base_latency + prompt_tokens * config.prompt_token_latency
+                       + completion_tokens * config.completion_token_latency)
+
+            body = json.dumps({
+                'choices': [{'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeLLMHandler
+
+def serve(port: int = 8765, config: FakeLLMConfig = None) -> ThreadingHTTPServer:
+    """Start the server on a daemon thread and return it (call shutdown() to stop)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(config or FakeLLMConfig()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--garble-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = serve(args.port, FakeLLMConfig(garble_rate=args.garble_rate))
+    print(f"Fake LLM listening on http://127.0.0.1:{args.port}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -1,45 +1,200 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 class Settings(BaseSettings):
     # API Keys
-        openai_api_key: str
-            hubspot_api_key: str
-                supabase_url: str
-                    supabase_key: str
-                        google_client_id: str
-                            google_client_secret: str
-                                google_refresh_token: str
-                                    
-                                        # Database
-                                            database_url: str = "sqlite:///./email_automation.db"
-                                                
-                                                    # Security
-                                                        secret_key: str
-                                                            algorithm: str = "HS256"
-                                                                access_token_expire_minutes: int = 30
-                                                                    
-                                                                        # Monitoring
-                                                                            enable_metrics: bool = True
-                                                                                log_level: str = "INFO"
-                                                                                    
-                                                                                        # Email Processing
-                                                                                            max_email_size: int = 10 * 1024 * 1024  # 10MB
-                                                                                                batch_size: int = 10
-                                                                                                    processing_timeout: int = 300  # 5 minutes
-                                                                                                        
-                                                                                                            # Model Settings
-                                                                                                                model_name: str = "gpt-4"
-                                                                                                                    temperature: float = 0.7
-                                                                                                                        max_tokens: int = 2000
-                                                                                                                            
-                                                                                                                                # Calendar Settings
-                                                                                                                                    calendar_id: str = "primary"
-                                                                                                                                        timezone: str = "UTC"
-                                                                                                                                            
-                                                                                                                                                class Config:
-                                                                                                                                                        env_file = ".env"
-                                                                                                                                                                case_sensitive = False
-
-                                                                                                                                                                settings = Settings()
\ No newline at end of file
+    openai_api_key: str
+    hubspot_api_key: str
+    supabase_url: str
+    supabase_key: str
+    google_client_id: str
+    google_client_secret: str
+    google_refresh_token: str
+
+    # Database
+    database_url: str = "sqlite:///./email_automation.db"
+
+    # Security
+    secret_key: str
+    algorithm: str = "HS256"
+    access_token_expire_minutes: int = 30
+
+    # Monitoring
+    enable_metrics: bool = True
+    metrics_port: int = 9108  # Prometheus /metrics
+    metrics_snapshot_path: str = "./metrics_snapshot.json"
+    metrics_snapshot_seconds: float = 60.0
+    status_log_seconds: float = 300.0  # one "System status" log line with every component's metrics
+
+    # Tracing
+    tracing_enabled: bool = False
+    trace_sample_rate: float = 0.1  # fraction of emails traced, decided per email
+    trace_export_path: Optional[str] = "./traces.jsonl"  # one span per line
+    trace_otlp_endpoint: Optional[str] = None  # e.g. http://localhost:4318/v1/traces
+    trace_service_name: str = "email-automation"
+    trace_export_seconds: float = 5.0
+    trace_export_timeout: float = 10.0
+    trace_max_buffered_spans: int = 50_000
+
+    # Retries and Circuit Breakers (external tools; a service's entry overrides the defaults)
+    retry_policy_defaults: Dict[str, float] = {
+        'max_attempts': 3,
+        'base_delay': 0.5,  # seconds; doubles per attempt, with full jitter
+        'max_delay': 10.0,  # longer Retry-After values open the breaker instead of waiting
+        'max_elapsed': 30.0,
+        'failure_threshold': 5,  # consecutive transient failures that open the breaker
+        'reset_seconds': 30.0  # open breaker fails fast this long before a probe call
+    }
+    retry_policies: Dict[str, Dict[str, float]] = {
+        'gmail': {'max_attempts': 4},
+        'hubspot': {'max_delay': 15.0},
+        'supabase': {'max_attempts': 4, 'base_delay': 0.2},
+        'calendar': {}
+    }
+
+    # Profiling
+    profile_cycles: int = 0  # cycles to profile from startup; SIGUSR1 requests more
+    profile_signal_cycles: int = 3  # memory growth needs two profiled cycles: a baseline and a diff
+    profile_dir: str = "./profiles"
+    profile_top_n: int = 20
+    profile_sort: str = "tottime"  # pstats sort key for the logged summary
+    profile_memory: bool = True  # tracemalloc heap diffs between profiled cycles
+    profile_memory_frames: int = 1
+
+    # Logging
+    log_level: str = "INFO"
+    log_level_overrides: Dict[str, str] = {}  # module -> level, e.g. {"agents.categorizer": "WARNING"}
+    log_async: bool = False  # render and write logs on a background thread
+    log_queue_size: int = 10_000
+    log_batch_size: int = 256  # records per write
+    log_overflow_policy: str = "drop_new"  # drop_new | drop_oldest | block; errors are never dropped
+    log_flush_timeout_seconds: float = 5.0
+
+    # Email Processing
+    max_email_size: int = 10 * 1024 * 1024  # 10MB
+    batch_size: int = 10
+    processing_timeout: int = 300  # 5 minutes
+
+    # Adaptive Scheduling
+    poll_min_interval: float = 5.0  # seconds
+    poll_max_interval: float = 300.0  # seconds
+    poll_backoff_factor: float = 2.0
+    max_batch_size: int = 50
+    arrival_rate_smoothing: float = 0.3  # EWMA weight of the latest cycle
+
+    # Processed-Message Ledger
+    ledger_path: str = "./processed_messages.db"
+    ledger_expected_items: int = 5_000_000
+    ledger_false_positive_rate: float = 0.01
+    gmail_list_page_size: int = 100  # message IDs listed per page while skipping processed mail
+
+    # Dead Letters (emails that failed a stage, replayed with scripts.replay_dead_letters)
+    dead_letter_path: str = "./dead_letters.db"
+    dead_letter_replay_workers: int = 4
+
+    # Priority Scheduling
+    priority_aging_seconds: float = 120.0  # waiting this long lifts an email one priority level
+    priority_sla_seconds: Dict[str, float] = {"High": 300.0, "Medium": 1800.0, "Low": 14400.0}
+    pipeline_cycle_budget: int = 50  # emails taken off the priority queue per cycle
+
+    # Fast Path
+    fast_path_enabled: bool = True
+    fast_path_min_confidence: float = 0.9
+    # rule signal -> outcome (archive, no_reply or acknowledge)
+    fast_path_routes: Dict[str, str] = {
+        "promotional": "archive",
+        "auto_reply": "no_reply",
+        "automated_sender": "no_reply"
+    }
+    # rule signal -> its own minimum confidence; acknowledging other Low mail (confidence 0.6) is
+    # opt-in: add "other_low": "acknowledge" to the routes and "other_low": 0.6 here
+    fast_path_signal_min_confidence: Dict[str, float] = {}
+
+    # Memoization
+    memo_cache_enabled: bool = True
+    memo_cache_path: str = "./memo_cache.db"
+    memo_cache_memory_entries: int = 10_000
+    memo_cache_ttl_seconds: int = 24 * 3600
+    memo_cache_disk_max_entries: int = 200_000
+    knowledge_base_version: str = "1"  # bump to invalidate cached retrievals and drafts
+
+    # Near-Duplicate Clustering
+    near_duplicate_enabled: bool = True
+    near_duplicate_max_distance: int = 7  # SimHash bits out of 64
+    near_duplicate_shingle_size: int = 3
+
+    # Batch Categorization Model
+    categorization_model_path: str = "./models/categorizer.npz"
+    categorization_model_features: int = 2 ** 18
+    categorization_model_min_confidence: float = 0.7  # below this the keyword rules decide
+
+    # LLM Categorization (emails the batch model is unsure about)
+    llm_categorization_enabled: bool = False
+    llm_api_base: str = "https://api.openai.com/v1"
+    llm_request_timeout: float = 60.0
+    llm_batch_token_budget: int = 6000  # prompt plus expected completion tokens per request
+    llm_batch_max_emails: int = 25
+    llm_email_token_cap: int = 400  # longer bodies are truncated
+    llm_output_tokens_per_email: int = 60
+    llm_max_concurrent_requests: int = 4
+    llm_prompt_cost_per_1k: float = 0.03
+    llm_completion_cost_per_1k: float = 0.06
+
+    # LLM Response Generation and Cache
+    llm_generation_enabled: bool = False
+    semantic_cache_enabled: bool = True
+    semantic_cache_max_entries: int = 10_000
+    semantic_cache_ttl_seconds: int = 7 * 24 * 3600
+    semantic_cache_threshold: float = 0.85  # cosine similarity of the email text
+    semantic_cache_dimensions: int = 1024
+
+    # Prompt Context Budgets (tokens per section)
+    context_token_budgets: Dict[str, int] = {"body": 1500, "thread": 800, "contact_notes": 300}
+    context_recency_weight: float = 0.5  # versus relevance to the email when ranking thread messages and notes
+
+    # Thread Summaries
+    thread_summary_path: str = "./thread_summaries.db"
+    thread_summary_memory_threads: int = 5_000
+
+    # Knowledge Base Snapshot
+    knowledge_snapshot_path: str = "./knowledge_snapshot.bin"
+    knowledge_sync_seconds: float = 60.0  # poll for rows with a newer updated_at
+    knowledge_reconcile_seconds: float = 3600.0  # full ID listing to catch hard deletes
+
+    # Knowledge Base Chunking
+    knowledge_chunk_tokens: int = 200
+    knowledge_chunk_overlap_tokens: int = 40  # trailing sentences repeated at the start of the next chunk
+    knowledge_passages: int = 5  # passages retrieved per email
+    knowledge_snippet_token_budget: int = 600  # knowledge quoted in a reply
+
+    # Keyword Rules
+    rules_path: str = "./rules.json"  # optional; overrides built-in keyword groups
+    rules_reload_seconds: float = 5.0
+
+    # Model Settings
+    model_name: str = "gpt-4"
+    temperature: float = 0.7
+    max_tokens: int = 2000
+
+    # Calendar Settings
+    calendar_id: str = "primary"
+    timezone: str = "UTC"
+    calendar_busy_cache_seconds: float = 300.0  # free/busy intervals are reloaded after this
+    calendar_busy_window_days: int = 14  # free/busy window loaded per API call
+
+    # Slot Proposals (scheduling replies)
+    working_hours_start: int = 9  # hour of day in timezone
+    working_hours_end: int = 17
+    working_days: List[int] = [0, 1, 2, 3, 4]  # Monday is 0
+    meeting_duration_minutes: int = 30
+    slot_step_minutes: int = 30
+    slots_per_email: int = 3
+    slot_min_notice_hours: float = 2.0
+    slot_offer_hold_hours: float = 48.0  # an offered slot is not offered to anyone else meanwhile
+
+    class Config:
+        env_file = ".env"
+        case_sensitive = False
+
+settings = Settings()
\ No newline at end of file
@@ -1,37 +1,96 @@
 import asyncio
 import time
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable
 from crewai import Crew, Process
 from tasks.email_tasks import EmailTasks
 from tasks.response_tasks import ResponseTasks
 from tools.supabase_tool import SupabaseTool
-from utils.logger import logger
+from tools.gmail_tool import GmailTool
+from utils.logger import get_logger, get_log_metrics
 from utils.error_handlers import handle_error, EmailAutomationError
+from utils.scheduler import AdaptiveScheduler
+from utils.priority_queue import AgingPriorityQueue, PRIORITY_LEVELS, priority_for
+from utils.fast_path import FastPathRouter
+from utils.near_duplicates import NearDuplicateClusterer
+from utils.text_classifier import batch_categorizer
+from utils.llm_categorizer import llm_categorizer
+from utils.context_assembler import context_assembler
+from utils.thread_summaries import thread_summaries
+from utils.response_cache import llm_response_cache
+from utils.knowledge_chunks import knowledge_index
+from utils.knowledge_snapshot import knowledge_snapshot
+from utils.busy_intervals import busy_intervals
+from utils.slot_proposals import slot_proposer
+from utils.quality_rules import quality_engine
+from utils.rule_sets import rule_sets
+from utils.metrics import metrics
+from utils.tracing import tracer
+from utils.profiling import profiler
+from utils.retry import retry_engine
+from utils.dead_letters import dead_letters
+from utils.ledger import processed_ledger
+from utils.document import analyze_email
+from utils.memo_cache import response_memo, draft_key, to_template, personalize
 from config.settings import settings
 
+logger = get_logger(__name__)
+
 class EmailAutomationSystem:
     def __init__(self):
         self.email_tasks = EmailTasks()
         self.response_tasks = ResponseTasks()
         self.supabase_tool = SupabaseTool()
+        self.scheduler = AdaptiveScheduler()
+        self.priority_queue = AgingPriorityQueue()
+        self.fast_path = FastPathRouter(
+            self.email_tasks.categorizer,
+            self.email_tasks.response_generator,
+            self.supabase_tool,
+            GmailTool()
+        )
+        self.deduplicator = NearDuplicateClusterer()
+        self.cluster_knowledge: Dict[int, Dict[str, Any]] = {}
+        self._next_cluster_id = 0
+        self._status_logged_at = float('-inf')
         self.running = False
+        self._stopped = False
     
     async def start(self):
         """Start the email automation system"""
         logger.info("Starting Email Automation System")
         self.running = True
+        self._stopped = False
+        rule_sets.start()
+        self.start_knowledge_sync()
+        self.start_metrics()
+        tracer.start()
+        profiler.install_signal_handler()
         
         try:
             while self.running:
-                # Process incoming emails
-                await self.process_incoming_emails()
+                batch_size = self.scheduler.next_batch_size()
+                profiler.begin_cycle()
+                
+                # Batch stages trace per cycle; each email's own stages open its trace
+                with tracer.trace(f"cycle:{time.time_ns()}", "cycle", batch_size=batch_size):
+                    # Process incoming emails
+                    with profiler.stage("process_incoming_emails"):
+                        fetched = await self.process_incoming_emails(batch_size)
+                    
+                    # Send pending responses
+                    with profiler.stage("send_pending_responses"):
+                        await self.send_pending_responses()
                 
-                # Send pending responses
-                await self.send_pending_responses()
+                profiler.end_cycle()
                 
-                # Wait before next cycle
-                await asyncio.sleep(settings.processing_timeout)
+                # Run again immediately while backlog remains, back off when quiet
+                self.scheduler.record_cycle(fetched, batch_size, pending=len(self.priority_queue))
+                interval = self.scheduler.next_interval()
+                self.log_status()
+                
+                if interval > 0:
+                    await asyncio.sleep(interval)
                 
         except KeyboardInterrupt:
             logger.info("Shutting down Email Automation System")
@@ -40,37 +99,316 @@ class EmailAutomationSystem:
             logger.error("Fatal error in Email Automation System", error=str(e))
             self.running = False
             raise
+        finally:
+            self.stop()
+    
+    def start_knowledge_sync(self):
+        """Index the local knowledge snapshot and keep it current from a background thread"""
+        fetch_changes = lambda since: self.supabase_tool._run("get_knowledge_changes", since=since)
+        fetch_ids = lambda: self.supabase_tool._run("get_knowledge_ids")
+        
+        try:
+            if not knowledge_snapshot.load():
+                # First run: copy the whole table before serving retrievals from it
+                knowledge_snapshot.sync(fetch_changes, fetch_ids)
+        except Exception as e:
+            error_result = handle_error(e, {"operation": "knowledge_snapshot"})
+            logger.error("Failed to load knowledge snapshot", error=error_result)
+        
+        knowledge_index.ingest(list(knowledge_snapshot.articles()), complete=True)
+        knowledge_snapshot.start(
+            fetch_changes,
+            fetch_ids,
+            on_change=lambda changed, removed: knowledge_index.ingest(changed, removed_ids=removed)
+        )
+    
+    def components(self) -> Dict[str, Callable[[], Dict[str, Any]]]:
+        """Each component's get_metrics, by name"""
+        return {
+            'scheduler': self.scheduler.get_metrics,
+            'priority_queue': self.priority_queue.get_metrics,
+            'fast_path': self.fast_path.get_metrics,
+            'ledger': processed_ledger.get_metrics,
+            'memo_cache': response_memo.get_metrics,
+            'near_duplicates': self.deduplicator.get_metrics,
+            'batch_categorizer': batch_categorizer.get_metrics,
+            'llm_categorizer': llm_categorizer.get_metrics,
+            'context_assembler': context_assembler.get_metrics,
+            'thread_summaries': thread_summaries.get_metrics,
+            'llm_response_cache': llm_response_cache.get_metrics,
+            'knowledge_index': knowledge_index.get_metrics,
+            'knowledge_snapshot': knowledge_snapshot.get_metrics,
+            'busy_intervals': busy_intervals.get_metrics,
+            'slot_proposer': slot_proposer.get_metrics,
+            'quality_engine': quality_engine.get_metrics,
+            'rule_sets': rule_sets.get_metrics,
+            'tracer': tracer.get_metrics,
+            'profiler': profiler.get_metrics,
+            'retries': retry_engine.get_metrics,
+            'dead_letters': dead_letters.get_metrics,
+            'log_writer': get_log_metrics
+        }
+    
+    def start_metrics(self):
+        """Export the components' status alongside the tool and stage metrics"""
+        for name, get_metrics in self.components().items():
+            metrics.register_component(name, get_metrics)
+        metrics.start()
+    
+    def log_status(self, force: bool = False):
+        """One log line with every component's metrics, at most every status_log_seconds"""
+        now = time.monotonic()
+        if not force and now - self._status_logged_at < settings.status_log_seconds:
+            return
+        self._status_logged_at = now
+        status = {}
+        for name, get_metrics in self.components().items():
+            try:
+                status[name] = get_metrics()
+            except Exception as e:
+                status[name] = {'error': str(e)}
+        logger.info("System status", **status)
     
-    async def process_incoming_emails(self):
-        """Process incoming emails"""
+    async def process_incoming_emails(self, batch_size: int = None) -> int:
+        """Process incoming emails and return how many were fetched"""
         try:
-            logger.info("Processing incoming emails")
+            batch_size = batch_size or settings.batch_size
+            logger.info("Processing incoming emails", batch_size=batch_size)
             
-            # Create email processing workflow
-            tasks = self.email_tasks.create_email_processing_workflow(settings.batch_size)
+            received_at = time.monotonic()
             
-            # Create crew for email processing
-            email_crew = Crew(
-                agents=[
-                    self.email_tasks.email_processor,
-                    self.email_tasks.categorizer,
-                    self.email_tasks.knowledge_retriever,
-                    self.email_tasks.response_generator,
-                    self.email_tasks.quality_controller
-                ],
-                tasks=tasks,
-                process=Process.sequential,
-                verbose=True
-            )
+            # Fetch and enrich new emails
+            processed_emails = self.email_tasks.email_processor.process_incoming_emails(batch_size)
             
-            # Execute the workflow
-            result = email_crew.kickoff()
+            # Bulk and automated mail the rules can decide never reaches the agent stages
+            full_pipeline = []
+            routed_ids = []
+            for email_data in processed_emails:
+                try:
+                    with tracer.trace(email_data['id'], "fast_path"):
+                        routed = self.fast_path.route(email_data)
+                    if routed:
+                        routed_ids.append(email_data['id'])
+                    else:
+                        full_pipeline.append(email_data)
+                except Exception as e:
+                    error_result = handle_error(e, {"operation": "fast_path", "email_id": email_data['id']})
+                    logger.error("Failed to route email", email_id=email_data['id'], error=error_result)
+                    self._dead_letter("fast_path", email_data, e)
+            processed_ledger.mark_processed(routed_ids)
+            
+            # Categorize first so the remaining stages can run in priority order;
+            # campaign-style near-duplicates are categorized once per cluster
+            try:
+                clusters = self.deduplicator.cluster(full_pipeline)
+                
+                # Batched model and LLM categorization of all cluster leaders; None leaves a leader to the keyword rules
+                predictions = self.email_tasks.categorizer.predict_batch([members[0] for members in clusters])
+            except Exception as e:
+                for email_data in full_pipeline:
+                    self._dead_letter("categorize", email_data, e)
+                raise
+            for members, prediction in zip(clusters, predictions):
+                self.enqueue_cluster(members, received_at, prediction)
+            
+            self.drain_priority_queue(settings.pipeline_cycle_budget)
             
-            logger.info("Email processing completed", result=result)
+            logger.info("Email processing completed",
+                       processed_count=len(processed_emails),
+                       queued=len(self.priority_queue))
+            return len(processed_emails)
             
         except Exception as e:
             error_result = handle_error(e, {"operation": "process_incoming_emails"})
             logger.error("Failed to process incoming emails", error=error_result)
+            return 0
+    
+    def enqueue_cluster(self, members: List[Dict[str, Any]], received_at: float = None,
+                        shared_categorization: Dict[str, Any] = None):
+        """Categorize a cluster's leader and queue every member with the shared categorization"""
+        cluster_id = None
+        if len(members) > 1:
+            self._next_cluster_id += 1
+            cluster_id = self._next_cluster_id
+            self.cluster_knowledge[cluster_id] = {'knowledge': None, 'remaining': len(members)}
+        
+        for email_data in members:
+            try:
+                categorization = self.enqueue_email(email_data, received_at, shared_categorization, cluster_id)
+                shared_categorization = shared_categorization or categorization
+            except Exception as e:
+                if cluster_id is not None:
+                    self._release_cluster(cluster_id)
+                error_result = handle_error(e, {"operation": "enqueue_email", "email_id": email_data['id']})
+                logger.error("Failed to categorize email", email_id=email_data['id'], error=error_result)
+                self._dead_letter("categorize", email_data, e)
+    
+    def enqueue_email(self, email_data: Dict[str, Any], received_at: float = None,
+                      shared_categorization: Dict[str, Any] = None, cluster_id: int = None) -> Dict[str, Any]:
+        """Categorize an email and queue the rest of its pipeline by importance"""
+        with tracer.trace(email_data['id'], "enqueue_email", cluster_id=cluster_id or 0) as span:
+            categorization = self.email_tasks.categorizer.categorize_email(email_data, shared_categorization)
+            
+            # Sensitive topics and executive senders jump a level ahead of their importance,
+            # so priority stays per email even within a cluster
+            escalation_hint = analyze_email(email_data).requires_escalation(email_data['from'])
+            priority = priority_for(categorization['importance'], escalation_hint)
+            span.set(category=categorization['category'], priority=priority)
+        
+        self.priority_queue.push((email_data, categorization, cluster_id), priority, received_at)
+        return categorization
+    
+    def drain_priority_queue(self, budget: int):
+        """Run queued emails through the remaining stages, most urgent first"""
+        entries = []
+        for _ in range(budget):
+            entry = self.priority_queue.pop()
+            if entry is None:
+                break
+            entries.append(entry)
+        
+        # Meeting requests in this cycle share one free/busy lookup and never get the same slot
+        try:
+            self.email_tasks.response_generator.allocate_slots(
+                [item[0] for item, _, _ in entries], [item[1] for item, _, _ in entries]
+            )
+        except Exception as e:
+            error_result = handle_error(e, {"operation": "allocate_slots"})
+            logger.error("Failed to allocate meeting slots", error=error_result)
+        
+        for entry in entries:
+            (email_data, categorization, cluster_id), priority, received_at = entry
+            try:
+                started = time.perf_counter()
+                with tracer.trace(email_data['id'], "process_email", priority=priority):
+                    self.process_email(email_data, categorization, cluster_id)
+                self.fast_path.record_full_pipeline(time.perf_counter() - started)
+                self.priority_queue.complete(priority, received_at)
+                processed_ledger.mark_processed([email_data['id']])
+            except Exception as e:
+                error_result = handle_error(e, {"operation": "process_email", "email_id": email_data['id']})
+                logger.error("Failed to process email", email_id=email_data['id'], error=error_result)
+                self._dead_letter("process", email_data, e, categorization)
+            finally:
+                if cluster_id is not None:
+                    self._release_cluster(cluster_id)
+    
+    def _dead_letter(self, stage: str, email_data: Dict[str, Any], error: Exception,
+                     categorization: Dict[str, Any] = None):
+        """Hand a failed email to the dead-letter store; if that fails too, it is fetched again"""
+        if dead_letters.record(stage, email_data, error, categorization):
+            processed_ledger.mark_processed([email_data['id']])
+        else:
+            processed_ledger.release([email_data['id']])
+    
+    def replay_dead_letter(self, letter: Dict[str, Any]) -> bool:
+        """Run a dead-lettered email from its failed stage to the end; True once it went through"""
+        stage = letter['stage']
+        email_data = letter['snapshot']['email']
+        categorization = letter['snapshot'].get('categorization')
+        
+        try:
+            with tracer.trace(email_data['id'], "replay", stage=stage, attempts=letter['attempts']):
+                if stage == "enrich":
+                    email_data = self.email_tasks.email_processor.enrich_email(email_data)
+                    stage = "fast_path"
+                if stage == "fast_path":
+                    if self.fast_path.route(email_data):
+                        stage = None
+                    else:
+                        stage = "categorize"
+                if stage == "categorize":
+                    categorization = self.email_tasks.categorizer.categorize_email(email_data)
+                    stage = "process"
+                if stage == "process":
+                    self.process_email(email_data, categorization)
+        except Exception as e:
+            error_result = handle_error(e, {"operation": "replay", "stage": stage, "email_id": email_data['id']})
+            logger.error("Replay failed", email_id=email_data['id'], stage=stage, error=error_result)
+            dead_letters.record(stage, email_data, e, categorization if stage == "process" else None)
+            return False
+        
+        dead_letters.resolve(email_data['id'])
+        logger.info("Replayed email", email_id=email_data['id'], from_stage=letter['stage'])
+        return True
+    
+    def _release_cluster(self, cluster_id: int):
+        """Forget a cluster's shared retrieval once its last member has left the queue"""
+        cluster = self.cluster_knowledge.get(cluster_id)
+        if cluster is None:
+            return
+        cluster['remaining'] -= 1
+        if cluster['remaining'] <= 0:
+            del self.cluster_knowledge[cluster_id]
+    
+    def process_email(self, email_data: Dict[str, Any], categorization: Dict[str, Any] = None,
+                      cluster_id: int = None) -> Dict[str, Any]:
+        """Categorize, retrieve knowledge, draft and review a single processed email"""
+        if categorization is None:
+            categorization = self.email_tasks.categorizer.categorize_email(email_data)
+        
+        # Retrieval runs once per near-duplicate cluster; drafting and review stay per email
+        cluster = self.cluster_knowledge.get(cluster_id)
+        shared_knowledge = cluster['knowledge'] if cluster else None
+        knowledge = self.email_tasks.knowledge_retriever.retrieve_knowledge(email_data, categorization, shared_knowledge)
+        if cluster and shared_knowledge is None:
+            cluster['knowledge'] = knowledge
+        
+        # Duplicate content reuses an earlier QC-approved draft without generation or review
+        memo_key = draft_key(email_data, categorization, knowledge)
+        cached_review = self._apply_cached_draft(email_data, memo_key)
+        if cached_review is not None:
+            return cached_review
+        
+        response = self.email_tasks.response_generator.generate_response(email_data, categorization, knowledge)
+        review = self.email_tasks.quality_controller.review_response(email_data, response)
+        
+        if review['quality_score'] >= 0.8 and not review['escalation_needed'] and not response['calendar_action']:
+            sender_name = self.email_tasks.response_generator._extract_sender_name(email_data['from'])
+            response_memo.put('draft', memo_key, {
+                'response_type': response['response_type'],
+                'final_response': to_template(review['improved_response'], sender_name),
+                'quality_score': review['quality_score'],
+                'quality_checks': review['quality_checks']
+            })
+        
+        return review
+    
+    def _apply_cached_draft(self, email_data: Dict[str, Any], memo_key: str) -> Dict[str, Any]:
+        """Personalize and store a cached approved draft; None when there is no usable one"""
+        cached = response_memo.get('draft', memo_key)
+        if cached is None:
+            return None
+        
+        # Escalation also depends on the sender, so it is checked for every email
+        if analyze_email(email_data).requires_escalation(email_data['from']):
+            return None
+        
+        sender_name = self.email_tasks.response_generator._extract_sender_name(email_data['from'])
+        final_response = personalize(cached['final_response'], sender_name)
+        
+        self.supabase_tool._run("update_email",
+                               email_id=email_data['id'],
+                               update_data={
+                                   'draft_response': final_response,
+                                   'response_type': cached['response_type'],
+                                   'final_response': final_response,
+                                   'quality_score': cached['quality_score'],
+                                   'quality_checks': cached['quality_checks'],
+                                   'escalation_needed': False
+                               })
+        
+        logger.info("Reused approved draft", email_id=email_data['id'])
+        
+        return {
+            'email_id': email_data['id'],
+            'original_response': final_response,
+            'improved_response': final_response,
+            'quality_score': cached['quality_score'],
+            'quality_checks': cached['quality_checks'],
+            'escalation_needed': False,
+            'reviewed_at': datetime.utcnow().isoformat()
+        }
     
     async def send_pending_responses(self):
         """Send pending email responses"""
@@ -84,6 +422,12 @@ class EmailAutomationSystem:
                 logger.info("No pending responses to send")
                 return
             
+            # Send the most important responses first
+            unsent_emails = sorted(
+                unsent_emails,
+                key=lambda email: PRIORITY_LEVELS.index(priority_for(email.get('importance', 'Low')))
+            )
+            
             # Create response sending workflow
             tasks = self.response_tasks.create_send_responses_workflow(unsent_emails)
             
@@ -108,9 +452,17 @@ class EmailAutomationSystem:
             logger.error("Failed to send pending responses", error=error_result)
     
     def stop(self):
-        """Stop the email automation system"""
+        """Stop the email automation system and its background threads, flushing metrics and spans"""
+        if self._stopped:
+            return
+        self._stopped = True
         logger.info("Stopping Email Automation System")
         self.running = False
+        rule_sets.stop()
+        knowledge_snapshot.stop()
+        self.log_status(force=True)
+        metrics.stop()
+        tracer.stop()
 
 async def main():
     """Main entry point"""
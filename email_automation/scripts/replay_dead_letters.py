@@ -0,0 +1,100 @@
+"""Replay dead-lettered emails from the stage that failed.
+
+Run from the email_automation directory:
+
+    python -m scripts.replay_dead_letters --list
+    python -m scripts.replay_dead_letters [--stage categorize] [--email-id ID ...] [--limit 500] [--workers 8]
+
+Emails that failed a pipeline stage are kept in settings.dead_letter_path
+with that stage's input. A replay resumes each email at its failed stage:
+an email that failed in enrichment is enriched from the stored message
+without fetching it again, and one that failed after categorization keeps
+its categorization. Emails are replayed in parallel on --workers threads
+(settings.dead_letter_replay_workers by default). Each thread has its own
+pipeline, because the Google API clients are not thread-safe. An email
+that goes through is removed from the store. One that fails again stays,
+with the new stage and error and one more attempt. The service can keep
+running meanwhile: retrieval reads its knowledge snapshot, which this
+command only loads (it copies the table once if no snapshot exists yet).
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import settings
+from tools.supabase_tool import SupabaseTool
+from utils.dead_letters import dead_letters, STAGES
+from utils.knowledge_chunks import knowledge_index
+from utils.knowledge_snapshot import knowledge_snapshot
+from main import EmailAutomationSystem
+
+def list_dead_letters(args) -> None:
+    print(json.dumps({'pending_by_stage': dead_letters.counts()}))
+    for letter in dead_letters.pending(args.stage, args.limit, args.email_id):
+        print(json.dumps({
+            'email_id': letter['email_id'],
+            'stage': letter['stage'],
+            'attempts': letter['attempts'],
+            'retryable': letter['retryable'],
+            'error_type': letter['error_type'],
+            'error': letter['error'],
+            'subject': letter['snapshot']['email'].get('subject'),
+            'last_failed_at': letter['last_failed_at']
+        }))
+
+def load_knowledge() -> None:
+    """Index the service's knowledge snapshot; the service keeps it current, so no poller runs here"""
+    if not knowledge_snapshot.load():
+        # No snapshot yet: copy the table once
+        supabase_tool = SupabaseTool()
+        knowledge_snapshot.sync(lambda since: supabase_tool._run("get_knowledge_changes", since=since),
+                                lambda: supabase_tool._run("get_knowledge_ids"))
+    knowledge_index.ingest(list(knowledge_snapshot.articles()), complete=True)
+
+def replay(args) -> None:
+    letters = dead_letters.pending(args.stage, args.limit, args.email_id)
+    if not letters:
+        print("No dead letters to replay")
+        return
+
+    systems = threading.local()
+    system_lock = threading.Lock()
+
+    def replay_one(letter) -> bool:
+        if not hasattr(systems, 'system'):
+            # Agents build their API clients on construction
+            with system_lock:
+                systems.system = EmailAutomationSystem()
+        return systems.system.replay_dead_letter(letter)
+
+    load_knowledge()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="replay") as pool:
+        results = list(pool.map(replay_one, letters))
+
+    replayed = sum(results)
+    print(json.dumps({
+        'replayed': replayed,
+        'failed': len(results) - replayed,
+        'seconds': round(time.perf_counter() - started, 2),
+        'pending_by_stage': dead_letters.counts()
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--list', action='store_true', help="show dead letters instead of replaying them")
+    parser.add_argument('--stage', choices=STAGES, help="only emails that failed this stage")
+    parser.add_argument('--email-id', action='append', help="only this email (repeatable)")
+    parser.add_argument('--limit', type=int, help="at most this many emails, oldest failure first")
+    parser.add_argument('--workers', type=int, default=settings.dead_letter_replay_workers)
+    args = parser.parse_args()
+
+    if args.list:
+        list_dead_letters(args)
+    else:
+        replay(args)
+
+if __name__ == '__main__':
+    main()
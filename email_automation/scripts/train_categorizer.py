@@ -0,0 +1,152 @@
+"""Train the batch categorization model on CPU and report held-out accuracy.
+
+Run from the email_automation directory:
+
+    python -m scripts.train_categorizer --data labeled_emails.jsonl [--out models/categorizer.npz]
+    python -m scripts.train_categorizer --synthetic 20000
+
+--data is a JSONL file with one labeled email per line:
+{"subject": ..., "body": ..., "from": ..., "category": ..., "importance": ...}
+Categories and importance levels must be those of utils.text_classifier.
+--synthetic generates labeled mail offline instead, as a smoke test of the
+training and scoring path.
+
+The report compares the model with the keyword rules on the same held-out
+split and times batch scoring separately from email analysis.
+"""
+import argparse
+import json
+import random
+import time
+import numpy as np
+from config.settings import settings
+from utils.document import analyze_email
+from utils.rules import rule_categorization
+from utils.text_classifier import HashingVectorizer, LinearModel, CATEGORIES, HEADS
+
+SYNTHETIC_TOPICS = {
+    "Sales": ['pricing', 'quote', 'licenses', 'seats', 'budget', 'trial', 'purchase', 'plan', 'contract',
+              'renewal', 'discount', 'procurement', 'vendor', 'evaluate', 'demo', 'proposal'],
+    "Customer Service": ['login', 'crash', 'broken', 'cannot', 'error', 'refund', 'invoice', 'charged',
+                         'password', 'reset', 'slow', 'missing', 'export', 'sync', 'help', 'issue'],
+    "Other": ['newsletter', 'webinar', 'lunch', 'team', 'offsite', 'article', 'update', 'announcement',
+              'survey', 'holiday', 'schedule', 'photos', 'congratulations', 'event', 'service', 'question']
+}
+URGENT_WORDS = ['urgent', 'today', 'outage', 'deadline', 'asap', 'board', 'escalate', 'immediately']
+FILLER = ['we', 'our', 'the', 'a', 'for', 'with', 'about', 'this', 'week', 'please', 'let', 'me', 'know',
+          'thanks', 'regarding', 'could', 'you', 'would', 'like', 'to', 'and', 'have', 'on', 'in']
+
+def synthetic_emails(count: int, seed: int = 7):
+    """Labeled mail whose topic words only partly overlap the keyword rules"""
+    rng = random.Random(seed)
+    emails = []
+    for index in range(count):
+        category = rng.choice(CATEGORIES)
+        urgent = rng.random() < 0.2
+        if urgent and category != "Other":
+            importance = "High"
+        elif category == "Other":
+            importance = "Low"
+        else:
+            importance = "Medium"
+
+        words = [rng.choice(SYNTHETIC_TOPICS[category]) for _ in range(rng.randint(3, 8))]
+        words += [rng.choice(FILLER) for _ in range(rng.randint(15, 40))]
+        if urgent:
+            words.append(rng.choice(URGENT_WORDS))
+        # Label noise: a word borrowed from another topic
+        if rng.random() < 0.3:
+            words.append(rng.choice(SYNTHETIC_TOPICS[rng.choice(CATEGORIES)]))
+        rng.shuffle(words)
+
+        emails.append({
+            'id': f"synthetic-{index}",
+            'subject': " ".join(words[:5]),
+            'body': " ".join(words),
+            'from': f"sender{index}@example.com",
+            'category': category,
+            'importance': importance
+        })
+    return emails
+
+def load_emails(path: str):
+    emails = []
+    with open(path, encoding='utf-8') as handle:
+        for index, line in enumerate(handle):
+            if line.strip():
+                email = json.loads(line)
+                email.setdefault('id', f"line-{index}")
+                emails.append(email)
+    return emails
+
+def accuracy(predicted, expected) -> float:
+    return float(np.mean(np.asarray(predicted) == np.asarray(expected))) if len(expected) else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', help='JSONL file of labeled emails')
+    parser.add_argument('--synthetic', type=int, default=0, help='generate this many labeled emails instead')
+    parser.add_argument('--out', default=settings.categorization_model_path)
+    parser.add_argument('--holdout', type=float, default=0.2)
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--features', type=int, default=settings.categorization_model_features)
+    args = parser.parse_args()
+
+    if args.data:
+        emails = load_emails(args.data)
+    elif args.synthetic:
+        emails = synthetic_emails(args.synthetic)
+    else:
+        parser.error("pass --data or --synthetic")
+
+    random.Random(0).shuffle(emails)
+    split = int(len(emails) * (1 - args.holdout))
+    train, held_out = emails[:split], emails[split:]
+    labels = {
+        head: np.array([head_labels.index(email[head]) for email in train])
+        for head, head_labels in HEADS.items()
+    }
+
+    vectorizer = HashingVectorizer(args.features)
+    started = time.perf_counter()
+    train_matrix = vectorizer.transform(train)
+    model = LinearModel(args.features)
+    losses = model.fit(train_matrix, labels, epochs=args.epochs)
+    train_seconds = time.perf_counter() - started
+    model.save(args.out)
+
+    # Held-out evaluation. Analysis normally happens at ingestion, so it is timed on its own
+    for email in held_out:
+        email.pop('analysis', None)
+    started = time.perf_counter()
+    for email in held_out:
+        analyze_email(email)
+    analysis_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    probabilities = model.predict_proba(vectorizer.transform(held_out))
+    model_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rule_predictions = [rule_categorization(analyze_email(email).category_hits) for email in held_out]
+    rule_seconds = time.perf_counter() - started
+
+    print(f"emails:               {len(train)} train / {len(held_out)} held out")
+    print(f"training:             {train_seconds:.2f}s, final loss {losses[-1]:.4f}")
+    print(f"model saved to:       {args.out}")
+    for position, (head, head_labels) in enumerate(HEADS.items()):
+        expected = [email[head] for email in held_out]
+        predicted = [head_labels[index] for index in probabilities[head].argmax(axis=1)]
+        rules = [prediction[position] for prediction in rule_predictions]
+        print(f"{head + ' accuracy:':<22}model {accuracy(predicted, expected):.3f}, "
+              f"rules {accuracy(rules, expected):.3f}")
+
+    confidence = np.minimum(probabilities['category'].max(axis=1), probabilities['importance'].max(axis=1))
+    print(f"above min confidence: {float(np.mean(confidence >= settings.categorization_model_min_confidence)):.3f} "
+          f"(threshold {settings.categorization_model_min_confidence})")
+    print(f"analysis:             {len(held_out) / analysis_seconds:,.0f} emails/s (at ingestion, shared)")
+    print(f"batch scoring:        {len(held_out) / model_seconds:,.0f} emails/s (vectorize + score)")
+    print(f"rules:                {len(held_out) / rule_seconds:,.0f} emails/s")
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,9 @@ from agents.categorizer import EmailCategorizerAgent
 from agents.knowledge_retriever import KnowledgeRetrieverAgent
 from agents.response_generator import ResponseGeneratorAgent
 from agents.quality_controller import QualityControllerAgent
-from utils.logger import logger
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class EmailTasks:
     def __init__(self):
@@ -4,7 +4,9 @@ from agents.response_generator import ResponseGeneratorAgent
 from agents.quality_controller import QualityControllerAgent
 from tools.gmail_tool import GmailTool
 from tools.supabase_tool import SupabaseTool
-from utils.logger import logger
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class ResponseTasks:
     def __init__(self):
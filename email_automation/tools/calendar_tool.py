@@ -1,3 +1,4 @@
+import time
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 from google.oauth2.credentials import Credentials
@@ -5,155 +6,197 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from crewai_tools import BaseTool
 from config.settings import settings
-from utils.logger import logger
+from utils.logger import get_logger
+from utils.metrics import instrument_tool
+from utils.retry import with_retries
 from utils.security import SecurityManager
+from utils.error_handlers import EmailProcessingError
+from utils.busy_intervals import BusyIntervalIndex, busy_intervals, parse_time, format_time
+from utils.slot_proposals import slot_proposer
+
+logger = get_logger(__name__)
 
 class CalendarTool(BaseTool):
     name: str = "Calendar Tool"
-        description: str = "Manages Google Calendar events"
-            
-                def __init__(self):
-                        super().__init__()
-                                self.credentials = Credentials(
-                                            token=settings.google_refresh_token,
-                                                        refresh_token=settings.google_refresh_token,
-                                                                    client_id=settings.google_client_id,
-                                                                                client_secret=settings.google_client_secret,
-                                                                                            token_uri="https://oauth2.googleapis.com/token"
-                                                                                                    )
-                                                                                                            self.service = build('calendar', 'v3', credentials=self.credentials)
-                                                                                                                
-                                                                                                                    def _run(self, operation: str, **kwargs) -> Dict[str, Any]:
-                                                                                                                            """Execute Calendar operations"""
-                                                                                                                                    try:
-                                                                                                                                                if operation == "get_events":
-                                                                                                                                                                return self._get_events(**kwargs)
-                                                                                                                                                                            elif operation == "create_event":
-                                                                                                                                                                                            return self._create_event(**kwargs)
-                                                                                                                                                                                                        elif operation == "check_availability":
-                                                                                                                                                                                                                        return self._check_availability(**kwargs)
-                                                                                                                                                                                                                                    else:
-                                                                                                                                                                                                                                                    raise ValueError(f"Unknown operation: {operation}")
-                                                                                                                                                                                                                                                            except HttpError as e:
-                                                                                                                                                                                                                                                                        logger.error("Calendar API error", error=str(e))
-                                                                                                                                                                                                                                                                                    raise EmailProcessingError(f"Calendar API error: {e}")
-                                                                                                                                                                                                                                                                                            except Exception as e:
-                                                                                                                                                                                                                                                                                                        logger.error("Unexpected error in Calendar tool", error=str(e))
-                                                                                                                                                                                                                                                                                                                    raise EmailProcessingError(f"Unexpected error: {e}")
-                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                            def _get_events(self, calendar_id: str = None, time_min: str = None, time_max: str = None, max_results: int = 10) -> List[Dict[str, Any]]:
-                                                                                                                                                                                                                                                                                                                                    """Get calendar events"""
-                                                                                                                                                                                                                                                                                                                                            try:
-                                                                                                                                                                                                                                                                                                                                                        calendar_id = calendar_id or settings.calendar_id
-                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                if not time_min:
-                                                                                                                                                                                                                                                                                                                                                                                                time_min = datetime.utcnow().isoformat() + 'Z'
-                                                                                                                                                                                                                                                                                                                                                                                                            if not time_max:
-                                                                                                                                                                                                                                                                                                                                                                                                                            time_max = (datetime.utcnow() + timedelta(days=7)).isoformat() + 'Z'
-                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                    events_result = self.service.events().list(
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                    calendarId=calendar_id,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    timeMin=time_min,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    timeMax=time_max,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    maxResults=max_results,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    singleEvents=True,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    orderBy='startTime'
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                ).execute()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        events = events_result.get('items', [])
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                return [
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'id': event['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'summary': event.get('summary', ''),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            'description': event.get('description', ''),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                'start': event['start'].get('dateTime', event['start'].get('date')),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'end': event['end'].get('dateTime', event['end'].get('date')),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'attendees': event.get('attendees', [])
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        }
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        for event in events
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    ]
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            except Exception as e:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        logger.error("Failed to get calendar events", error=str(e))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    raise EmailProcessingError(f"Failed to get calendar events: {e}")
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            def _create_event(self, summary: str, start_time: str, end_time: str, description: str = None, attendees: List[str] = None) -> Dict[str, Any]:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    """Create calendar event"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            try:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        event = {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'summary': SecurityManager.sanitize_input(summary),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'start': {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            'dateTime': start_time,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                'timeZone': settings.timezone
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                },
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                'end': {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'dateTime': end_time,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'timeZone': settings.timezone
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        }
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    }
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            if description:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            event['description'] = SecurityManager.sanitize_input(description)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    if attendees:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    event['attendees'] = [{'email': email} for email in attendees]
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            event = self.service.events().insert(
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            calendarId=settings.calendar_id,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            body=event
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        ).execute()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                return {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                'id': event['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                'summary': event.get('summary', ''),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                'start': event['start'].get('dateTime'),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                'end': event['end'].get('dateTime'),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                'html_link': event.get('htmlLink', '')
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            }
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    except Exception as e:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                logger.error("Failed to create calendar event", error=str(e))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            raise EmailProcessingError(f"Failed to create calendar event: {e}")
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    def _check_availability(self, start_time: str, end_time: str, calendar_id: str = None) -> Dict[str, Any]:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            """Check calendar availability for a time slot"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    try:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                calendar_id = calendar_id or settings.calendar_id
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        # Get events during the requested time
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    events = self._get_events(
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    calendar_id=calendar_id,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    time_min=start_time,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    time_max=end_time
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                )
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        # Check if any events conflict
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    conflicting_events = [
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    event for event in events
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    if self._time_ranges_overlap(
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        start_time, end_time,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            event['start'], event['end']
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            )
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        ]
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                return {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                'available': len(conflicting_events) == 0,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                'conflicting_events': conflicting_events
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            }
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    except Exception as e:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                logger.error("Failed to check calendar availability", error=str(e))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            raise EmailProcessingError(f"Failed to check calendar availability: {e}")
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    def _time_ranges_overlap(self, start1: str, end1: str, start2: str, end2: str) -> bool:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            """Check if two time ranges overlap"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    try:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                # Convert to datetime objects
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            dt_start1 = datetime.fromisoformat(start1.replace('Z', '+00:00'))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        dt_end1 = datetime.fromisoformat(end1.replace('Z', '+00:00'))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    dt_start2 = datetime.fromisoformat(start2.replace('Z', '+00:00'))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                dt_end2 = datetime.fromisoformat(end2.replace('Z', '+00:00'))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        # Check for overlap
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    return max(dt_start1, dt_start2) < min(dt_end1, dt_end2)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            except Exception as e:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        logger.error("Failed to compare time ranges", error=str(e))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    return False
\ No newline at end of file
+    description: str = "Manages Google Calendar events"
+
+    def __init__(self):
+        super().__init__()
+        self.credentials = Credentials(
+            token=settings.google_refresh_token,
+            refresh_token=settings.google_refresh_token,
+            client_id=settings.google_client_id,
+            client_secret=settings.google_client_secret,
+            token_uri="https://oauth2.googleapis.com/token"
+        )
+        self.service = build('calendar', 'v3', credentials=self.credentials)
+
+    @instrument_tool("calendar")
+    @with_retries("calendar", non_idempotent=("create_event",))
+    def _run(self, operation: str, **kwargs) -> Dict[str, Any]:
+        """Execute Calendar operations"""
+        try:
+            if operation == "get_events":
+                return self._get_events(**kwargs)
+            elif operation == "create_event":
+                return self._create_event(**kwargs)
+            elif operation == "check_availability":
+                return self._check_availability(**kwargs)
+            elif operation == "find_free_slots":
+                return self._find_free_slots(**kwargs)
+            elif operation == "propose_slots":
+                return self._propose_slots(**kwargs)
+            else:
+                raise ValueError(f"Unknown operation: {operation}")
+        except HttpError as e:
+            logger.error("Calendar API error", error=str(e))
+            raise EmailProcessingError(f"Calendar API error: {e}")
+        except Exception as e:
+            logger.error("Unexpected error in Calendar tool", error=str(e))
+            raise EmailProcessingError(f"Unexpected error: {e}")
+
+    def _get_events(self, calendar_id: str = None, time_min: str = None, time_max: str = None, max_results: int = 10) -> List[Dict[str, Any]]:
+        """Get calendar events"""
+        try:
+            calendar_id = calendar_id or settings.calendar_id
+
+            if not time_min:
+                time_min = datetime.utcnow().isoformat() + 'Z'
+            if not time_max:
+                time_max = (datetime.utcnow() + timedelta(days=7)).isoformat() + 'Z'
+
+            events_result = self.service.events().list(
+                calendarId=calendar_id,
+                timeMin=time_min,
+                timeMax=time_max,
+                maxResults=max_results,
+                singleEvents=True,
+                orderBy='startTime'
+            ).execute()
+
+            events = events_result.get('items', [])
+
+            return [
+                {
+                    'id': event['id'],
+                    'summary': event.get('summary', ''),
+                    'description': event.get('description', ''),
+                    'start': event['start'].get('dateTime', event['start'].get('date')),
+                    'end': event['end'].get('dateTime', event['end'].get('date')),
+                    'attendees': event.get('attendees', [])
+                }
+                for event in events
+            ]
+        except Exception as e:
+            logger.error("Failed to get calendar events", error=str(e))
+            raise EmailProcessingError(f"Failed to get calendar events: {e}")
+
+    def _create_event(self, summary: str, start_time: str, end_time: str, description: str = None, attendees: List[str] = None) -> Dict[str, Any]:
+        """Create calendar event"""
+        try:
+            event = {
+                'summary': SecurityManager.sanitize_input(summary),
+                'start': {
+                    'dateTime': start_time,
+                    'timeZone': settings.timezone
+                },
+                'end': {
+                    'dateTime': end_time,
+                    'timeZone': settings.timezone
+                }
+            }
+
+            if description:
+                event['description'] = SecurityManager.sanitize_input(description)
+
+            if attendees:
+                event['attendees'] = [{'email': email} for email in attendees]
+
+            event = self.service.events().insert(
+                calendarId=settings.calendar_id,
+                body=event
+            ).execute()
+
+            # Keep the cached busy intervals in step without another free/busy call
+            busy_intervals.mark_busy(settings.calendar_id, parse_time(start_time), parse_time(end_time))
+
+            return {
+                'id': event['id'],
+                'summary': event.get('summary', ''),
+                'start': event['start'].get('dateTime'),
+                'end': event['end'].get('dateTime'),
+                'html_link': event.get('htmlLink', '')
+            }
+        except Exception as e:
+            logger.error("Failed to create calendar event", error=str(e))
+            raise EmailProcessingError(f"Failed to create calendar event: {e}")
+
+    def _check_availability(self, start_time: str, end_time: str, calendar_id: str = None) -> Dict[str, Any]:
+        """Check calendar availability for a time slot"""
+        try:
+            calendar_id = calendar_id or settings.calendar_id
+            start, end = parse_time(start_time), parse_time(end_time)
+
+            # Answered from the cached free/busy intervals; the API is called only when they expire
+            conflicts = self._busy_index(calendar_id, start, end).conflicts(start, end)
+
+            return {
+                'available': len(conflicts) == 0,
+                'conflicting_events': [
+                    {'start': format_time(busy_start), 'end': format_time(busy_end)}
+                    for busy_start, busy_end in conflicts
+                ]
+            }
+        except Exception as e:
+            logger.error("Failed to check calendar availability", error=str(e))
+            raise EmailProcessingError(f"Failed to check calendar availability: {e}")
+
+    def _find_free_slots(self, duration_minutes: int = 30, count: int = 3, time_min: str = None,
+                         time_max: str = None, step_minutes: int = None, calendar_id: str = None) -> List[Dict[str, str]]:
+        """Find the first free slots of a given length"""
+        try:
+            calendar_id = calendar_id or settings.calendar_id
+            start = parse_time(time_min) if time_min else time.time()
+            end = parse_time(time_max) if time_max else start + settings.calendar_busy_window_days * 86400
+
+            # A cached window may end just short of end; nothing past it is known to be free
+            index = self._busy_index(calendar_id, start, end)
+            slots = index.free_slots(
+                start, min(end, index.window_end), duration_minutes * 60, count, (step_minutes or duration_minutes) * 60
+            )
+
+            return [{'start': format_time(slot_start), 'end': format_time(slot_end)} for slot_start, slot_end in slots]
+        except Exception as e:
+            logger.error("Failed to find free calendar slots", error=str(e))
+            raise EmailProcessingError(f"Failed to find free calendar slots: {e}")
+
+    def _propose_slots(self, request_ids: List[str], count: int = None,
+                       calendar_id: str = None) -> Dict[str, List[Dict[str, str]]]:
+        """Allocate non-overlapping meeting slot offers for a batch of scheduling requests"""
+        try:
+            calendar_id = calendar_id or settings.calendar_id
+            now = time.time()
+
+            # One cached free/busy lookup serves the whole batch
+            index = self._busy_index(calendar_id, now, now + settings.calendar_busy_window_days * 86400)
+            return slot_proposer.propose(index, request_ids, count)
+        except Exception as e:
+            logger.error("Failed to propose calendar slots", error=str(e))
+            raise EmailProcessingError(f"Failed to propose calendar slots: {e}")
+
+    def _busy_index(self, calendar_id: str, start: float, end: float) -> BusyIntervalIndex:
+        """Busy-interval index covering [start, end), loaded through the free/busy API when not cached"""
+        def load(window_start: float, window_end: float) -> List[tuple]:
+            response = self.service.freebusy().query(body={
+                'timeMin': format_time(window_start),
+                'timeMax': format_time(window_end),
+                'timeZone': settings.timezone,
+                'items': [{'id': calendar_id}]
+            }).execute()
+
+            calendar = response.get('calendars', {}).get(calendar_id, {})
+            if calendar.get('errors'):
+                raise EmailProcessingError(f"Free/busy query failed: {calendar['errors']}")
+            return [(parse_time(busy['start']), parse_time(busy['end'])) for busy in calendar.get('busy', [])]
+
+        return busy_intervals.get(calendar_id, start, end, load)
@@ -6,181 +6,223 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from crewai_tools import BaseTool
 from config.settings import settings
-from utils.logger import logger
+from utils.logger import get_logger
+from utils.metrics import instrument_tool
+from utils.retry import with_retries
 from utils.security import SecurityManager
+from utils.error_handlers import EmailProcessingError
+
+logger = get_logger(__name__)
 
 class GmailTool(BaseTool):
     name: str = "Gmail Tool"
-        description: str = "Interacts with Gmail for reading and sending emails"
-            
-                def __init__(self):
-                        super().__init__()
-                                self.credentials = Credentials(
-                                            token=settings.google_refresh_token,
-                                                        refresh_token=settings.google_refresh_token,
-                                                                    client_id=settings.google_client_id,
-                                                                                client_secret=settings.google_client_secret,
-                                                                                            token_uri="https://oauth2.googleapis.com/token"
-                                                                                                    )
-                                                                                                            self.service = build('gmail', 'v1', credentials=self.credentials)
-                                                                                                                
-                                                                                                                    def _run(self, operation: str, **kwargs) -> Dict[str, Any]:
-                                                                                                                            """Execute Gmail operations"""
-                                                                                                                                    try:
-                                                                                                                                                if operation == "get_messages":
-                                                                                                                                                                return self._get_messages(**kwargs)
-                                                                                                                                                                            elif operation == "get_thread":
-                                                                                                                                                                                            return self._get_thread(**kwargs)
-                                                                                                                                                                                                        elif operation == "send_email":
-                                                                                                                                                                                                                        return self._send_email(**kwargs)
-                                                                                                                                                                                                                                    elif operation == "reply_to_message":
-                                                                                                                                                                                                                                                    return self._reply_to_message(**kwargs)
-                                                                                                                                                                                                                                                                else:
-                                                                                                                                                                                                                                                                                raise ValueError(f"Unknown operation: {operation}")
-                                                                                                                                                                                                                                                                                        except HttpError as e:
-                                                                                                                                                                                                                                                                                                    logger.error("Gmail API error", error=str(e))
-                                                                                                                                                                                                                                                                                                                raise EmailProcessingError(f"Gmail API error: {e}")
-                                                                                                                                                                                                                                                                                                                        except Exception as e:
-                                                                                                                                                                                                                                                                                                                                    logger.error("Unexpected error in Gmail tool", error=str(e))
-                                                                                                                                                                                                                                                                                                                                                raise EmailProcessingError(f"Unexpected error: {e}")
-                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                        def _get_messages(self, max_results: int = 10, label_ids: List[str] = None) -> List[Dict[str, Any]]:
-                                                                                                                                                                                                                                                                                                                                                                """Get messages from Gmail"""
-                                                                                                                                                                                                                                                                                                                                                                        try:
-                                                                                                                                                                                                                                                                                                                                                                                    result = self.service.users().messages().list(
-                                                                                                                                                                                                                                                                                                                                                                                                    userId='me',
-                                                                                                                                                                                                                                                                                                                                                                                                                    maxResults=max_results,
-                                                                                                                                                                                                                                                                                                                                                                                                                                    labelIds=label_ids
-                                                                                                                                                                                                                                                                                                                                                                                                                                                ).execute()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                        messages = result.get('messages', [])
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    message_details = []
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            for msg in messages:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            msg_data = self.service.users().messages().get(
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                userId='me',
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    id=msg['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        format='full'
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        ).execute()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        message_details.append(self._parse_message(msg_data))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                return message_details
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        except Exception as e:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    logger.error("Failed to get messages", error=str(e))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                raise EmailProcessingError(f"Failed to get messages: {e}")
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        def _get_thread(self, thread_id: str) -> Dict[str, Any]:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                """Get email thread by ID"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        try:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    thread = self.service.users().threads().get(
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    userId='me',
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    id=thread_id,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    format='full'
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                ).execute()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        return {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'id': thread['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'messages': [self._parse_message(msg) for msg in thread.get('messages', [])]
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    }
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            except Exception as e:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        logger.error("Failed to get thread", error=str(e))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    raise EmailProcessingError(f"Failed to get thread: {e}")
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            def _send_email(self, to: str, subject: str, body: str, thread_id: str = None) -> Dict[str, Any]:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    """Send email"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            try:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        message = self._create_message(to, subject, body, thread_id)
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    sent_message = self.service.users().messages().send(
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    userId='me',
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    body=message
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                ).execute()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        return {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'id': sent_message['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'thread_id': sent_message.get('threadId'),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'status': 'sent'
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    }
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            except Exception as e:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        logger.error("Failed to send email", error=str(e))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    raise EmailProcessingError(f"Failed to send email: {e}")
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            def _reply_to_message(self, thread_id: str, message_id: str, body: str) -> Dict[str, Any]:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    """Reply to a specific message"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            try:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        # Get the original message to extract headers
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    original = self.service.users().messages().get(
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    userId='me',
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    id=message_id,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    format='metadata',
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    metadataHeaders=['Subject', 'From', 'To']
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                ).execute()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        headers = {h['name']: h['value'] for h in original.get('payload', {}).get('headers', [])}
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                # Create reply message
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            message = self._create_message(
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            to=headers.get('From'),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            subject=f"Re: {headers.get('Subject')}",
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            body=body,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            thread_id=thread_id,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            in_reply_to=message_id
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        )
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                sent_message = self.service.users().messages().send(
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                userId='me',
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                body=message
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            ).execute()
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    return {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'id': sent_message['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'thread_id': sent_message.get('threadId'),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'status': 'sent'
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                }
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        except Exception as e:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    logger.error("Failed to reply to message", error=str(e))
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                raise EmailProcessingError(f"Failed to reply to message: {e}")
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        def _create_message(self, to: str, subject: str, body: str, thread_id: str = None, in_reply_to: str = None) -> Dict[str, Any]:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                """Create email message"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        message = f"From: me\r\nTo: {to}\r\nSubject: {subject}\r\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        if in_reply_to:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    message += f"In-Reply-To: {in_reply_to}\r\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                message += f"References: {in_reply_to}\r\n"
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                message += "\r\n" + body
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                raw_message = base64.urlsafe_b64encode(message.encode('utf-8')).decode('utf-8')
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                return {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            'raw': raw_message,
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'threadId': thread_id
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                }
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        def _parse_message(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                """Parse Gmail message data"""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        payload = message_data.get('payload', {})
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                headers = {h['name']: h['value'] for h in payload.get('headers', [])}
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                # Extract body
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        body = ""
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                if 'parts' in payload:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            for part in payload['parts']:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            if part['mimeType'] == 'text/plain':
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                body_data = part['body'].get('data', '')
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    body = base64.urlsafe_b64decode(body_data).decode('utf-8')
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            else:
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        body_data = payload.get('body', {}).get('data', '')
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    body = base64.urlsafe_b64decode(body_data).decode('utf-8')
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    return {
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                'id': message_data['id'],
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            'thread_id': message_data.get('threadId'),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'subject': headers.get('Subject', ''),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'from': headers.get('From', ''),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                'to': headers.get('To', ''),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            'date': headers.get('Date', ''),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                        'body': SecurityManager.sanitize_input(body),
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                    'snippet': message_data.get('snippet', '')
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                            }
\ No newline at end of file
+    description: str = "Interacts with Gmail for reading and sending emails"
+
+    def __init__(self):
+        super().__init__()
+        self.credentials = Credentials(
+            token=settings.google_refresh_token,
+            refresh_token=settings.google_refresh_token,
+            client_id=settings.google_client_id,
+            client_secret=settings.google_client_secret,
+            token_uri="https://oauth2.googleapis.com/token"
+        )
+        self.service = build('gmail', 'v1', credentials=self.credentials)
+
+    @instrument_tool("gmail")
+    @with_retries("gmail", non_idempotent=("send_email", "reply_to_message"))
+    def _run(self, operation: str, **kwargs) -> Dict[str, Any]:
+        """Execute Gmail operations"""
+        try:
+            if operation == "get_messages":
+                return self._get_messages(**kwargs)
+            elif operation == "get_thread":
+                return self._get_thread(**kwargs)
+            elif operation == "send_email":
+                return self._send_email(**kwargs)
+            elif operation == "reply_to_message":
+                return self._reply_to_message(**kwargs)
+            elif operation == "archive_message":
+                return self._archive_message(**kwargs)
+            else:
+                raise ValueError(f"Unknown operation: {operation}")
+        except HttpError as e:
+            logger.error("Gmail API error", error=str(e))
+            raise EmailProcessingError(f"Gmail API error: {e}")
+        except Exception as e:
+            logger.error("Unexpected error in Gmail tool", error=str(e))
+            raise EmailProcessingError(f"Unexpected error: {e}")
+
+    def _get_messages(self, max_results: int = 10, label_ids: List[str] = None, ledger=None) -> List[Dict[str, Any]]:
+        """Get messages from Gmail, skipping IDs already recorded in the ledger"""
+        try:
+            messages = []
+            page_token = None
+            while True:
+                # Pages of already-processed mail are skipped, so older unprocessed mail is still reached
+                result = self.service.users().messages().list(
+                    userId='me',
+                    maxResults=max_results if ledger is None else max(max_results, settings.gmail_list_page_size),
+                    labelIds=label_ids,
+                    pageToken=page_token
+                ).execute()
+
+                page = result.get('messages', [])
+                # Drop already-processed messages before paying for a full fetch
+                if ledger is not None and page:
+                    new_ids = ledger.filter_new([msg['id'] for msg in page])
+                    page = [msg for msg in page if msg['id'] in new_ids]
+                messages.extend(page)
+
+                page_token = result.get('nextPageToken')
+                if ledger is None or len(messages) >= max_results or not page_token:
+                    break
+
+            messages = messages[:max_results]
+            message_details = []
+
+            for msg in messages:
+                msg_data = self.service.users().messages().get(
+                    userId='me',
+                    id=msg['id'],
+                    format='full'
+                ).execute()
+
+                message_details.append(self._parse_message(msg_data))
+
+            return message_details
+        except Exception as e:
+            logger.error("Failed to get messages", error=str(e))
+            raise EmailProcessingError(f"Failed to get messages: {e}")
+
+    def _get_thread(self, thread_id: str) -> Dict[str, Any]:
+        """Get email thread by ID"""
+        try:
+            thread = self.service.users().threads().get(
+                userId='me',
+                id=thread_id,
+                format='full'
+            ).execute()
+
+            return {
+                'id': thread['id'],
+                'messages': [self._parse_message(msg) for msg in thread.get('messages', [])]
+            }
+        except Exception as e:
+            logger.error("Failed to get thread", error=str(e))
+            raise EmailProcessingError(f"Failed to get thread: {e}")
+
+    def _send_email(self, to: str, subject: str, body: str, thread_id: str = None) -> Dict[str, Any]:
+        """Send email"""
+        try:
+            message = self._create_message(to, subject, body, thread_id)
+            sent_message = self.service.users().messages().send(
+                userId='me',
+                body=message
+            ).execute()
+
+            return {
+                'id': sent_message['id'],
+                'thread_id': sent_message.get('threadId'),
+                'status': 'sent'
+            }
+        except Exception as e:
+            logger.error("Failed to send email", error=str(e))
+            raise EmailProcessingError(f"Failed to send email: {e}")
+
+    def _reply_to_message(self, thread_id: str, message_id: str, body: str) -> Dict[str, Any]:
+        """Reply to a specific message"""
+        try:
+            # Get the original message to extract headers
+            original = self.service.users().messages().get(
+                userId='me',
+                id=message_id,
+                format='metadata',
+                metadataHeaders=['Subject', 'From', 'To']
+            ).execute()
+
+            headers = {h['name']: h['value'] for h in original.get('payload', {}).get('headers', [])}
+
+            # Create reply message
+            message = self._create_message(
+                to=headers.get('From'),
+                subject=f"Re: {headers.get('Subject')}",
+                body=body,
+                thread_id=thread_id,
+                in_reply_to=message_id
+            )
+
+            sent_message = self.service.users().messages().send(
+                userId='me',
+                body=message
+            ).execute()
+
+            return {
+                'id': sent_message['id'],
+                'thread_id': sent_message.get('threadId'),
+                'status': 'sent'
+            }
+        except Exception as e:
+            logger.error("Failed to reply to message", error=str(e))
+            raise EmailProcessingError(f"Failed to reply to message: {e}")
+
+    def _archive_message(self, message_id: str) -> Dict[str, Any]:
+        """Archive a message by removing it from the inbox"""
+        try:
+            self.service.users().messages().modify(
+                userId='me',
+                id=message_id,
+                body={'removeLabelIds': ['INBOX']}
+            ).execute()
+
+            return {
+                'id': message_id,
+                'status': 'archived'
+            }
+        except Exception as e:
+            logger.error("Failed to archive message", error=str(e))
+            raise EmailProcessingError(f"Failed to archive message: {e}")
+
+    def _create_message(self, to: str, subject: str, body: str, thread_id: str = None, in_reply_to: str = None) -> Dict[str, Any]:
+        """Create email message"""
+        message = f"From: me\r\nTo: {to}\r\nSubject: {subject}\r\n"
+
+        if in_reply_to:
+            message += f"In-Reply-To: {in_reply_to}\r\n"
+            message += f"References: {in_reply_to}\r\n"
+
+        message += "\r\n" + body
+
+        raw_message = base64.urlsafe_b64encode(message.encode('utf-8')).decode('utf-8')
+
+        return {
+            'raw': raw_message,
+            'threadId': thread_id
+        }
+
+    def _parse_message(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Parse Gmail message data"""
+        payload = message_data.get('payload', {})
+        headers = {h['name']: h['value'] for h in payload.get('headers', [])}
+
+        # Extract body
+        body = ""
+        if 'parts' in payload:
+            for part in payload['parts']:
+                if part['mimeType'] == 'text/plain':
+                    body_data = part['body'].get('data', '')
+                    body = base64.urlsafe_b64decode(body_data).decode('utf-8')
+        else:
+            body_data = payload.get('body', {}).get('data', '')
+            body = base64.urlsafe_b64decode(body_data).decode('utf-8')
+
+        return {
+            'id': message_data['id'],
+            'thread_id': message_data.get('threadId'),
+            'subject': headers.get('Subject', ''),
+            'from': headers.get('From', ''),
+            'to': headers.get('To', ''),
+            'date': headers.get('Date', ''),
+            'body': SecurityManager.sanitize_input(body),
+            'snippet': message_data.get('snippet', '')
+        }
\ No newline at end of file
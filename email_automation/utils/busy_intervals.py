@@ -0,0 +1,168 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Tuple, Callable, Optional
+from zoneinfo import ZoneInfo
+from config.settings import settings
+
+def parse_time(value: str) -> float:
+    """ISO 8601 date-time (or all-day date) to epoch seconds; naive values are in settings.timezone"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=ZoneInfo(settings.timezone))
+    return parsed.timestamp()
+
+def format_time(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat().replace('+00:00', 'Z')
+
+class BusyIntervalIndex:
+    """Busy intervals of one calendar window, merged into disjoint sorted arrays.
+
+    With the intervals disjoint and sorted, both arrays are sorted, so the
+    first interval ending after a point is one bisect away. Availability
+    checks are O(log n). Slot searches are O(log n) plus the gaps they walk.
+    """
+
+    def __init__(self, window_start: float, window_end: float, intervals: List[Tuple[float, float]] = ()):
+        self.window_start = window_start
+        self.window_end = window_end
+        self.starts: List[float] = []
+        self.ends: List[float] = []
+        merged_start = merged_end = None
+        for start, end in sorted(intervals):
+            if merged_end is not None and start <= merged_end:
+                merged_end = max(merged_end, end)
+                continue
+            if merged_end is not None:
+                self.starts.append(merged_start)
+                self.ends.append(merged_end)
+            merged_start, merged_end = start, end
+        if merged_end is not None:
+            self.starts.append(merged_start)
+            self.ends.append(merged_end)
+
+    def covers(self, start: float, end: float) -> bool:
+        return self.window_start <= start and end <= self.window_end
+
+    def conflicts(self, start: float, end: float) -> List[Tuple[float, float]]:
+        """Busy intervals overlapping [start, end)"""
+        first = bisect_right(self.ends, start)
+        last = bisect_left(self.starts, end)
+        return list(zip(self.starts[first:last], self.ends[first:last]))
+
+    def is_free(self, start: float, end: float) -> bool:
+        first = bisect_right(self.ends, start)
+        return first == len(self.starts) or self.starts[first] >= end
+
+    def free_slots(self, start: float, end: float, duration: float, count: int,
+                   step: float = None) -> List[Tuple[float, float]]:
+        """First count slots of duration inside [start, end) that avoid every busy interval.
+
+        With step, slot starts are rounded up to multiples of step (e.g. the
+        half hour), and consecutive slots in one gap are step apart.
+        """
+        step = step or duration
+        slots = []
+        cursor = self._align(start, step)
+        index = bisect_right(self.ends, cursor)
+        while len(slots) < count and cursor + duration <= end:
+            if index < len(self.starts) and self.starts[index] < cursor + duration:
+                # The slot would run into the next busy interval: skip past it
+                cursor = self._align(max(cursor, self.ends[index]), step)
+                index += 1
+                continue
+            slots.append((cursor, cursor + duration))
+            cursor += step
+        return slots
+
+    def add(self, start: float, end: float) -> None:
+        """Mark [start, end) busy, merging with the intervals it touches"""
+        first = bisect_left(self.ends, start)
+        last = bisect_right(self.starts, end)
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+            del self.starts[first:last]
+            del self.ends[first:last]
+        insort(self.starts, start)
+        self.ends.insert(bisect_left(self.starts, start), end)
+
+    @staticmethod
+    def _align(value: float, step: float) -> float:
+        return -(-value // step) * step
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+class BusyIntervalCache:
+    """Per-calendar busy-interval indexes, loaded for a window and reused until they expire.
+
+    A query outside the cached window reloads a window that covers it and
+    extends calendar_busy_window_days from now. Callers ask for that same
+    horizon from their own now, which always ends a little past the cached
+    window; the cached window serves them, clamped to its end, as long as
+    it still reaches at least a day less far ahead. Events created through
+    CalendarTool are added to the cached index, so later checks see them
+    without another API call.
+    """
+
+    def __init__(self, ttl_seconds: float = None, window_days: float = None):
+        self.ttl_seconds = ttl_seconds or settings.calendar_busy_cache_seconds
+        self.window_days = window_days or settings.calendar_busy_window_days
+        # A loaded window keeps serving rolling-horizon queries until this much of it has elapsed
+        self.horizon_slack = min(86400.0, self.window_days * 86400 / 2)
+        self._indexes: Dict[str, Tuple[float, BusyIntervalIndex]] = {}
+        self._lock = threading.Lock()
+        self._stats = {'queries': 0, 'loads': 0}
+
+    def get(self, calendar_id: str, start: float, end: float,
+            loader: Callable[[float, float], List[Tuple[float, float]]]) -> BusyIntervalIndex:
+        """Index covering [start, end), loading busy intervals through loader(window_start, window_end) if needed"""
+        with self._lock:
+            self._stats['queries'] += 1
+            cached = self._indexes.get(calendar_id)
+            if cached is not None:
+                loaded_at, index = cached
+                now = time.time()
+                if now - loaded_at < self.ttl_seconds and index.covers(start, self._clamp(index, end, now)):
+                    return index
+
+            now = time.time()
+            window_start = min(start, now)
+            window_end = max(end, now + self.window_days * 86400)
+            index = BusyIntervalIndex(window_start, window_end, loader(window_start, window_end))
+            self._indexes[calendar_id] = (now, index)
+            self._stats['loads'] += 1
+            return index
+
+    def _clamp(self, index: BusyIntervalIndex, end: float, now: float) -> float:
+        """end, or the window's end for a rolling-horizon query the window still reaches far enough into"""
+        if (index.window_end < end <= index.window_end + self.horizon_slack
+                and index.window_end - now >= self.window_days * 86400 - self.horizon_slack):
+            return index.window_end
+        return end
+
+    def mark_busy(self, calendar_id: str, start: float, end: float) -> None:
+        with self._lock:
+            cached = self._indexes.get(calendar_id)
+            if cached is not None:
+                cached[1].add(start, end)
+
+    def invalidate(self, calendar_id: Optional[str] = None) -> None:
+        with self._lock:
+            if calendar_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(calendar_id, None)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Availability queries answered vs. free/busy API calls made"""
+        with self._lock:
+            return dict(
+                self._stats,
+                cached_calendars=len(self._indexes),
+                busy_intervals=sum(len(index) for _, index in self._indexes.values())
+            )
+
+busy_intervals = BusyIntervalCache()
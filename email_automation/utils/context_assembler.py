@@ -0,0 +1,109 @@
+from typing import Dict, Any, List, FrozenSet
+from config.settings import settings
+from utils.document import analyze_email, token_set_for
+from utils.tokenizer import count_tokens, truncate_tokens
+from utils.thread_summaries import thread_summaries
+
+CONTEXT_SECTIONS = ["body", "thread", "contact_notes"]
+
+class ContextAssembler:
+    """Fit an email's prompt context into per-section token budgets.
+
+    The body keeps its head. Thread messages and contact notes are ranked by
+    recency plus token overlap with the email. The best-ranked items are kept
+    until the section budget is spent, and they are rendered in their
+    original order. The most recent item always ranks first and is truncated
+    rather than dropped when it alone exceeds the budget.
+    """
+
+    def __init__(self, budgets: Dict[str, int] = None, recency_weight: float = None):
+        self.budgets = budgets or settings.context_token_budgets
+        self.recency_weight = settings.context_recency_weight if recency_weight is None else recency_weight
+        self._stats = {
+            section: {'calls': 0, 'original_tokens': 0, 'kept_tokens': 0, 'items_dropped': 0}
+            for section in CONTEXT_SECTIONS
+        }
+
+    def assemble(self, email_data: Dict[str, Any]) -> Dict[str, str]:
+        """Return the trimmed 'body', 'thread_summary' and 'contact_notes' prompt sections"""
+        analysis = analyze_email(email_data)
+
+        body = email_data.get('body', '')
+        body_tokens = count_tokens(body)
+        trimmed_body = truncate_tokens(body, self.budgets['body'])
+        self._record('body', body_tokens, count_tokens(trimmed_body), 0)
+
+        # Gmail returns thread messages oldest first; the email itself is part of its thread.
+        # Summaries come from the per-thread store, so only new replies are summarized.
+        thread_data = email_data.get('thread_data') or {}
+        entries = [
+            entry for entry in thread_summaries.entries_for(
+                email_data.get('thread_id') or thread_data.get('id'), thread_data.get('messages') or []
+            )
+            if entry['message_id'] != email_data.get('id')
+        ]
+        thread = self._select('thread', [entry['summary'] for entry in entries],
+                              list(reversed(range(len(entries)))), analysis.token_set,
+                              [entry['tokens'] for entry in entries])
+
+        # HubSpot returns notes newest first
+        note_items = [note.get('body', '') for note in email_data.get('contact_notes') or []]
+        notes = self._select('contact_notes', note_items, list(range(len(note_items))), analysis.token_set)
+
+        return {
+            'body': trimmed_body,
+            'thread_summary': "\n---\n".join(thread) if thread else "No previous thread",
+            'contact_notes': "; ".join(notes)
+        }
+
+    def _select(self, section: str, items: List[str], ages: List[int], email_tokens: FrozenSet[int],
+                costs: List[int] = None) -> List[str]:
+        """Pick items (age 0 = most recent) by recency and relevance within the section budget"""
+        if not items:
+            self._record(section, 0, 0, 0)
+            return []
+
+        budget = self.budgets[section]
+        costs = costs or [count_tokens(item) for item in items]
+
+        def score(index: int) -> float:
+            recency = 1.0 - ages[index] / len(items)
+            # Share of the item's words that also occur in the email
+            item_tokens = token_set_for(items[index])
+            relevance = len(email_tokens & item_tokens) / len(item_tokens) if item_tokens else 0.0
+            return self.recency_weight * recency + (1.0 - self.recency_weight) * relevance
+
+        newest = ages.index(0)
+        ranked = [newest] + sorted((i for i in range(len(items)) if i != newest), key=score, reverse=True)
+
+        kept: Dict[int, str] = {}
+        used = 0
+        for index in ranked:
+            if used + costs[index] <= budget:
+                kept[index] = items[index]
+                used += costs[index]
+            elif index == newest:
+                kept[index] = truncate_tokens(items[index], budget)
+                used += count_tokens(kept[index])
+
+        self._record(section, sum(costs), used, len(items) - len(kept))
+        return [kept[index] for index in sorted(kept)]
+
+    def _record(self, section: str, original: int, kept: int, dropped: int) -> None:
+        stats = self._stats[section]
+        stats['calls'] += 1
+        stats['original_tokens'] += original
+        stats['kept_tokens'] += kept
+        stats['items_dropped'] += dropped
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Original vs. kept tokens per section"""
+        metrics = {}
+        for section, stats in self._stats.items():
+            metrics[section] = dict(stats)
+            metrics[section]['kept_ratio'] = (
+                stats['kept_tokens'] / stats['original_tokens'] if stats['original_tokens'] else 1.0
+            )
+        return metrics
+
+context_assembler = ContextAssembler()
@@ -0,0 +1,135 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List
+from config.settings import settings
+from utils.logger import get_logger
+from utils.error_handlers import is_retryable
+
+logger = get_logger(__name__)
+
+# Pipeline stages in order; a replay resumes at the stage that failed
+STAGES = ("enrich", "fast_path", "categorize", "process")
+
+# Derived per-process state that is rebuilt on replay rather than stored
+TRANSIENT_KEYS = ('analysis',)
+
+class DeadLetterStore:
+    """Persistent record of emails that failed a pipeline stage.
+
+    Each entry, keyed by email ID, keeps the stage that failed, the error,
+    and a JSON snapshot of that stage's input: the Gmail message for
+    enrich, the enriched email from fast_path on, plus the categorization
+    for process. Recording an email that is already stored updates the
+    entry and counts another attempt. Entries are removed once a replay
+    gets the email through. The store is an SQLite file, so the replay
+    command can read it while the service keeps adding to it.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.dead_letter_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {'recorded': 0, 'record_failures': 0, 'resolved': 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dead_letters ("
+                "email_id TEXT PRIMARY KEY, stage TEXT NOT NULL, error_type TEXT NOT NULL, "
+                "error TEXT NOT NULL, retryable INTEGER NOT NULL, snapshot TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL, first_failed_at REAL NOT NULL, last_failed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS dead_letters_stage ON dead_letters (stage, last_failed_at)")
+            self._conn = conn
+        return self._conn
+
+    def record(self, stage: str, email_data: Dict[str, Any], error: Exception,
+               categorization: Dict[str, Any] = None) -> bool:
+        """Store the email's input to the failed stage; False if it could not be stored"""
+        if stage not in STAGES:
+            raise ValueError(f"Unknown pipeline stage: {stage}")
+        snapshot = {'email': {key: value for key, value in email_data.items() if key not in TRANSIENT_KEYS}}
+        if categorization is not None:
+            snapshot['categorization'] = categorization
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    conn.execute(
+                        "INSERT INTO dead_letters (email_id, stage, error_type, error, retryable, snapshot, "
+                        "attempts, first_failed_at, last_failed_at) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?) "
+                        "ON CONFLICT (email_id) DO UPDATE SET stage = excluded.stage, "
+                        "error_type = excluded.error_type, error = excluded.error, retryable = excluded.retryable, "
+                        "snapshot = excluded.snapshot, attempts = attempts + 1, last_failed_at = excluded.last_failed_at",
+                        (email_data['id'], stage, type(error).__name__, str(error), int(is_retryable(error)),
+                         json.dumps(snapshot, default=str), now, now)
+                    )
+                self._stats['recorded'] += 1
+        except Exception as e:
+            with self._lock:
+                self._stats['record_failures'] += 1
+            logger.error("Failed to record dead letter", email_id=email_data.get('id'), stage=stage, error=str(e))
+            return False
+        logger.warning("Email dead-lettered", email_id=email_data['id'], stage=stage, error=str(error))
+        return True
+
+    def pending(self, stage: str = None, limit: int = None, email_ids: List[str] = None) -> List[Dict[str, Any]]:
+        """Stored entries, oldest failure first, with the snapshot decoded"""
+        query = "SELECT * FROM dead_letters"
+        clauses, params = [], []
+        if stage is not None:
+            clauses.append("stage = ?")
+            params.append(stage)
+        if email_ids:
+            clauses.append(f"email_id IN ({','.join('?' * len(email_ids))})")
+            params.extend(email_ids)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY first_failed_at"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor]
+        for row in rows:
+            row['snapshot'] = json.loads(row['snapshot'])
+            row['retryable'] = bool(row['retryable'])
+        return rows
+
+    def resolve(self, email_id: str) -> None:
+        """Forget an email that has now gone through"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                deleted = conn.execute("DELETE FROM dead_letters WHERE email_id = ?", (email_id,)).rowcount
+            self._stats['resolved'] += deleted
+
+    def counts(self) -> Dict[str, int]:
+        """Stored entries per failed stage"""
+        with self._lock:
+            conn = self._connection()
+            return dict(conn.execute("SELECT stage, COUNT(*) FROM dead_letters GROUP BY stage").fetchall())
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Entries recorded and resolved by this process, and entries stored per stage"""
+        counts = self.counts()
+        with self._lock:
+            return dict(self._stats, pending=sum(counts.values()),
+                        pending_by_stage={stage: counts.get(stage, 0) for stage in STAGES})
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+dead_letters = DeadLetterStore()
@@ -0,0 +1,99 @@
+import re
+import threading
+from array import array
+from functools import lru_cache
+from typing import Dict, Any, List, FrozenSet
+from utils.rule_sets import rule_sets
+
+# A question is a run of non-terminators ending in '?'. Anchoring matches to the
+# start of a run gives the same results as r'[^.!?]*\?' without rescanning long
+# runs from every offset (quadratic on bodies with little punctuation).
+QUESTION_PATTERN = re.compile(r'(?:^|(?<=[.!?]))[^.!?]*\?')
+
+class TokenVocabulary:
+    """Assigns stable integer IDs to tokens for the lifetime of the process.
+
+    The table is capped. Once it is full, new tokens hash into a fixed range
+    above the cap, so memory stays bounded while IDs remain usable for set
+    overlap.
+    """
+
+    def __init__(self, max_size: int = 500_000, overflow_buckets: int = 1 << 20):
+        self.max_size = max_size
+        self.overflow_buckets = overflow_buckets
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def ids_for(self, tokens: List[str]) -> array:
+        ids = self._ids
+        result = array('I')
+        for token in tokens:
+            token_id = ids.get(token)
+            if token_id is None:
+                token_id = self._assign(token)
+            result.append(token_id)
+        return result
+
+    def _assign(self, token: str) -> int:
+        with self._lock:
+            token_id = self._ids.get(token)
+            if token_id is not None:
+                return token_id
+            if len(self._ids) < self.max_size:
+                token_id = len(self._ids)
+                self._ids[token] = token_id
+                return token_id
+        return self.max_size + hash(token) % self.overflow_buckets
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+vocabulary = TokenVocabulary()
+
+class AnalyzedDocument:
+    """Text features of one email, computed once at ingestion and shared by every stage"""
+
+    __slots__ = ('normalized', 'body_normalized', 'tokens', 'token_ids', 'token_set',
+                 'questions', 'rules', 'category_hits', 'email_hits', 'positive_count', 'negative_count',
+                 'content_hash', 'exact_content_hash')
+
+    def __init__(self, subject: str, body: str):
+        self.body_normalized = body.lower()
+        self.normalized = subject.lower() + "\n" + self.body_normalized
+        self.tokens = self.normalized.split()
+        self.token_ids = vocabulary.ids_for(self.tokens)
+        self.token_set = frozenset(self.token_ids)
+        self.questions = [q.strip() for q in QUESTION_PATTERN.findall(body) if q.strip()]
+        # Every stage reads the rule set the email was analyzed with, even across a reload
+        self.rules = rule_sets.current
+        self.category_hits = self.rules.category.match_lowered(self.normalized)
+        self.email_hits = self.rules.email.match_lowered(self.body_normalized)
+        self.positive_count = len(self.email_hits['positive'])
+        self.negative_count = len(self.email_hits['negative'])
+        self.content_hash = None  # filled in by utils.memo_cache on first use
+        self.exact_content_hash = None
+
+    @property
+    def sentiment(self) -> str:
+        if self.positive_count > self.negative_count:
+            return 'positive'
+        elif self.negative_count > self.positive_count:
+            return 'negative'
+        return 'neutral'
+
+    def requires_escalation(self, sender: str) -> bool:
+        """Sensitive topics and executive senders always go to a human, whatever the draft's quality"""
+        return bool(self.email_hits['sensitive']) or bool(self.rules.executive.match(sender)['executive'])
+
+def analyze_email(email_data: Dict[str, Any]) -> AnalyzedDocument:
+    """Return the email's analyzed document, building it on first use"""
+    analysis = email_data.get('analysis')
+    if analysis is None:
+        analysis = AnalyzedDocument(email_data.get('subject', ''), email_data.get('body', ''))
+        email_data['analysis'] = analysis
+    return analysis
+
+@lru_cache(maxsize=4096)
+def token_set_for(text: str) -> FrozenSet[int]:
+    """Token-ID set of a reference text (e.g. a knowledge item), cached across emails"""
+    return frozenset(vocabulary.ids_for(text.lower().split()))
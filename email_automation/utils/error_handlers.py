@@ -1,36 +1,119 @@
+import time
 import traceback
-from typing import Dict, Any
-from utils.logger import logger
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Iterator, Optional
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class EmailAutomationError(Exception):
     """Base exception for email automation system"""
-        pass
+    pass
+
+class EmailProcessingError(EmailAutomationError):
+    """Raised when email processing fails"""
+    pass
+
+class CRMIntegrationError(EmailAutomationError):
+    """Raised when CRM integration fails"""
+    pass
+
+class KnowledgeBaseError(EmailAutomationError):
+    """Raised when knowledge base operations fail"""
+    pass
+
+class CircuitOpenError(EmailAutomationError):
+    """Raised instead of calling a service whose circuit breaker is open"""
+    pass
+
+# Statuses that say the request may succeed later
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# Statuses that say the request was not processed, so even non-idempotent requests can be repeated
+NOT_PROCESSED_STATUSES = {425, 429, 503}
+# Transport errors, matched by class name (including base classes) so no API client library has to be imported
+TRANSIENT_ERROR_NAMES = {'ConnectionError', 'TimeoutError', 'Timeout', 'TransportError', 'ServerNotFoundError',
+                         'RemoteDisconnected'}
+# Transport errors raised before the request reached the server
+NOT_SENT_ERROR_NAMES = {'ConnectionRefusedError', 'ConnectTimeout', 'ConnectError', 'ServerNotFoundError',
+                        'PoolTimeout'}
+
+def error_chain(error: BaseException) -> Iterator[BaseException]:
+    """The error and the errors it was raised from or while handling; tools wrap API errors in their own types"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
 
-        class EmailProcessingError(EmailAutomationError):
-            """Raised when email processing fails"""
+def http_status(error: BaseException) -> Optional[int]:
+    """HTTP status of the first API error in the chain (googleapiclient, HubSpot, requests, httpx, postgrest)"""
+    for cause in error_chain(error):
+        response = getattr(cause, 'resp', None)
+        if response is None:
+            response = getattr(cause, 'response', None)
+        for status in (getattr(cause, 'status', None), getattr(cause, 'status_code', None),
+                       getattr(response, 'status', None), getattr(response, 'status_code', None)):
+            try:
+                if status is not None:
+                    return int(status)
+            except (TypeError, ValueError):
+                continue
+        code = getattr(cause, 'code', None)
+        if isinstance(code, str) and code.isdigit() and len(code) == 3:
+            return int(code)
+    return None
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked to wait (Retry-After as seconds or an HTTP date), if it did"""
+    for cause in error_chain(error):
+        response = getattr(cause, 'resp', None)
+        if response is None:
+            response = getattr(cause, 'response', None)
+        for headers in (getattr(cause, 'headers', None), getattr(response, 'headers', None), response):
+            if not hasattr(headers, 'get'):
+                continue
+            value = headers.get('Retry-After') or headers.get('retry-after')
+            if value is None:
+                continue
+            try:
+                return max(0.0, float(value))
+            except (TypeError, ValueError):
+                pass
+            try:
+                return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+            except (TypeError, ValueError):
                 pass
+    return None
+
+def is_retryable(error: BaseException, idempotent: bool = True) -> bool:
+    """Whether repeating the failed call may succeed.
+
+    Server errors, throttling and transport errors are retryable; client
+    errors and programming errors are not. A call that is not idempotent
+    (sending an email, creating a record) is only repeated when the request
+    was never processed, so a retry cannot create a duplicate.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = http_status(error)
+    if status is not None:
+        return status in (RETRYABLE_STATUSES if idempotent else NOT_PROCESSED_STATUSES)
+    names = {klass.__name__ for cause in error_chain(error) for klass in type(cause).__mro__}
+    return bool(names & (TRANSIENT_ERROR_NAMES if idempotent else NOT_SENT_ERROR_NAMES))
+
+def handle_error(error: Exception, context: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Handle errors with proper logging and context"""
+    error_details = {
+        "error_type": type(error).__name__,
+        "error_message": str(error),
+        "traceback": traceback.format_exc(),
+        "context": context or {}
+    }
+
+    logger.error("Error occurred", **error_details)
 
-                class CRMIntegrationError(EmailAutomationError):
-                    """Raised when CRM integration fails"""
-                        pass
-
-                        class KnowledgeBaseError(EmailAutomationError):
-                            """Raised when knowledge base operations fail"""
-                                pass
-
-                                def handle_error(error: Exception, context: Dict[str, Any] = None) -> Dict[str, Any]:
-                                    """Handle errors with proper logging and context"""
-                                        error_details = {
-                                                "error_type": type(error).__name__,
-                                                        "error_message": str(error),
-                                                                "traceback": traceback.format_exc(),
-                                                                        "context": context or {}
-                                                                            }
-                                                                                
-                                                                                    logger.error("Error occurred", **error_details)
-                                                                                        
-                                                                                            return {
-                                                                                                    "success": False,
-                                                                                                            "error": error_details,
-                                                                                                                    "retryable": isinstance(error, (EmailProcessingError, CRMIntegrationError))
-                                                                                                                        }
\ No newline at end of file
+    return {
+        "success": False,
+        "error": error_details,
+        "retryable": is_retryable(error)
+    }
\ No newline at end of file
@@ -0,0 +1,103 @@
+import time
+from typing import Dict, Any, Optional
+from config.settings import settings
+from utils.logger import get_logger
+from utils.priority_queue import LatencyStats
+
+logger = get_logger(__name__)
+
+FULL_PIPELINE = "full_pipeline"
+FAST_PATH_OUTCOMES = ["archive", "no_reply", "acknowledge"]
+
+class FastPathRouter:
+    """Route rule-decidable emails to a canned outcome instead of the agent stages"""
+
+    def __init__(self, categorizer, response_generator, supabase_tool, gmail_tool,
+                 enabled: bool = None, min_confidence: float = None, routes: Dict[str, str] = None,
+                 signal_min_confidence: Dict[str, float] = None):
+        self.categorizer = categorizer
+        self.response_generator = response_generator
+        self.supabase_tool = supabase_tool
+        self.gmail_tool = gmail_tool
+        self.enabled = settings.fast_path_enabled if enabled is None else enabled
+        self.min_confidence = settings.fast_path_min_confidence if min_confidence is None else min_confidence
+        self.routes = routes if routes is not None else settings.fast_path_routes
+        self.signal_min_confidence = (signal_min_confidence if signal_min_confidence is not None
+                                      else settings.fast_path_signal_min_confidence)
+        self.route_stats = {
+            route: LatencyStats(float('inf'))
+            for route in FAST_PATH_OUTCOMES + [FULL_PIPELINE]
+        }
+
+    def route(self, email_data: Dict[str, Any]) -> Optional[str]:
+        """Handle the email on the fast path if possible; returns the outcome, or None for the full pipeline"""
+        if not self.enabled:
+            return None
+
+        started = time.perf_counter()
+        decision = self.categorizer.classify_with_rules(email_data)
+        outcome = self.routes.get(decision['signal'])
+
+        min_confidence = self.signal_min_confidence.get(decision['signal'], self.min_confidence)
+        if outcome not in FAST_PATH_OUTCOMES or decision['confidence'] < min_confidence:
+            return None
+
+        self._apply_outcome(email_data, decision, outcome)
+        self.route_stats[outcome].record(time.perf_counter() - started)
+
+        logger.info("Email handled on fast path",
+                   email_id=email_data['id'],
+                   outcome=outcome,
+                   signal=decision['signal'],
+                   confidence=decision['confidence'])
+        return outcome
+
+    def record_full_pipeline(self, seconds: float) -> None:
+        """Record the cost of an email that went through every agent stage"""
+        self.route_stats[FULL_PIPELINE].record(seconds)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Per-route counts and latency, plus the share of mail kept off the agent stages"""
+        total = sum(stats.count for stats in self.route_stats.values())
+        fast = sum(self.route_stats[route].count for route in FAST_PATH_OUTCOMES)
+        return {
+            'routes': {
+                route: {
+                    'count': stats.count,
+                    'mean_seconds': stats.summary()['mean'],
+                    'p95_seconds': stats.percentile(95)
+                }
+                for route, stats in self.route_stats.items()
+            },
+            'fast_path_ratio': fast / total if total else 0.0
+        }
+
+    def _apply_outcome(self, email_data: Dict[str, Any], decision: Dict[str, Any], outcome: str) -> None:
+        """Persist the canned outcome and perform its mailbox action"""
+        update_data = {
+            'category': decision['category'],
+            'importance': decision['importance'],
+            'categorization_reasoning': f"{decision['reasoning']} (fast path: {decision['signal']})",
+            'fast_path_route': outcome
+        }
+
+        if outcome == "acknowledge":
+            sender_name = self.response_generator._extract_sender_name(email_data['from'])
+            acknowledgement = self.response_generator._generate_general_response(sender_name, email_data['body'])
+            update_data.update({
+                'response_type': 'acknowledgement',
+                'draft_response': acknowledgement,
+                'final_response': acknowledgement,
+                'response_required': True
+            })
+        else:
+            update_data.update({
+                'response_type': outcome,
+                'response_required': False
+            })
+
+        self.supabase_tool._run("update_email", email_id=email_data['id'], update_data=update_data)
+
+        if outcome == "archive":
+            self.gmail_tool._run("archive_message", message_id=email_data['id'])
+
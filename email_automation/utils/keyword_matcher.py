@@ -0,0 +1,63 @@
+from typing import Dict, Iterable, List, Set
+
+try:
+    import ahocorasick
+except ImportError:  # optional: fall back to substring scans over one lowercased copy
+    ahocorasick = None
+
+class KeywordMatcher:
+    """Match several named keyword lists against a text in a single call.
+
+    Matching keeps the substring semantics of ``keyword in text.lower()``.
+    With pyahocorasick installed, all lists are compiled into one Aho-Corasick
+    automaton and the text is scanned once. Without it, each distinct keyword
+    is searched once in a single lowercased copy. In CPython that beats a
+    combined regex, because ``str.__contains__`` runs in C and an alternation
+    is tried at every offset.
+    """
+
+    def __init__(self, keyword_sets: Dict[str, Iterable[str]]):
+        self.keyword_sets: Dict[str, List[str]] = {
+            name: [keyword.lower() for keyword in keywords]
+            for name, keywords in keyword_sets.items()
+        }
+
+        # keyword -> names of the sets it belongs to
+        self._owners: Dict[str, List[str]] = {}
+        for name, keywords in self.keyword_sets.items():
+            for keyword in keywords:
+                owners = self._owners.setdefault(keyword, [])
+                if name not in owners:
+                    owners.append(name)
+        self.max_length = max((len(keyword) for keyword in self._owners), default=0)
+
+        self._automaton = None
+        if ahocorasick is not None and self._owners:
+            automaton = ahocorasick.Automaton()
+            for keyword in self._owners:
+                automaton.add_word(keyword, keyword)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """Return the matched keywords of every set, in configured order"""
+        return self.match_lowered(text.lower())
+
+    def find_lowered(self, text: str) -> Set[str]:
+        """Distinct keywords of any set that occur in already lowercased text"""
+        if self._automaton is not None:
+            return {keyword for _, keyword in self._automaton.iter(text)}
+        return {keyword for keyword in self._owners if keyword in text}
+
+    def owners(self, keyword: str) -> List[str]:
+        """Names of the sets a keyword belongs to"""
+        return self._owners.get(keyword, [])
+
+    def match_lowered(self, text: str) -> Dict[str, List[str]]:
+        """Like match() for text that is already lowercased"""
+        found = self.find_lowered(text)
+
+        return {
+            name: [keyword for keyword in keywords if keyword in found]
+            for name, keywords in self.keyword_sets.items()
+        }
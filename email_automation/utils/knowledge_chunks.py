@@ -0,0 +1,292 @@
+import hashlib
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+from config.settings import settings
+from utils.logger import get_logger
+from utils.response_cache import content_words, llm_response_cache
+from utils.tokenizer import count_tokens, truncate_tokens
+
+logger = get_logger(__name__)
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n\s*\n+')
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def _sentences(text: str, max_tokens: int) -> List[str]:
+    """Sentences and paragraphs of text; one longer than max_tokens is split between words"""
+    units = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if count_tokens(sentence) <= max_tokens:
+            units.append(sentence)
+            continue
+        piece, used = [], 0
+        for word in sentence.split():
+            cost = count_tokens(word)
+            if piece and used + cost > max_tokens:
+                units.append(" ".join(piece))
+                piece, used = [], 0
+            piece.append(word)
+            used += cost
+        if piece:
+            units.append(" ".join(piece))
+    return units
+
+def chunk_text(text: str, chunk_tokens: int, overlap_tokens: int) -> List[Tuple[str, int]]:
+    """Split text into (chunk, overlap_chars) pairs on sentence boundaries.
+
+    Each chunk after the first starts with the trailing sentences of the
+    previous one, up to overlap_tokens. overlap_chars is the length of that
+    repeated prefix, so adjacent chunks can be joined back without repeats.
+    """
+    units = _sentences(text, chunk_tokens)
+    costs = [count_tokens(unit) for unit in units]
+
+    chunks = []
+    start, previous_end = 0, 0
+    while start < len(units):
+        end, used = start, 0
+        while end < len(units) and (end == start or used + costs[end] <= chunk_tokens):
+            used += costs[end]
+            end += 1
+
+        overlap_chars = len(" ".join(units[start:previous_end])) + 1 if previous_end > start else 0
+        chunks.append((" ".join(units[start:end]), overlap_chars))
+        if end == len(units):
+            break
+
+        next_start, carried = end, 0
+        while next_start - 1 > start and carried + costs[next_start - 1] <= overlap_tokens:
+            next_start -= 1
+            carried += costs[next_start]
+        start, previous_end = next_start, end
+    return chunks
+
+def chunk_id(article_id: str, text: str) -> str:
+    """Stable chunk ID: the same passage of the same article keeps its ID across edits elsewhere"""
+    digest = hashlib.sha1((article_id + "\0" + text).encode('utf-8')).hexdigest()
+    return f"{article_id}:{digest[:12]}"
+
+def assemble_snippets(passages: List[Dict[str, Any]], token_budget: int = None) -> str:
+    """Render retrieved passages grouped under their parent article, within a token budget.
+
+    Articles keep the rank of their best passage. Within an article the
+    passages are put back in document order, adjacent chunks are joined
+    without their repeated overlap and gaps are marked with an ellipsis.
+    """
+    token_budget = token_budget or settings.knowledge_snippet_token_budget
+
+    articles: Dict[str, List[Dict[str, Any]]] = {}
+    for passage in passages:
+        articles.setdefault(passage.get('article_id', passage.get('id')), []).append(passage)
+
+    snippets, used = [], 0
+    for article_passages in articles.values():
+        article_passages.sort(key=lambda passage: passage.get('position', 0))
+        text, previous_position = "", None
+        for passage in article_passages:
+            content = passage['content']
+            if previous_position is None:
+                text = content
+            elif passage.get('position') == previous_position + 1:
+                text += " " + content[passage.get('overlap_chars', 0):].lstrip()
+            else:
+                text += " ... " + content
+            previous_position = passage.get('position', 0)
+
+        title = article_passages[0].get('title', '')
+        snippet = f"{title}:\n{text}" if title else text
+        remaining = token_budget - used
+        if remaining <= 0:
+            break
+        snippet = truncate_tokens(snippet, remaining)
+        snippets.append(snippet)
+        used += count_tokens(snippet)
+    return "\n\n".join(snippets)
+
+class KnowledgeChunkIndex:
+    """Knowledge-base articles split into overlapping chunks, with a BM25 inverted index over the chunks.
+
+    Ingestion compares each article's fingerprint with the indexed one and
+    re-chunks only changed articles. Chunk IDs depend on the passage text, so
+    an edit only re-indexes the chunks whose text actually changed. Searching
+    returns the best passages together with their parent article's title,
+    category and source.
+    """
+
+    def __init__(self, chunk_tokens: int = None, overlap_tokens: int = None):
+        self.chunk_tokens = chunk_tokens or settings.knowledge_chunk_tokens
+        self.overlap_tokens = settings.knowledge_chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+        self.version = ""
+        self._articles: Dict[str, Dict[str, Any]] = {}
+        self._chunks: Dict[str, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+        self._stats = {'articles_chunked': 0, 'articles_unchanged': 0, 'articles_removed': 0,
+                       'chunks_added': 0, 'chunks_removed': 0, 'searches': 0}
+
+    def fingerprint(self, article: Dict[str, Any]) -> str:
+        fields = [article.get('title') or '', article.get('content') or '', article.get('category') or '',
+                  article.get('source') or '', str(self.chunk_tokens), str(self.overlap_tokens)]
+        return hashlib.sha256("\0".join(fields).encode('utf-8')).hexdigest()
+
+    def ingest(self, articles: List[Dict[str, Any]], complete: bool = False,
+               removed_ids: List[str] = ()) -> Dict[str, int]:
+        """Index new and changed articles and drop removed ones; with complete=True, also drop articles
+        missing from the list"""
+        changed = False
+        with self._lock:
+            seen = set()
+            for article in articles:
+                article_id = str(article['id'])
+                seen.add(article_id)
+                fingerprint = self.fingerprint(article)
+                indexed = self._articles.get(article_id)
+                if indexed is not None and indexed['fingerprint'] == fingerprint:
+                    self._stats['articles_unchanged'] += 1
+                    continue
+                changed = True
+                self._index_article(article_id, article, fingerprint)
+
+            if complete:
+                removed_ids = [article_id for article_id in self._articles if article_id not in seen]
+            for article_id in removed_ids:
+                indexed = self._articles.get(str(article_id))
+                if indexed is not None:
+                    changed = True
+                    self.remove_article(article_id)
+
+            if changed:
+                self.version = hashlib.sha256("".join(
+                    f"{article_id}\0{article['fingerprint']}\n" for article_id, article in sorted(self._articles.items())
+                ).encode('utf-8')).hexdigest()[:16]
+
+        if changed:
+            # Cached LLM drafts built on any earlier version may quote outdated passages
+            llm_response_cache.set_knowledge_index_version(self.version)
+            logger.info("Knowledge index updated",
+                       articles=len(self._articles),
+                       chunks=len(self._chunks),
+                       version=self.version)
+        return dict(self._stats)
+
+    def remove_article(self, article_id: str) -> None:
+        with self._lock:
+            article = self._articles.pop(str(article_id), None)
+            if article is None:
+                return
+            for existing_id in article['chunk_ids']:
+                self._remove_chunk(existing_id)
+            self._stats['articles_removed'] += 1
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Best-matching passages (BM25 over chunk text and article title), highest score first"""
+        with self._lock:
+            self._stats['searches'] += 1
+            if not self._chunks:
+                return []
+
+            chunk_count = len(self._chunks)
+            average_length = self._total_length / chunk_count
+            scores: Dict[str, float] = {}
+            for term in set(content_words(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1.0 + (chunk_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for existing_id, frequency in postings.items():
+                    length_norm = 1.0 - BM25_B + BM25_B * self._chunks[existing_id]['length'] / average_length
+                    scores[existing_id] = scores.get(existing_id, 0.0) + (
+                        idf * frequency * (BM25_K1 + 1.0) / (frequency + BM25_K1 * length_norm)
+                    )
+
+            passages = []
+            for existing_id, score in heapq.nlargest(limit, scores.items(), key=lambda item: item[1]):
+                chunk = self._chunks[existing_id]
+                article = self._articles[chunk['article_id']]
+                passages.append({
+                    'id': existing_id,
+                    'article_id': chunk['article_id'],
+                    'title': article['title'],
+                    'content': chunk['text'],
+                    'category': article['category'],
+                    'source': article['source'],
+                    'position': chunk['position'],
+                    'overlap_chars': chunk['overlap_chars'],
+                    'relevance_score': round(score, 4)
+                })
+            return passages
+
+    def _index_article(self, article_id: str, article: Dict[str, Any], fingerprint: str) -> None:
+        previous = self._articles.get(article_id)
+        title = article.get('title') or ''
+        if previous is not None and previous['title'] != title:
+            # Title words are indexed with every chunk
+            for old_id in previous['chunk_ids']:
+                self._remove_chunk(old_id)
+            previous = None
+        old_ids = set(previous['chunk_ids']) if previous else set()
+
+        chunk_ids = []
+        for position, (text, overlap_chars) in enumerate(
+                chunk_text(article.get('content') or '', self.chunk_tokens, self.overlap_tokens)):
+            new_id = chunk_id(article_id, text)
+            if new_id in chunk_ids:
+                new_id = f"{new_id}-{position}"
+            chunk_ids.append(new_id)
+            if new_id in old_ids:
+                # Unchanged passage: keep its postings, only its place in the article may have moved
+                self._chunks[new_id].update(position=position, overlap_chars=overlap_chars)
+                continue
+            self._add_chunk(new_id, article_id, position, text, overlap_chars, title)
+
+        for old_id in old_ids.difference(chunk_ids):
+            self._remove_chunk(old_id)
+
+        self._articles[article_id] = {
+            'fingerprint': fingerprint,
+            'title': title,
+            'category': article.get('category') or '',
+            'source': article.get('source') or '',
+            'chunk_ids': chunk_ids
+        }
+        self._stats['articles_chunked'] += 1
+
+    def _add_chunk(self, new_id: str, article_id: str, position: int, text: str, overlap_chars: int,
+                   title: str) -> None:
+        terms = Counter(content_words(title + " " + text))
+        length = sum(terms.values())
+        self._chunks[new_id] = {'article_id': article_id, 'position': position, 'text': text,
+                                'overlap_chars': overlap_chars, 'terms': terms, 'length': length}
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[new_id] = frequency
+        self._total_length += length
+        self._stats['chunks_added'] += 1
+
+    def _remove_chunk(self, existing_id: str) -> None:
+        chunk = self._chunks.pop(existing_id, None)
+        if chunk is None:
+            return
+        for term in chunk['terms']:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(existing_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= chunk['length']
+        self._stats['chunks_removed'] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Index size and how much ingestion work was skipped for unchanged articles"""
+        with self._lock:
+            return dict(self._stats, articles=len(self._articles), chunks=len(self._chunks),
+                        terms=len(self._postings), version=self.version)
+
+knowledge_index = KnowledgeChunkIndex()
@@ -0,0 +1,214 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
+from config.settings import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAGIC = b'KBSNAP1\n'
+HEADER = struct.Struct('<IQ')  # metadata length, record count
+
+class KnowledgeSnapshot:
+    """Local copy of the knowledge_base table in one memory-mapped file, kept current by delta syncs.
+
+    File layout: magic, header, JSON metadata (high-water ``updated_at``), a
+    table of record offsets and the zlib-compressed JSON records. Syncs ask
+    Supabase only for rows updated at or after the high-water mark. Rows with
+    a ``deleted_at`` value are removed, and an occasional ID listing catches
+    hard deletes. Applying a delta rewrites the file next to the old one and
+    swaps it in atomically, so readers never see a partial snapshot.
+    """
+
+    def __init__(self, path: str = None, sync_seconds: float = None, reconcile_seconds: float = None):
+        self.path = path or settings.knowledge_snapshot_path
+        self.sync_seconds = sync_seconds or settings.knowledge_sync_seconds
+        self.reconcile_seconds = reconcile_seconds or settings.knowledge_reconcile_seconds
+        self.high_water: Optional[str] = None
+        self.synced_at = 0.0
+        self._reconciled_at = 0.0
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._records: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.RLock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stats = {'syncs': 0, 'sync_failures': 0, 'rows_applied': 0, 'rows_deleted': 0, 'rewrites': 0}
+
+    def load(self) -> bool:
+        """Map the snapshot file if there is one; returns whether it was found"""
+        if not os.path.exists(self.path):
+            return False
+        with self._lock:
+            self._map()
+            self.synced_at = os.path.getmtime(self.path)
+        logger.info("Knowledge snapshot loaded", articles=len(self._records), high_water=self.high_water)
+        return True
+
+    def _map(self) -> None:
+        self._close()
+        self._file = open(self.path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = self._mmap
+
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a knowledge snapshot: {self.path}")
+        position = len(MAGIC)
+        metadata_length, count = HEADER.unpack_from(view, position)
+        position += HEADER.size
+        metadata = json.loads(view[position:position + metadata_length])
+        position += metadata_length
+
+        offsets = array('Q')
+        offsets.frombytes(view[position:position + 8 * (count + 1)])
+        self.high_water = metadata.get('high_water')
+        self._records = {
+            article_id: (offsets[i], offsets[i + 1]) for i, article_id in enumerate(metadata['ids'])
+        }
+
+    def _close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+        self._mmap, self._file = None, None
+
+    def _record_bytes(self, article_id: str) -> Optional[bytes]:
+        span = self._records.get(article_id)
+        return bytes(self._mmap[span[0]:span[1]]) if span is not None else None
+
+    def get(self, article_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            span = self._records.get(str(article_id))
+            if span is None:
+                return None
+            return json.loads(zlib.decompress(self._mmap[span[0]:span[1]]))
+
+    def articles(self) -> Iterator[Dict[str, Any]]:
+        """Every article in the snapshot"""
+        with self._lock:
+            return iter([self.get(article_id) for article_id in self._records])
+
+    def sync(self, fetch_changes: Callable[[Optional[str]], List[Dict[str, Any]]],
+             fetch_ids: Callable[[], List[str]] = None) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Apply rows changed since the high-water mark; returns (changed articles, removed IDs)"""
+        rows = fetch_changes(self.high_water)
+        remote_ids = None
+        if fetch_ids is not None and time.time() - self._reconciled_at >= self.reconcile_seconds:
+            remote_ids = {str(article_id) for article_id in fetch_ids()}
+            self._reconciled_at = time.time()
+
+        with self._lock:
+            updates: Dict[str, Optional[bytes]] = {}  # None removes the article
+            changed = []
+            high_water = self.high_water
+            for row in rows:
+                article_id = str(row['id'])
+                if row.get('updated_at') and (high_water is None or row['updated_at'] > high_water):
+                    high_water = row['updated_at']
+                if row.get('deleted_at'):
+                    if article_id in self._records or updates.get(article_id):
+                        updates[article_id] = None
+                    continue
+                record = zlib.compress(json.dumps(row, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8'))
+                # Rows at the high-water mark come back on the next poll; unchanged ones are skipped
+                if self._record_bytes(article_id) != record:
+                    updates[article_id] = record
+                    changed.append(row)
+
+            if remote_ids is not None:
+                for article_id in self._records:
+                    if article_id not in remote_ids:
+                        updates[article_id] = None
+
+            removed = [article_id for article_id, record in updates.items() if record is None]
+            changed = [row for row in changed if updates.get(str(row['id'])) is not None]
+            if updates or high_water != self.high_water or self._mmap is None:
+                encoded = {article_id: self._record_bytes(article_id) for article_id in self._records}
+                for article_id, record in updates.items():
+                    if record is None:
+                        encoded.pop(article_id, None)
+                    else:
+                        encoded[article_id] = record
+                self._write(encoded, high_water)
+
+            self.synced_at = time.time()
+            self._stats['syncs'] += 1
+            self._stats['rows_applied'] += len(changed)
+            self._stats['rows_deleted'] += len(removed)
+
+        if changed or removed:
+            logger.info("Knowledge snapshot synced",
+                       changed=len(changed),
+                       removed=len(removed),
+                       high_water=high_water)
+        return changed, removed
+
+    def _write(self, encoded: Dict[str, bytes], high_water: Optional[str]) -> None:
+        ids = list(encoded)
+        metadata = json.dumps({'high_water': high_water, 'ids': ids}).encode('utf-8')
+        offsets = array('Q')
+        position = len(MAGIC) + HEADER.size + len(metadata) + 8 * (len(ids) + 1)
+        for article_id in ids:
+            offsets.append(position)
+            position += len(encoded[article_id])
+        offsets.append(position)
+
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(MAGIC)
+            f.write(HEADER.pack(len(metadata), len(ids)))
+            f.write(metadata)
+            f.write(offsets.tobytes())
+            for article_id in ids:
+                f.write(encoded[article_id])
+            f.flush()
+            os.fsync(f.fileno())
+        self._close()
+        os.replace(temporary, self.path)
+        self._map()
+        self._stats['rewrites'] += 1
+
+    def start(self, fetch_changes: Callable[[Optional[str]], List[Dict[str, Any]]],
+              fetch_ids: Callable[[], List[str]] = None,
+              on_change: Callable[[List[Dict[str, Any]], List[str]], None] = None) -> None:
+        """Poll for changes every sync_seconds on a daemon thread, off the retrieval path"""
+        if self._thread is not None:
+            return
+
+        def poll():
+            while not self._stop.wait(self.sync_seconds):
+                try:
+                    changed, removed = self.sync(fetch_changes, fetch_ids)
+                    if (changed or removed) and on_change is not None:
+                        on_change(changed, removed)
+                except Exception as e:
+                    self._stats['sync_failures'] += 1
+                    logger.warning("Knowledge snapshot sync failed, serving the previous snapshot", error=str(e))
+
+        self._thread = threading.Thread(target=poll, name="knowledge-snapshot-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling, letting a sync in progress finish"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.sync_seconds)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Snapshot size and age, and how much each sync changed"""
+        with self._lock:
+            return dict(
+                self._stats,
+                articles=len(self._records),
+                size_bytes=len(self._mmap) if self._mmap is not None else 0,
+                age_seconds=round(time.time() - self.synced_at, 1) if self.synced_at else None,
+                high_water=self.high_water
+            )
+
+knowledge_snapshot = KnowledgeSnapshot()
@@ -0,0 +1,150 @@
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Iterable, List, Set
+from config.settings import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class BloomFilter:
+    """Fixed-size in-memory Bloom filter over string keys"""
+
+    def __init__(self, expected_items: int, false_positive_rate: float = 0.01):
+        expected_items = max(1, expected_items)
+        self.num_bits = max(8, int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / expected_items * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> List[int]:
+        # Double hashing: derive k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+class ProcessedMessageLedger:
+    """Persistent set of Gmail message IDs that already went through the pipeline.
+
+    IDs are stored in an SQLite table keyed by message ID; a Bloom filter in
+    front answers most lookups for new messages without touching disk.
+
+    A message is marked processed once its pipeline has finished or it was
+    dead-lettered. Until then it is only claimed: claims live in memory
+    and keep the message from being fetched again while it waits in the
+    priority queue. After a crash or restart the claims are gone, so
+    messages that never finished are fetched again.
+    """
+
+    def __init__(self, path: str = None, expected_items: int = None, false_positive_rate: float = None):
+        self.path = path or settings.ledger_path
+        self.bloom = BloomFilter(
+            expected_items or settings.ledger_expected_items,
+            false_positive_rate or settings.ledger_false_positive_rate
+        )
+        self._lock = threading.Lock()
+        self._conn = None
+        self._claimed: Set[str] = set()
+        self._stats = {'lookups': 0, 'bloom_negatives': 0, 'disk_lookups': 0, 'hits': 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS processed_messages ("
+                "message_id TEXT PRIMARY KEY, processed_at REAL NOT NULL) WITHOUT ROWID"
+            )
+            # Warm the Bloom filter from disk in one streaming pass
+            for (message_id,) in conn.execute("SELECT message_id FROM processed_messages"):
+                self.bloom.add(message_id)
+            self._conn = conn
+            logger.info("Processed-message ledger opened", path=self.path, entries=self.bloom.count)
+        return self._conn
+
+    def __contains__(self, message_id: str) -> bool:
+        return not self.filter_new([message_id])
+
+    def filter_new(self, message_ids: Iterable[str]) -> Set[str]:
+        """Return the subset of message IDs that have not been processed yet"""
+        with self._lock:
+            conn = self._connection()
+            new_ids = set()
+            candidates = []
+            for message_id in message_ids:
+                self._stats['lookups'] += 1
+                if message_id in self._claimed:
+                    continue
+                if message_id in self.bloom:
+                    candidates.append(message_id)
+                else:
+                    self._stats['bloom_negatives'] += 1
+                    new_ids.add(message_id)
+
+            if candidates:
+                self._stats['disk_lookups'] += len(candidates)
+                placeholders = ",".join("?" * len(candidates))
+                known = {
+                    row[0] for row in conn.execute(
+                        f"SELECT message_id FROM processed_messages WHERE message_id IN ({placeholders})",
+                        candidates
+                    )
+                }
+                self._stats['hits'] += len(known)
+                new_ids.update(message_id for message_id in candidates if message_id not in known)
+
+            return new_ids
+
+    def claim(self, message_ids: Iterable[str]) -> None:
+        """Keep messages that are still in the pipeline from being fetched again by this process"""
+        with self._lock:
+            self._claimed.update(message_ids)
+
+    def release(self, message_ids: Iterable[str]) -> None:
+        """Drop claims without marking, so the messages are fetched again"""
+        with self._lock:
+            self._claimed.difference_update(message_ids)
+
+    def mark_processed(self, message_ids: Iterable[str]) -> None:
+        """Record message IDs as processed"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            rows = [(message_id, now) for message_id in message_ids]
+            self._claimed.difference_update(message_id for message_id, _ in rows)
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO processed_messages (message_id, processed_at) VALUES (?, ?)",
+                    rows
+                )
+            for message_id, _ in rows:
+                self.bloom.add(message_id)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Lookup counters and Bloom filter size"""
+        return {
+            **self._stats,
+            'claimed': len(self._claimed),
+            'bloom_entries': self.bloom.count,
+            'bloom_bytes': len(self.bloom.bits)
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+processed_ledger = ProcessedMessageLedger()
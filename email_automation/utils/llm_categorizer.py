@@ -0,0 +1,191 @@
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from config.settings import settings
+from utils.logger import get_logger
+from utils.llm_client import LLMClient, llm_client
+from utils.tracing import tracer
+from utils.response_cache import llm_response_cache
+from utils.tokenizer import count_tokens, truncate_tokens
+from utils.text_classifier import CATEGORIES, IMPORTANCE_LEVELS
+
+logger = get_logger(__name__)
+
+CATEGORY_GUIDE = """Categories:
+- Sales: Inquiries about services, pricing, or partnership opportunities
+- Customer Service: Support requests, issues, or questions from existing customers
+- Other: Promotional emails, spam, internal communications, or other non-actionable items
+
+Importance levels:
+- High: Urgent issues, executive requests, or critical business matters
+- Medium: Standard support requests or sales inquiries
+- Low: General information requests or non-urgent matters"""
+
+BATCH_INSTRUCTIONS = CATEGORY_GUIDE + """
+
+You will receive several emails, each introduced by a line "### <n>".
+Categorize every email. Respond with only a JSON array containing one object per email:
+[{"n": 1, "category": "Sales|Customer Service|Other", "importance": "High|Medium|Low", "reasoning": "short explanation"}]"""
+
+JSON_OBJECT = re.compile(r'\{[^{}]*\}')
+
+class LLMBatchCategorizer:
+    """Categorize emails with an LLM, packing several emails into each request.
+
+    Emails are rendered compactly (body truncated to ``llm_email_token_cap``)
+    and packed into a request until the estimated prompt tokens plus the
+    expected completion tokens reach ``llm_batch_token_budget``. The reply is
+    parsed per email. Emails whose entry is missing or invalid, or whose
+    request fails, get None so the caller falls back to the keyword rules.
+    """
+
+    def __init__(self, client: LLMClient = None, enabled: bool = None, token_budget: int = None,
+                 max_emails: int = None, email_token_cap: int = None, concurrency: int = None):
+        self.client = client or llm_client
+        self.enabled = settings.llm_categorization_enabled if enabled is None else enabled
+        self.token_budget = token_budget or settings.llm_batch_token_budget
+        self.max_emails = max_emails or settings.llm_batch_max_emails
+        self.email_token_cap = email_token_cap or settings.llm_email_token_cap
+        self.output_tokens_per_email = settings.llm_output_tokens_per_email
+        self.concurrency = concurrency or settings.llm_max_concurrent_requests
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'failed_requests': 0, 'emails': 0, 'parsed': 0, 'rule_fallbacks': 0,
+                       'prompt_tokens': 0, 'completion_tokens': 0, 'seconds': 0.0}
+
+    def email_block(self, email_data: Dict[str, Any]) -> str:
+        """Compact prompt text for one email, also used as its cache key"""
+        body = truncate_tokens(email_data.get('body', ''), self.email_token_cap)
+        return f"From: {email_data.get('from', '')}\nSubject: {email_data.get('subject', '')}\n{body}\n"
+
+    def render(self, number: int, email_data: Dict[str, Any]) -> str:
+        return f"### {number}\n{self.email_block(email_data)}"
+
+    def pack(self, emails: List[Dict[str, Any]]) -> List[List[int]]:
+        """Split email indexes into requests that fit the token budget"""
+        fixed = count_tokens(BATCH_INSTRUCTIONS)
+        batches: List[List[int]] = []
+        current: List[int] = []
+        used = fixed
+
+        for index, email_data in enumerate(emails):
+            cost = count_tokens(self.render(len(current) + 1, email_data)) + self.output_tokens_per_email
+            if current and (used + cost > self.token_budget or len(current) >= self.max_emails):
+                batches.append(current)
+                current, used = [], fixed
+            current.append(index)
+            used += cost
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def predict(self, emails: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """One categorization per email, or None where the keyword rules should decide"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(emails)
+        if not self.enabled or not emails:
+            return results
+
+        started = time.perf_counter()
+
+        # Emails answered before (or paraphrases of them) never reach a request
+        blocks = [self.email_block(email_data) for email_data in emails]
+        pending = []
+        for index, block in enumerate(blocks):
+            results[index] = llm_response_cache.get('categorization', block, query_text=block)
+            if results[index] is None:
+                pending.append(index)
+
+        if pending:
+            batches = [[pending[i] for i in batch] for batch in self.pack([emails[i] for i in pending])]
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+                replies = list(pool.map(tracer.propagate(self._request), [[emails[i] for i in batch] for batch in batches]))
+            for batch, (parsed, seconds) in zip(batches, replies):
+                for index, result in zip(batch, parsed):
+                    results[index] = result
+                    if result is not None:
+                        llm_response_cache.put('categorization', blocks[index], result, query_text=blocks[index],
+                                               latency_seconds=seconds / len(batch))
+
+        parsed_count = sum(1 for result in results if result is not None)
+        with self._lock:
+            self._stats['emails'] += len(emails)
+            self._stats['parsed'] += parsed_count
+            self._stats['rule_fallbacks'] += len(emails) - parsed_count
+            self._stats['seconds'] += time.perf_counter() - started
+        return results
+
+    def _request(self, batch: List[Dict[str, Any]]) -> Tuple[List[Optional[Dict[str, Any]]], float]:
+        """Send one packed request; returns the per-email results and the request latency"""
+        started = time.perf_counter()
+        messages = [
+            {'role': 'system', 'content': BATCH_INSTRUCTIONS},
+            {'role': 'user', 'content': "\n".join(self.render(n, email) for n, email in enumerate(batch, 1))}
+        ]
+        try:
+            content, usage = self.client.complete(
+                messages, max_tokens=self.output_tokens_per_email * len(batch) + 50
+            )
+        except Exception as e:
+            logger.warning("LLM categorization request failed", emails=len(batch), error=str(e))
+            with self._lock:
+                self._stats['requests'] += 1
+                self._stats['failed_requests'] += 1
+            return [None] * len(batch), time.perf_counter() - started
+
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['prompt_tokens'] += usage['prompt_tokens']
+            self._stats['completion_tokens'] += usage['completion_tokens']
+        return self.parse(content, len(batch)), time.perf_counter() - started
+
+    def parse(self, content: str, count: int) -> List[Optional[Dict[str, Any]]]:
+        """Map the reply back to emails 1..count, tolerating fences, prose and broken entries"""
+        entries = []
+        start, end = content.find('['), content.rfind(']')
+        if start != -1 and end > start:
+            try:
+                entries = json.loads(content[start:end + 1])
+            except ValueError:
+                entries = []
+        if not isinstance(entries, list) or not entries:
+            # Salvage whichever objects are well formed on their own
+            entries = []
+            for match in JSON_OBJECT.finditer(content):
+                try:
+                    entries.append(json.loads(match.group(0)))
+                except ValueError:
+                    continue
+
+        results: List[Optional[Dict[str, Any]]] = [None] * count
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                number = int(entry.get('n'))
+            except (TypeError, ValueError):
+                continue
+            category, importance = entry.get('category'), entry.get('importance')
+            if not 1 <= number <= count or category not in CATEGORIES or importance not in IMPORTANCE_LEVELS:
+                continue
+            results[number - 1] = {
+                'category': category,
+                'importance': importance,
+                'reasoning': str(entry.get('reasoning') or f"Categorized as {category} by the LLM")
+            }
+        return results
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Request, token and cost totals, plus cost per email"""
+        with self._lock:
+            stats = dict(self._stats)
+        cost = (stats['prompt_tokens'] / 1000 * settings.llm_prompt_cost_per_1k
+                + stats['completion_tokens'] / 1000 * settings.llm_completion_cost_per_1k)
+        stats['estimated_cost'] = cost
+        stats['cost_per_email'] = cost / stats['emails'] if stats['emails'] else 0.0
+        stats['emails_per_request'] = stats['emails'] / stats['requests'] if stats['requests'] else 0.0
+        return stats
+
+llm_categorizer = LLMBatchCategorizer()
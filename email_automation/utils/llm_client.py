@@ -0,0 +1,49 @@
+from typing import Dict, List, Tuple
+import requests
+from config.settings import settings
+from utils.tokenizer import count_tokens
+from utils.tracing import tracer
+
+class LLMClient:
+    """Minimal client for an OpenAI-compatible chat completions endpoint"""
+
+    def __init__(self, api_base: str = None, api_key: str = None, model: str = None, timeout: float = None):
+        self.api_base = (api_base or settings.llm_api_base).rstrip('/')
+        self.api_key = api_key if api_key is not None else settings.openai_api_key
+        self.model = model or settings.model_name
+        self.timeout = timeout or settings.llm_request_timeout
+        self.session = requests.Session()
+
+    def complete(self, messages: List[Dict[str, str]], max_tokens: int = None,
+                 temperature: float = 0.0) -> Tuple[str, Dict[str, int]]:
+        """Return the completion text and the token usage reported by the server"""
+        with tracer.span("llm.complete", model=self.model, messages=len(messages)) as span:
+            content, usage = self._complete(messages, max_tokens, temperature)
+            span.set(**usage)
+            return content, usage
+
+    def _complete(self, messages: List[Dict[str, str]], max_tokens: int,
+                  temperature: float) -> Tuple[str, Dict[str, int]]:
+        response = self.session.post(
+            f"{self.api_base}/chat/completions",
+            headers={'Authorization': f"Bearer {self.api_key}"},
+            json={
+                'model': self.model,
+                'messages': messages,
+                'max_tokens': max_tokens or settings.max_tokens,
+                'temperature': temperature
+            },
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        payload = response.json()
+
+        content = payload['choices'][0]['message']['content']
+        usage = payload.get('usage') or {}
+        prompt_text = "".join(message['content'] for message in messages)
+        return content, {
+            'prompt_tokens': usage.get('prompt_tokens', count_tokens(prompt_text)),
+            'completion_tokens': usage.get('completion_tokens', count_tokens(content))
+        }
+
+llm_client = LLMClient()
@@ -1,33 +1,185 @@
-import structlog
+import json
 import logging
+import queue
 import sys
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, TextIO
+import structlog
 from config.settings import settings
 
+OVERFLOW_POLICIES = ("drop_new", "drop_oldest", "block")
+
+class AsyncLogHandler(logging.Handler):
+    """Hands log records to a background writer thread instead of writing them on the caller.
+
+    Records wait in a bounded queue. The writer takes what has accumulated
+    (up to log_batch_size records), formats it and writes it with a single
+    write and flush. When the queue is full, the overflow policy decides:
+    'drop_new' discards the incoming record, 'drop_oldest' discards the oldest
+    queued one, and 'block' waits for room. Errors are never dropped; they
+    wait for room whatever the policy. Dropped records are counted and
+    reported by the writer. close(), which logging.shutdown() calls at exit,
+    drains the queue before returning.
+
+    Event values are rendered on the writer thread, so log values rather
+    than objects the caller goes on to mutate.
+    """
+
+    def __init__(self, stream: TextIO, queue_size: int = None, batch_size: int = None, overflow_policy: str = None):
+        super().__init__()
+        self.stream = stream
+        self.batch_size = batch_size or settings.log_batch_size
+        self.overflow_policy = overflow_policy or settings.log_overflow_policy
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown log overflow policy: {self.overflow_policy}")
+        self._queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size or settings.log_queue_size)
+        self._stats_lock = threading.Lock()
+        self._stats = {'records': 0, 'dropped': 0, 'batches': 0, 'write_failures': 0}
+        self._unreported_drops = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        if record.levelno >= logging.ERROR or self.overflow_policy == "block":
+            self._queue.put(record)
+            return
+        if self.overflow_policy == "drop_oldest":
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                pass
+        with self._stats_lock:
+            self._stats['dropped'] += 1
+            self._unreported_drops += 1
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            records = [record for record in batch if record is not None]
+            if records:
+                self._write(records)
+            if stop:
+                return
+
+    def _write(self, records: List[logging.LogRecord]) -> None:
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        with self._stats_lock:
+            dropped, self._unreported_drops = self._unreported_drops, 0
+            self._stats['records'] += len(records)
+            self._stats['batches'] += 1
+        if dropped:
+            lines.append(json.dumps({
+                'dropped': dropped,
+                'event': "Log records dropped, queue full",
+                'level': 'warning',
+                'timestamp': datetime.utcnow().isoformat() + "Z"
+            }))
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except Exception:
+            with self._stats_lock:
+                self._stats['write_failures'] += 1
+
+    def close(self) -> None:
+        """Write everything queued so far, then stop the writer"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join(timeout=settings.log_flush_timeout_seconds)
+        super().close()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Records written and dropped, and how far the writer is behind"""
+        with self._stats_lock:
+            return dict(self._stats, queued=self._queue.qsize())
+
+def apply_level_overrides(overrides: Dict[str, str]) -> None:
+    """Per-module levels, e.g. {"agents.categorizer": "WARNING"}; capped at ERROR so errors always get through"""
+    for name, level in overrides.items():
+        logging.getLogger(name).setLevel(min(getattr(logging, level.upper()), logging.ERROR))
+
 def setup_logger():
     """Configure structured logging"""
-        structlog.configure(
-                processors=[
-                            structlog.stdlib.filter_by_level,
-                                        structlog.stdlib.add_logger_name,
-                                                    structlog.stdlib.add_log_level,
-                                                                structlog.stdlib.PositionalArgumentsFormatter(),
-                                                                            structlog.processors.TimeStamper(fmt="iso"),
-                                                                                        structlog.processors.StackInfoRenderer(),
-                                                                                                    structlog.processors.format_exc_info,
-                                                                                                                structlog.processors.UnicodeDecoder(),
-                                                                                                                            structlog.processors.JSONRenderer()
-                                                                                                                                    ],
-                                                                                                                                            wrapper_class=structlog.stdlib.BoundLogger,
-                                                                                                                                                    logger_factory=structlog.stdlib.LoggerFactory(),
-                                                                                                                                                            cache_logger_on_first_use=True,
-                                                                                                                                                                )
-
-                                                                                                                                                                    logging.basicConfig(
-                                                                                                                                                                            format="%(message)s",
-                                                                                                                                                                                    stream=sys.stdout,
-                                                                                                                                                                                            level=getattr(logging, settings.log_level.upper()),
-                                                                                                                                                                                                )
-
-                                                                                                                                                                                                # Initialize logger
-                                                                                                                                                                                                setup_logger()
-                                                                                                                                                                                                logger = structlog.get_logger()
\ No newline at end of file
+    processors = [
+        structlog.stdlib.filter_by_level,
+        structlog.contextvars.merge_contextvars,  # trace_id inside a sampled trace
+        structlog.stdlib.add_logger_name,
+        structlog.stdlib.add_log_level,
+        structlog.stdlib.PositionalArgumentsFormatter(),
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.StackInfoRenderer(),
+        structlog.processors.format_exc_info,
+        structlog.processors.UnicodeDecoder()
+    ]
+
+    if settings.log_async:
+        # JSON is rendered by the writer thread; the caller only builds the event dict
+        processors.append(structlog.stdlib.ProcessorFormatter.wrap_for_formatter)
+        handler = AsyncLogHandler(sys.stdout)
+        handler.setFormatter(structlog.stdlib.ProcessorFormatter(
+            processors=[
+                structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+                structlog.processors.JSONRenderer()
+            ],
+            foreign_pre_chain=[
+                structlog.stdlib.add_logger_name,
+                structlog.stdlib.add_log_level,
+                structlog.processors.TimeStamper(fmt="iso")
+            ]
+        ))
+        logging.basicConfig(handlers=[handler], level=getattr(logging, settings.log_level.upper()))
+    else:
+        processors.append(structlog.processors.JSONRenderer())
+        logging.basicConfig(
+            format="%(message)s",
+            stream=sys.stdout,
+            level=getattr(logging, settings.log_level.upper()),
+        )
+
+    structlog.configure(
+        processors=processors,
+        wrapper_class=structlog.stdlib.BoundLogger,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
+    apply_level_overrides(settings.log_level_overrides)
+
+def get_logger(name: str):
+    """Logger named after its module, so settings.log_level_overrides can address it"""
+    return structlog.get_logger(name)
+
+def get_log_metrics() -> Dict[str, Any]:
+    """Writer queue metrics in async mode, empty otherwise"""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, AsyncLogHandler):
+            return handler.get_metrics()
+    return {}
+
+# Initialize logging
+setup_logger()
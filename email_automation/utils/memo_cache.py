@@ -0,0 +1,195 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from config.settings import settings
+from utils.logger import get_logger
+from utils.document import analyze_email
+from utils.knowledge_chunks import knowledge_index
+
+logger = get_logger(__name__)
+
+WHITESPACE = re.compile(r'\s+')
+DIGITS = re.compile(r'\d+')
+SENDER_PLACEHOLDER = "{sender_name}"
+
+def normalize_content(text: str) -> str:
+    """Lowercase, mask numbers and collapse whitespace so template-identical mail compares equal"""
+    return WHITESPACE.sub(' ', DIGITS.sub('#', text.lower())).strip()
+
+def content_hash(email_data: Dict[str, Any]) -> str:
+    """Stable hash of an email's normalized subject and body, computed once per email"""
+    analysis = analyze_email(email_data)
+    if analysis.content_hash is None:
+        normalized = normalize_content(email_data.get('subject', '')) + "\0" + normalize_content(email_data.get('body', ''))
+        analysis.content_hash = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    return analysis.content_hash
+
+def exact_content_hash(email_data: Dict[str, Any]) -> str:
+    """Hash of the subject and body with only whitespace collapsed, for values that quote the email"""
+    analysis = analyze_email(email_data)
+    if analysis.exact_content_hash is None:
+        subject = WHITESPACE.sub(' ', email_data.get('subject', '')).strip()
+        body = WHITESPACE.sub(' ', email_data.get('body', '')).strip()
+        analysis.exact_content_hash = hashlib.sha256((subject + "\0" + body).encode('utf-8')).hexdigest()
+    return analysis.exact_content_hash
+
+def categorization_key(email_data: Dict[str, Any]) -> str:
+    """Content hash plus the version of the keyword rules that categorize it"""
+    return f"{content_hash(email_data)}:{analyze_email(email_data).rules.categorization_fingerprint}"
+
+def knowledge_fingerprint() -> str:
+    """Version of the knowledge base that cached retrievals and drafts were built from"""
+    return f"{settings.knowledge_base_version}:{knowledge_index.version}"
+
+def knowledge_key(email_data: Dict[str, Any], category: str) -> str:
+    return f"{content_hash(email_data)}:{category}:{knowledge_fingerprint()}"
+
+def draft_key(email_data: Dict[str, Any], categorization: Dict[str, Any], knowledge: Dict[str, Any]) -> str:
+    """Drafts quote the email's questions and specifics, so only mail with the same numbers and wording shares one"""
+    knowledge_ids = ",".join(str(item.get('id')) for item in knowledge.get('knowledge_items', []))
+    return (f"{exact_content_hash(email_data)}:{categorization['category']}:{knowledge_fingerprint()}:"
+            f"{hashlib.sha256(knowledge_ids.encode('utf-8')).hexdigest()[:16]}")
+
+def to_template(response: str, sender_name: str) -> str:
+    """Replace the greeting's sender name so a cached draft can be reused for other senders"""
+    return response.replace(f"Hi {sender_name},", f"Hi {SENDER_PLACEHOLDER},", 1)
+
+def personalize(template: str, sender_name: str) -> str:
+    return template.replace(f"Hi {SENDER_PLACEHOLDER},", f"Hi {sender_name},", 1)
+
+class MemoCache:
+    """Two-tier memoization cache: in-memory LRU in front of an SQLite table, both with a TTL.
+
+    Entries live in namespaces ('categorization', 'knowledge', 'draft') and are JSON values.
+    The memory tier keeps the encoded form so callers never share a mutable cached object.
+    """
+
+    def __init__(self, path: str = None, memory_entries: int = None, ttl_seconds: float = None,
+                 disk_max_entries: int = None, enabled: bool = None):
+        self.path = path or settings.memo_cache_path
+        self.memory_entries = memory_entries or settings.memo_cache_memory_entries
+        self.ttl_seconds = ttl_seconds or settings.memo_cache_ttl_seconds
+        self.disk_max_entries = disk_max_entries or settings.memo_cache_disk_max_entries
+        self.enabled = settings.memo_cache_enabled if enabled is None else enabled
+        self._memory: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memo ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS memo_expires ON memo (expires_at)")
+            self._conn = conn
+        return self._conn
+
+    def _count(self, namespace: str, outcome: str) -> None:
+        stats = self._stats.setdefault(namespace, {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'puts': 0})
+        stats[outcome] += 1
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return a cached value, or None when absent or expired"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get((namespace, key))
+            if entry is not None:
+                expires_at, encoded = entry
+                if expires_at > now:
+                    self._memory.move_to_end((namespace, key))
+                    self._count(namespace, 'memory_hits')
+                    return json.loads(encoded)
+                del self._memory[(namespace, key)]
+
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM memo WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self._count(namespace, 'misses')
+                return None
+
+            self._remember(namespace, key, row[1], row[0])
+            self._count(namespace, 'disk_hits')
+            return json.loads(row[0])
+
+    def put(self, namespace: str, key: str, value: Any, ttl_seconds: float = None) -> None:
+        """Store a JSON-serializable value in both tiers"""
+        if not self.enabled:
+            return
+
+        expires_at = time.time() + (ttl_seconds or self.ttl_seconds)
+        try:
+            encoded = json.dumps(value, default=str)
+        except (TypeError, ValueError) as e:
+            logger.warning("Value not cacheable", namespace=namespace, error=str(e))
+            return
+
+        with self._lock:
+            self._remember(namespace, key, expires_at, encoded)
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO memo (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, encoded, expires_at)
+                )
+            self._count(namespace, 'puts')
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._prune_disk(conn)
+
+    def invalidate(self, namespace: str = None) -> None:
+        """Drop every entry, or every entry of one namespace"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                if namespace is None:
+                    self._memory.clear()
+                    conn.execute("DELETE FROM memo")
+                else:
+                    for cache_key in [k for k in self._memory if k[0] == namespace]:
+                        del self._memory[cache_key]
+                    conn.execute("DELETE FROM memo WHERE namespace = ?", (namespace,))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Hit/miss counters per namespace and memory-tier size"""
+        return {
+            'namespaces': {namespace: dict(stats) for namespace, stats in self._stats.items()},
+            'memory_entries': len(self._memory)
+        }
+
+    def _remember(self, namespace: str, key: str, expires_at: float, encoded: str) -> None:
+        self._memory[(namespace, key)] = (expires_at, encoded)
+        self._memory.move_to_end((namespace, key))
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _prune_disk(self, conn: sqlite3.Connection) -> None:
+        """Remove expired rows, then the soonest-expiring ones beyond the size cap"""
+        with conn:
+            conn.execute("DELETE FROM memo WHERE expires_at <= ?", (time.time(),))
+            (count,) = conn.execute("SELECT COUNT(*) FROM memo").fetchone()
+            excess = count - self.disk_max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM memo WHERE (namespace, key) IN "
+                    "(SELECT namespace, key FROM memo ORDER BY expires_at LIMIT ?)",
+                    (excess,)
+                )
+
+response_memo = MemoCache()
@@ -0,0 +1,192 @@
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Callable, Iterator, List, Optional
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+from config.settings import settings
+from utils.logger import get_logger
+from utils.tracing import tracer, payload_size
+
+logger = get_logger(__name__)
+
+TOOL_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGE_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _numeric_items(values: Dict[str, Any], prefix: str = "") -> Iterator[tuple]:
+    """(dotted key, number) pairs of a nested get_metrics() dict; strings and lists are skipped"""
+    for key, value in values.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _numeric_items(value, name + ".")
+        elif isinstance(value, (int, float)):
+            yield name, float(value)
+
+class ComponentCollector:
+    """Exports the components' get_metrics() values as gauges, read at scrape time"""
+
+    def __init__(self):
+        self.components: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def collect(self):
+        family = GaugeMetricFamily('email_component_metric', 'Values reported by component get_metrics()',
+                                   labels=['component', 'metric'])
+        for component, get_metrics in list(self.components.items()):
+            try:
+                values = get_metrics()
+            except Exception as e:
+                logger.warning("Component metrics failed", component=component, error=str(e))
+                continue
+            for metric, value in _numeric_items(values):
+                family.add_metric([component, metric], value)
+        yield family
+
+class Metrics:
+    """Call counts and latency histograms for tool operations and agent stages.
+
+    Tool ``_run`` methods and agent stage methods are wrapped by the
+    ``instrument_tool`` and ``instrument_stage`` decorators, which also open
+    a tracing span per call. With settings.enable_metrics and
+    settings.tracing_enabled both off the decorators return the method
+    unchanged, so disabled instrumentation costs nothing per call. start() serves the registry in
+    Prometheus text format on settings.metrics_port and writes a JSON
+    snapshot to settings.metrics_snapshot_path every metrics_snapshot_seconds.
+    """
+
+    def __init__(self, enabled: bool = None):
+        self.enabled = settings.enable_metrics if enabled is None else enabled
+        self.registry = CollectorRegistry()
+        self.tool_calls = Counter('email_tool_calls', 'Tool operations by outcome',
+                                  ['tool', 'operation', 'outcome'], registry=self.registry)
+        self.tool_seconds = Histogram('email_tool_call_seconds', 'Tool operation latency',
+                                      ['tool', 'operation'], buckets=TOOL_BUCKETS, registry=self.registry)
+        self.stage_calls = Counter('email_stage_calls', 'Agent stage runs by outcome',
+                                   ['stage', 'outcome'], registry=self.registry)
+        self.stage_seconds = Histogram('email_stage_seconds', 'Agent stage latency',
+                                       ['stage'], buckets=STAGE_BUCKETS, registry=self.registry)
+        self.components = ComponentCollector()
+        self.registry.register(self.components)
+        # Labelled children by label values; .labels() is the costly part of an observation
+        self._children: Dict[tuple, tuple] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def observe_tool(self, tool: str, operation: str, seconds: float, outcome: str) -> None:
+        key = ('tool', tool, operation, outcome)
+        children = self._children.get(key)
+        if children is None:
+            children = self._children[key] = (self.tool_calls.labels(tool, operation, outcome),
+                                              self.tool_seconds.labels(tool, operation))
+        children[0].inc()
+        children[1].observe(seconds)
+
+    def observe_stage(self, stage: str, seconds: float, outcome: str) -> None:
+        key = ('stage', stage, outcome)
+        children = self._children.get(key)
+        if children is None:
+            children = self._children[key] = (self.stage_calls.labels(stage, outcome),
+                                              self.stage_seconds.labels(stage))
+        children[0].inc()
+        children[1].observe(seconds)
+
+    def register_component(self, name: str, get_metrics: Callable[[], Dict[str, Any]]) -> None:
+        """Export a component's get_metrics() values (queue depth, cache hits, ...)"""
+        self.components.components[name] = get_metrics
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every sample of the registry, grouped by metric family"""
+        families: Dict[str, List[Dict[str, Any]]] = {}
+        for family in self.registry.collect():
+            families[family.name] = [
+                {'sample': sample.name, 'labels': sample.labels, 'value': sample.value}
+                for sample in family.samples
+            ]
+        return {'timestamp': time.time(), 'metrics': families}
+
+    def render(self) -> bytes:
+        """The registry in Prometheus text format"""
+        return generate_latest(self.registry)
+
+    def write_snapshot(self, path: str = None) -> None:
+        path = path or settings.metrics_snapshot_path
+        temporary = path + ".tmp"
+        with open(temporary, 'w', encoding='utf-8') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(temporary, path)
+
+    def start(self) -> None:
+        """Serve /metrics and write periodic JSON snapshots, if metrics are enabled"""
+        if not self.enabled or self._thread is not None:
+            return
+        start_http_server(settings.metrics_port, registry=self.registry)
+
+        def write_snapshots():
+            while not self._stop.wait(settings.metrics_snapshot_seconds):
+                try:
+                    self.write_snapshot()
+                except Exception as e:
+                    logger.warning("Metrics snapshot failed", error=str(e))
+
+        self._thread = threading.Thread(target=write_snapshots, name="metrics-snapshot", daemon=True)
+        self._thread.start()
+        logger.info("Metrics enabled", port=settings.metrics_port, snapshot_path=settings.metrics_snapshot_path)
+
+    def stop(self) -> None:
+        """Stop the snapshot writer after a final snapshot"""
+        self._stop.set()
+        if self._thread is None:
+            return
+        self._thread.join()
+        self._thread = None
+        try:
+            self.write_snapshot()
+        except Exception as e:
+            logger.warning("Metrics snapshot failed", error=str(e))
+
+metrics = Metrics()
+
+def instrument_tool(tool: str):
+    """Count, time and trace a tool's _run(operation, **kwargs) per operation"""
+    def decorate(run):
+        if not metrics.enabled and not tracer.enabled:
+            return run
+
+        @functools.wraps(run)
+        def wrapper(self, operation: str, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            with tracer.span(f"{tool}.{operation}", tool=tool, operation=operation) as span:
+                try:
+                    result = run(self, operation, **kwargs)
+                    outcome = "ok"
+                    if span.recording:
+                        span.set(request_size=payload_size(kwargs), response_size=payload_size(result))
+                    return result
+                finally:
+                    if metrics.enabled:
+                        metrics.observe_tool(tool, operation, time.perf_counter() - started, outcome)
+        return wrapper
+    return decorate
+
+def instrument_stage(stage: str):
+    """Count, time and trace an agent stage method"""
+    def decorate(method):
+        if not metrics.enabled and not tracer.enabled:
+            return method
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            with tracer.span(stage, stage=stage):
+                try:
+                    result = method(*args, **kwargs)
+                    outcome = "ok"
+                    return result
+                finally:
+                    if metrics.enabled:
+                        metrics.observe_stage(stage, time.perf_counter() - started, outcome)
+        return wrapper
+    return decorate
@@ -0,0 +1,107 @@
+from array import array
+from collections import defaultdict
+from typing import Dict, Any, List
+from config.settings import settings
+from utils.document import analyze_email
+
+FINGERPRINT_BITS = 64
+MASK64 = (1 << FINGERPRINT_BITS) - 1
+
+# bit -> translation table turning each byte into 1 if that bit is set, else 0
+BIT_TABLES = [bytes((value >> bit) & 1 for value in range(256)) for bit in range(8)]
+
+def simhash(tokens: List[str], shingle_size: int = 3) -> int:
+    """64-bit SimHash of word shingles.
+
+    Rather than looping over 64 bits per feature in Python, the feature hashes
+    are packed into one byte string. For each bit position, a C-level
+    translate() plus count() over the matching byte column counts how many
+    features have that bit set.
+    """
+    if len(tokens) < shingle_size:
+        shingles = [tuple(tokens)] if tokens else []
+    else:
+        shingles = set(zip(*(tokens[i:] for i in range(shingle_size))))
+
+    if not shingles:
+        return 0
+
+    packed = array('Q', [hash(shingle) & MASK64 for shingle in shingles]).tobytes()
+
+    # A bit is set when more than half of the features have it
+    half = len(shingles) / 2
+    fingerprint = 0
+    for byte_index in range(8):
+        column = packed[byte_index::8]
+        for bit in range(8):
+            if column.translate(BIT_TABLES[bit]).count(1) > half:
+                fingerprint |= 1 << (byte_index * 8 + bit)
+    return fingerprint
+
+if hasattr(int, 'bit_count'):
+    def hamming_distance(a: int, b: int) -> int:
+        return (a ^ b).bit_count()
+else:
+    def hamming_distance(a: int, b: int) -> int:
+        return bin(a ^ b).count('1')
+
+class NearDuplicateClusterer:
+    """Group near-identical emails using SimHash fingerprints and banded LSH.
+
+    The 64-bit fingerprint is split into ``max_distance + 1`` bands. Two
+    fingerprints within ``max_distance`` bits of each other must agree on at
+    least one band (pigeonhole), so band buckets yield every candidate pair.
+    Clustering is greedy: an email joins the first cluster leader within
+    ``max_distance``, otherwise it becomes a leader itself. Only leaders are
+    indexed, which keeps a wave of identical mail from turning into
+    quadratic comparisons.
+    """
+
+    def __init__(self, max_distance: int = None, shingle_size: int = None, enabled: bool = None):
+        self.max_distance = settings.near_duplicate_max_distance if max_distance is None else max_distance
+        self.shingle_size = shingle_size or settings.near_duplicate_shingle_size
+        self.enabled = settings.near_duplicate_enabled if enabled is None else enabled
+        self.bands = self.max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.bands
+        self._stats = {'emails': 0, 'clusters': 0, 'clustered_emails': 0}
+
+    def cluster(self, emails: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Split emails into clusters; each cluster's first email is its leader"""
+        if not self.enabled:
+            return [[email] for email in emails]
+
+        band_bits = self.band_bits
+        band_mask = (1 << band_bits) - 1
+        buckets = defaultdict(list)  # (band, value) -> leader indexes
+        leaders: List[int] = []
+        clusters: List[List[Dict[str, Any]]] = []
+
+        for email in emails:
+            fingerprint = simhash(analyze_email(email).tokens, self.shingle_size)
+            keys = [(band, fingerprint >> (band * band_bits) & band_mask) for band in range(self.bands)]
+
+            match = None
+            for key in keys:
+                for index in buckets.get(key, ()):
+                    if hamming_distance(fingerprint, leaders[index]) <= self.max_distance:
+                        match = index
+                        break
+                if match is not None:
+                    break
+
+            if match is None:
+                leaders.append(fingerprint)
+                clusters.append([email])
+                for key in keys:
+                    buckets[key].append(len(leaders) - 1)
+            else:
+                clusters[match].append(email)
+
+        self._stats['emails'] += len(emails)
+        self._stats['clusters'] += len(clusters)
+        self._stats['clustered_emails'] += sum(len(members) - 1 for members in clusters)
+        return clusters
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """How many emails reused their cluster leader's categorization and retrieval"""
+        return dict(self._stats)
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+from config.settings import settings
+
+PRIORITY_LEVELS = ["High", "Medium", "Low"]
+
+def priority_for(importance: str, escalation_hint: bool = False) -> str:
+    """Map categorizer importance plus an escalation hint to a scheduling priority"""
+    rank = PRIORITY_LEVELS.index(importance) if importance in PRIORITY_LEVELS else len(PRIORITY_LEVELS) - 1
+    if escalation_hint:
+        rank = max(0, rank - 1)
+    return PRIORITY_LEVELS[rank]
+
+class LatencyStats:
+    """Count, mean, max and recent percentiles for one priority level"""
+
+    def __init__(self, sla_seconds: float, window: int = 1000):
+        self.sla_seconds = sla_seconds
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.sla_breaches = 0
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if seconds > self.sla_seconds:
+            self.sla_breaches += 1
+
+    def percentile(self, pct: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'max': self.max,
+            'sla_seconds': self.sla_seconds,
+            'sla_breaches': self.sla_breaches
+        }
+
+class AgingPriorityQueue:
+    """Priority queue of pipeline work with aging so low-priority mail is never starved.
+
+    Each level is a FIFO. An item's effective rank drops by one level for every
+    ``aging_seconds`` it has waited, and pop() serves the head with the lowest
+    effective rank, so the cost per operation is O(number of levels).
+    """
+
+    def __init__(self, aging_seconds: float = None, sla_seconds: Dict[str, float] = None):
+        self.aging_seconds = aging_seconds or settings.priority_aging_seconds
+        sla_seconds = sla_seconds or settings.priority_sla_seconds
+        self._queues: Dict[str, deque] = {level: deque() for level in PRIORITY_LEVELS}
+        self._lock = threading.Lock()
+        self.queue_wait = {level: LatencyStats(sla_seconds.get(level, float('inf'))) for level in PRIORITY_LEVELS}
+        self.end_to_end = {level: LatencyStats(sla_seconds.get(level, float('inf'))) for level in PRIORITY_LEVELS}
+        self.aged_promotions = 0
+
+    def push(self, item: Any, priority: str, received_at: float = None) -> None:
+        """Queue an item; received_at is when the email entered the system (for SLA latency)"""
+        if priority not in self._queues:
+            priority = PRIORITY_LEVELS[-1]
+        now = time.monotonic()
+        with self._lock:
+            self._queues[priority].append((now, received_at if received_at is not None else now, item))
+
+    def pop(self) -> Optional[Tuple[Any, str, float]]:
+        """Remove the most urgent item; returns (item, priority, received_at) or None when empty"""
+        now = time.monotonic()
+        with self._lock:
+            best_level = None
+            best_rank = None
+            for rank, level in enumerate(PRIORITY_LEVELS):
+                queue = self._queues[level]
+                if not queue:
+                    continue
+                effective = rank - (now - queue[0][0]) / self.aging_seconds
+                if best_rank is None or effective < best_rank:
+                    best_level, best_rank = level, effective
+
+            if best_level is None:
+                return None
+
+            enqueued_at, received_at, item = self._queues[best_level].popleft()
+            if best_rank < PRIORITY_LEVELS.index(best_level) and any(
+                self._queues[level] for level in PRIORITY_LEVELS[:PRIORITY_LEVELS.index(best_level)]
+            ):
+                self.aged_promotions += 1
+            self.queue_wait[best_level].record(now - enqueued_at)
+            return item, best_level, received_at
+
+    def complete(self, priority: str, received_at: float) -> None:
+        """Record end-to-end latency for an item once the pipeline has finished it"""
+        self.end_to_end[priority].record(time.monotonic() - received_at)
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth and per-priority latency summaries"""
+        return {
+            'depth': {level: len(self._queues[level]) for level in PRIORITY_LEVELS},
+            'aged_promotions': self.aged_promotions,
+            'queue_wait_seconds': {level: stats.summary() for level, stats in self.queue_wait.items()},
+            'end_to_end_seconds': {level: stats.summary() for level, stats in self.end_to_end.items()}
+        }
@@ -0,0 +1,144 @@
+import cProfile
+import os
+import pstats
+import signal
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+from config.settings import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class CycleProfiler:
+    """On-demand cProfile and tracemalloc profiling of whole processing cycles.
+
+    Cycles are profiled while requested ones remain: profile_cycles at
+    startup, plus profile_signal_cycles each time the process receives
+    SIGUSR1. In a profiled cycle each stage runs under cProfile. The stage's
+    stats are written to profile_dir as cycle-<n>-<stage>.prof (open them
+    with pstats or snakeviz), and its top profile_top_n functions are
+    logged. cProfile sees only the thread it runs on, so work in the LLM
+    categorizer's thread pool shows up as waiting time.
+
+    With profile_memory, tracemalloc runs while profiling is requested. It
+    snapshots the heap at the end of each profiled cycle and logs the
+    allocation sites that grew most since the previous profiled cycle. Long-
+    lived caches and agent objects that keep growing show up there.
+    tracemalloc stops, and its overhead goes away, once no profiled cycles
+    remain. Unprofiled cycles pay one counter check per stage.
+    """
+
+    def __init__(self, cycles: int = None, profile_dir: str = None, top_n: int = None, memory: bool = None):
+        self.requested = settings.profile_cycles if cycles is None else cycles
+        self.profile_dir = profile_dir or settings.profile_dir
+        self.top_n = top_n or settings.profile_top_n
+        self.memory = settings.profile_memory if memory is None else memory
+        self.cycle = 0
+        self.active = False
+        self._memory_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+        self._stats = {'profiled_cycles': 0, 'profiled_stages': 0}
+
+    def request(self, cycles: int = None) -> None:
+        """Profile the next cycles (settings.profile_signal_cycles by default)"""
+        with self._lock:
+            self.requested += cycles or settings.profile_signal_cycles
+
+    def install_signal_handler(self) -> None:
+        """Profile the next cycles whenever the process receives SIGUSR1"""
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.request())
+
+    def begin_cycle(self) -> bool:
+        """Decide whether the cycle that starts now is profiled"""
+        self.cycle += 1
+        with self._lock:
+            self.active = self.requested > 0
+            if self.active:
+                self.requested -= 1
+        if self.active and self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.profile_memory_frames)
+        return self.active
+
+    @contextmanager
+    def stage(self, name: str):
+        """Run a stage of the current cycle under cProfile if the cycle is profiled"""
+        if not self.active:
+            yield
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._report_stage(name, profile)
+
+    def end_cycle(self) -> None:
+        """Diff the heap against the previous profiled cycle; stop tracemalloc when nothing more is requested"""
+        if self.active:
+            with self._lock:
+                self._stats['profiled_cycles'] += 1
+            if tracemalloc.is_tracing():
+                self._report_memory(tracemalloc.take_snapshot())
+        self.active = False
+        with self._lock:
+            done = self.requested <= 0
+        if done and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            self._memory_snapshot = None
+
+    def _report_stage(self, name: str, profile: cProfile.Profile) -> None:
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, f"cycle-{self.cycle:06d}-{name}.prof")
+            profile.dump_stats(path)
+            stats = pstats.Stats(profile).sort_stats(settings.profile_sort)
+            logger.info("Profiled cycle stage", cycle=self.cycle, stage=name, path=path,
+                        total_seconds=round(stats.total_tt, 4), top=self._top_functions(stats))
+            with self._lock:
+                self._stats['profiled_stages'] += 1
+        except Exception as e:
+            logger.warning("Failed to write cycle profile", cycle=self.cycle, stage=name, error=str(e))
+
+    def _top_functions(self, stats: pstats.Stats) -> List[Dict[str, Any]]:
+        top = []
+        for function in stats.fcn_list[:self.top_n]:
+            _, calls, own_seconds, cumulative_seconds, _ = stats.stats[function]
+            filename, line, function_name = function
+            top.append({
+                'function': f"{filename}:{line}({function_name})",
+                'calls': calls,
+                'own_seconds': round(own_seconds, 4),
+                'cumulative_seconds': round(cumulative_seconds, 4)
+            })
+        return top
+
+    def _report_memory(self, snapshot: tracemalloc.Snapshot) -> None:
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        traced, peak = tracemalloc.get_traced_memory()
+        previous, self._memory_snapshot = self._memory_snapshot, snapshot
+        if previous is None:
+            logger.info("Memory baseline taken", cycle=self.cycle, traced_bytes=traced, peak_bytes=peak)
+            return
+        growth = [
+            {
+                'location': f"{difference.traceback[0].filename}:{difference.traceback[0].lineno}",
+                'size_diff_bytes': difference.size_diff,
+                'count_diff': difference.count_diff,
+                'size_bytes': difference.size
+            }
+            for difference in snapshot.compare_to(previous, 'lineno')[:self.top_n]
+            if difference.size_diff > 0
+        ]
+        logger.info("Memory growth since last profiled cycle", cycle=self.cycle,
+                    traced_bytes=traced, peak_bytes=peak, top=growth)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Cycles profiled so far and cycles still requested"""
+        with self._lock:
+            return dict(self._stats, requested_cycles=self.requested, memory_tracing=tracemalloc.is_tracing())
+
+profiler = CycleProfiler()
@@ -0,0 +1,222 @@
+import threading
+from typing import Dict, Any, List, Tuple, Callable, FrozenSet
+from utils.document import analyze_email
+from utils.keyword_matcher import KeywordMatcher
+
+QUESTIONS = "questions"  # pseudo keyword group: which of the email's question words the response contains
+
+class ReviewContext:
+    """What the rules need from the incoming email, computed once per review"""
+
+    __slots__ = ('matcher', 'sentiment', 'questions', 'question_words', 'terms')
+
+    def __init__(self, email_data: Dict[str, Any]):
+        analysis = analyze_email(email_data)
+        # Response rules of the rule set the email was analyzed with, so a review never mixes two sets
+        self.matcher: KeywordMatcher = analysis.rules.response
+        self.sentiment = analysis.sentiment
+        self.questions = analysis.questions
+        # A question counts as addressed when the response contains any of its longer words
+        self.question_words = [tuple(word for word in question.lower().split() if len(word) > 3)
+                               for question in self.questions]
+        self.terms: FrozenSet[str] = frozenset(word for words in self.question_words for word in words)
+
+class ResponseEvaluation:
+    """A response scanned once: its keyword hits, question-word presence and the check results"""
+
+    __slots__ = ('text', 'lowered', 'hits', 'present', 'checks')
+
+    def __init__(self, text: str, lowered: str, hits: Dict[str, List[str]], present: Dict[str, bool],
+                 checks: Dict[str, Dict[str, Any]] = None):
+        self.text = text
+        self.lowered = lowered
+        self.hits = hits
+        self.present = present
+        self.checks = checks or {}
+
+    def addressed(self, words: Tuple[str, ...]) -> bool:
+        return any(self.present[word] for word in words)
+
+    def unaddressed_questions(self, context: ReviewContext) -> List[str]:
+        return [question for question, words in zip(context.questions, context.question_words)
+                if not self.addressed(words)]
+
+    @property
+    def sentiment(self) -> str:
+        positive_count = len(self.hits['positive'])
+        negative_count = len(self.hits['negative'])
+        if positive_count > negative_count:
+            return 'positive'
+        elif negative_count > positive_count:
+            return 'negative'
+        return 'neutral'
+
+def check_grammar_spelling(evaluation: ResponseEvaluation, context: ReviewContext) -> Dict[str, Any]:
+    """Check for grammar and spelling errors"""
+    errors = evaluation.hits['spelling_errors']
+    return {
+        'passed': len(errors) == 0,
+        'score': max(0, 1 - (len(errors) * 0.2)),
+        'issues': [f"Potential spelling error: {indicator}" for indicator in errors]
+    }
+
+def check_tone_appropriateness(evaluation: ResponseEvaluation, context: ReviewContext) -> Dict[str, Any]:
+    """Check if tone is appropriate for the email context"""
+    response_sentiment = evaluation.sentiment
+    if context.sentiment == 'negative' and response_sentiment == 'positive':
+        return {'passed': True, 'score': 0.9, 'issues': []}
+    elif context.sentiment == 'positive' and response_sentiment == 'negative':
+        return {'passed': False, 'score': 0.3, 'issues': ['Response tone does not match email sentiment']}
+    return {'passed': True, 'score': 0.8, 'issues': []}
+
+def check_content_completeness(evaluation: ResponseEvaluation, context: ReviewContext) -> Dict[str, Any]:
+    """Check if response addresses all questions in the email"""
+    addressed = sum(1 for words in context.question_words if evaluation.addressed(words))
+    completeness_score = addressed / len(context.questions) if context.questions else 1.0
+    return {
+        'passed': completeness_score >= 0.8,
+        'score': completeness_score,
+        'issues': [] if completeness_score >= 0.8 else ['Not all questions addressed']
+    }
+
+def check_brand_voice(evaluation: ResponseEvaluation, context: ReviewContext) -> Dict[str, Any]:
+    """Check if response maintains brand voice"""
+    violations = [f"Brand voice violation: {violation}" for violation in evaluation.hits['brand_violations']]
+    return {
+        'passed': len(violations) == 0,
+        'score': max(0, 1 - (len(violations) * 0.3)),
+        'issues': violations
+    }
+
+def check_accuracy(evaluation: ResponseEvaluation, context: ReviewContext) -> Dict[str, Any]:
+    """Check for promises and statements the response should not make"""
+    hits = evaluation.hits
+    inaccuracies = []
+    if hits['guarantee'] and hits['service']:
+        inaccuracies.append("Making service guarantees without authority")
+    if hits['support_hours']:
+        inaccuracies.append("Incorrect information about support hours")
+    return {
+        'passed': len(inaccuracies) == 0,
+        'score': max(0, 1 - (len(inaccuracies) * 0.5)),
+        'issues': inaccuracies
+    }
+
+def check_professionalism(evaluation: ResponseEvaluation, context: ReviewContext) -> Dict[str, Any]:
+    """Check for professionalism"""
+    violations = [f"Unprofessional phrase: {phrase}" for phrase in evaluation.hits['unprofessional']]
+    return {
+        'passed': len(violations) == 0,
+        'score': max(0, 1 - (len(violations) * 0.3)),
+        'issues': violations
+    }
+
+def check_action_clarity(evaluation: ResponseEvaluation, context: ReviewContext) -> Dict[str, Any]:
+    """Check if response has clear action items"""
+    has_action_items = bool(evaluation.hits['action_items'])
+    return {
+        'passed': has_action_items,
+        'score': 0.9 if has_action_items else 0.5,
+        'issues': [] if has_action_items else ['No clear action items']
+    }
+
+# check name -> (keyword groups it reads, rule); a rule is re-run only when one of its groups changes
+QUALITY_RULES: Dict[str, Tuple[Tuple[str, ...], Callable[[ResponseEvaluation, ReviewContext], Dict[str, Any]]]] = {
+    'grammar_spelling': (('spelling_errors',), check_grammar_spelling),
+    'tone_appropriateness': (('positive', 'negative'), check_tone_appropriateness),
+    'content_completeness': ((QUESTIONS,), check_content_completeness),
+    'brand_voice': (('brand_violations',), check_brand_voice),
+    'accuracy': (('guarantee', 'service', 'support_hours'), check_accuracy),
+    'professionalism': (('unprofessional',), check_professionalism),
+    'action_clarity': (('action_items',), check_action_clarity)
+}
+
+def _common_length(a: str, b: str, part: Callable[[str, int], str]) -> int:
+    """Longest length whose part (prefix or suffix) is equal in a and b, by binary search over C-level compares"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if part(a, middle) == part(b, middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+class QualityRuleEngine:
+    """Evaluates every quality rule from one scan of the response, and re-checks edits incrementally.
+
+    evaluate() lowercases and scans the response once, and then every rule
+    reads the shared hits. revise() compares the edited response with the
+    evaluated one. Only a keyword occurrence that overlaps the changed span
+    can appear or disappear, so the engine scans that span plus a margin of
+    the longest keyword, updates only the groups found there and re-runs only
+    the rules that read those groups.
+    """
+
+    def __init__(self, matcher: KeywordMatcher = None, rules: Dict[str, Tuple] = None):
+        self.matcher = matcher  # None: the response rules of each review's context
+        self.rules = rules or QUALITY_RULES
+        self._lock = threading.Lock()
+        self._stats = {'evaluations': 0, 'revisions': 0, 'rules_evaluated': 0, 'rules_skipped': 0}
+
+    def evaluate(self, text: str, context: ReviewContext) -> ResponseEvaluation:
+        """Scan a response once and run every rule"""
+        lowered = text.lower()
+        matcher = self.matcher or context.matcher
+        evaluation = ResponseEvaluation(
+            text, lowered, matcher.match_lowered(lowered), {word: word in lowered for word in context.terms}
+        )
+        evaluation.checks = {name: rule(evaluation, context) for name, (_, rule) in self.rules.items()}
+        self._count('evaluations', len(self.rules), 0)
+        return evaluation
+
+    def revise(self, evaluation: ResponseEvaluation, text: str, context: ReviewContext) -> ResponseEvaluation:
+        """Evaluate an edited response, re-running only the rules the edit can affect"""
+        old, new = evaluation.lowered, text.lower()
+        if new == old:
+            return ResponseEvaluation(text, new, evaluation.hits, evaluation.present, evaluation.checks)
+
+        # Changed span: everything between the common prefix and the common suffix
+        prefix = _common_length(old, new, lambda text, length: text[:length])
+        suffix = _common_length(old[prefix:], new[prefix:], lambda text, length: text[len(text) - length:])
+        matcher = self.matcher or context.matcher
+        margin = max([matcher.max_length - 1] + [len(word) - 1 for word in context.terms])
+        # Both sides of the edit in one scan; no keyword contains the separator
+        windows = (old[max(0, prefix - margin):len(old) - suffix + margin] + "\0"
+                   + new[max(0, prefix - margin):len(new) - suffix + margin])
+
+        changed_groups = {name for keyword in matcher.find_lowered(windows) for name in matcher.owners(keyword)}
+        hits = dict(evaluation.hits)
+        for name in changed_groups:
+            hits[name] = [keyword for keyword in matcher.keyword_sets[name] if keyword in new]
+
+        changed_words = [word for word in context.terms if word in windows]
+        present = evaluation.present
+        if changed_words:
+            present = dict(present)
+            present.update((word, word in new) for word in changed_words)
+            changed_groups.add(QUESTIONS)
+
+        revised = ResponseEvaluation(text, new, hits, present)
+        evaluated = 0
+        for name, (groups, rule) in self.rules.items():
+            if changed_groups.intersection(groups):
+                revised.checks[name] = rule(revised, context)
+                evaluated += 1
+            else:
+                revised.checks[name] = evaluation.checks[name]
+        self._count('revisions', evaluated, len(self.rules) - evaluated)
+        return revised
+
+    def _count(self, kind: str, evaluated: int, skipped: int) -> None:
+        with self._lock:
+            self._stats[kind] += 1
+            self._stats['rules_evaluated'] += evaluated
+            self._stats['rules_skipped'] += skipped
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Rule evaluations saved by incremental re-checks"""
+        with self._lock:
+            return dict(self._stats)
+
+quality_engine = QualityRuleEngine()
@@ -0,0 +1,236 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: without NumPy only the exact-match tier is used
+    np = None
+
+from config.settings import settings
+from utils.logger import get_logger
+from utils.text_classifier import feature_hash
+
+logger = get_logger(__name__)
+
+ANY_CATEGORY = "*"
+
+# Namespaces whose outputs are built from retrieved knowledge
+KNOWLEDGE_NAMESPACES = frozenset({'response'})
+
+STOPWORDS = frozenset(
+    "a an the i me my we our you your to of in on for and or is are was were be been am it this that "
+    "since can could would will with from at by as do does did have has had please hi hello thanks thank "
+    "again get".split()
+)
+SUFFIXES = ('ing', 'ed', 'es', 's')
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+@lru_cache(maxsize=1 << 17)
+def _stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+def content_words(text: str) -> List[str]:
+    """Lowercased words with stopwords dropped and crude stemming"""
+    return [_stem(word) for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+
+def hashed_embedding(text: str, dimensions: int = None) -> "np.ndarray":
+    """Local embedding: signed hashed content words (stopwords dropped, crude stemming), L2-normalized.
+
+    This is lexical similarity: it catches re-sent and lightly edited emails
+    and only close paraphrases. A sentence-embedding model can be passed to
+    LLMResponseCache as ``embedder`` instead.
+    """
+    dimensions = dimensions or settings.semantic_cache_dimensions
+    words = content_words(text)
+
+    vector = np.zeros(dimensions, dtype=np.float32)
+    if words:
+        hashes = np.fromiter(map(feature_hash, words), dtype=np.uint32, count=len(words))
+        signs = np.where(hashes & np.uint32(0x80000000), 1.0, -1.0).astype(np.float32)
+        np.add.at(vector, (hashes % np.uint32(dimensions)).astype(np.int64), signs)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+    return vector
+
+class SemanticIndex:
+    """Brute-force cosine index over unit vectors: one matrix-vector product per lookup"""
+
+    def __init__(self, dimensions: int):
+        self.vectors = np.zeros((16, dimensions), dtype=np.float32)
+        self.keys: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self.dead = 0
+
+    def add(self, key: str, vector: "np.ndarray") -> None:
+        if len(self.keys) == len(self.vectors):
+            self.vectors = np.vstack([self.vectors, np.zeros_like(self.vectors)])
+        self.rows[key] = len(self.keys)
+        self.vectors[len(self.keys)] = vector
+        self.keys.append(key)
+
+    def remove(self, key: str) -> None:
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        self.vectors[row] = 0.0  # a zero vector never clears the threshold
+        self.keys[row] = None
+        self.dead += 1
+        if self.dead > len(self.keys) // 2:
+            self._compact()
+
+    def search(self, vector: "np.ndarray") -> Tuple[Optional[str], float]:
+        if not self.rows:
+            return None, 0.0
+        similarities = self.vectors[:len(self.keys)] @ vector
+        row = int(similarities.argmax())
+        return self.keys[row], float(similarities[row])
+
+    def _compact(self) -> None:
+        live = [row for row, key in enumerate(self.keys) if key is not None]
+        vectors = self.vectors[live]
+        self.vectors = np.zeros((max(16, len(live) * 2), self.vectors.shape[1]), dtype=np.float32)
+        self.vectors[:len(live)] = vectors
+        self.keys = [self.keys[row] for row in live]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        self.dead = 0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+class LLMResponseCache:
+    """Cache of LLM outputs with an exact tier (prompt hash) and a semantic tier (embedding similarity).
+
+    Entries belong to a namespace ('categorization', 'response') and a
+    category. The exact tier matches the full prompt and model. The semantic
+    tier compares the embedding of the query text (the email, without
+    instructions or knowledge) against earlier queries in the same namespace
+    and category, and it hits at ``semantic_cache_threshold``. Eviction is
+    LRU over all entries plus a TTL. Entries built from an older
+    ``knowledge_base_version`` never hit. Neither do 'response' entries
+    built before the knowledge index last changed: the index reports its
+    version through set_knowledge_index_version(), and entries are stamped
+    with it.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: float = None, threshold: float = None,
+                 embedder: Callable[[str], "np.ndarray"] = None, enabled: bool = None):
+        self.max_entries = max_entries or settings.semantic_cache_max_entries
+        self.ttl_seconds = ttl_seconds or settings.semantic_cache_ttl_seconds
+        self.threshold = settings.semantic_cache_threshold if threshold is None else threshold
+        self.embedder = embedder or (hashed_embedding if np is not None else None)
+        self.enabled = settings.semantic_cache_enabled if enabled is None else enabled
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._indexes: Dict[Tuple[str, str], SemanticIndex] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self.knowledge_index_version = ""
+
+    def set_knowledge_index_version(self, version: str) -> None:
+        """Called by the knowledge index when its content changes; older 'response' entries stop hitting"""
+        self.knowledge_index_version = version
+
+    def _knowledge_version(self, namespace: str) -> str:
+        if namespace in KNOWLEDGE_NAMESPACES:
+            return f"{settings.knowledge_base_version}:{self.knowledge_index_version}"
+        return settings.knowledge_base_version
+
+    @staticmethod
+    def prompt_key(namespace: str, prompt: str, model: str = None) -> str:
+        text = f"{namespace}\0{model or settings.model_name}\0{prompt}"
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, namespace: str, prompt: str, query_text: str = None,
+            category: str = ANY_CATEGORY) -> Optional[Any]:
+        """Return a cached output for the prompt, or for a near-identical query in the same category"""
+        if not self.enabled:
+            return None
+
+        key = self.prompt_key(namespace, prompt)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is not None:
+                self._count(namespace, 'exact_hits', entry['latency'])
+                return entry['value']
+
+            if query_text and self.embedder is not None:
+                index = self._indexes.get((namespace, category))
+                if index is not None and len(index):
+                    match, similarity = index.search(self.embedder(query_text))
+                    if match is not None and similarity >= self.threshold:
+                        entry = self._live_entry(match)
+                        if entry is not None:
+                            self._count(namespace, 'semantic_hits', entry['latency'])
+                            return entry['value']
+
+            self._count(namespace, 'misses')
+            return None
+
+    def put(self, namespace: str, prompt: str, value: Any, query_text: str = None,
+            category: str = ANY_CATEGORY, latency_seconds: float = 0.0) -> None:
+        """Store an LLM output together with how long it took to produce"""
+        if not self.enabled:
+            return
+
+        key = self.prompt_key(namespace, prompt)
+        vector = self.embedder(query_text) if query_text and self.embedder is not None else None
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {
+                'namespace': namespace,
+                'category': category,
+                'value': value,
+                'latency': latency_seconds,
+                'expires_at': time.time() + self.ttl_seconds,
+                'knowledge_version': self._knowledge_version(namespace)
+            }
+            if vector is not None:
+                index = self._indexes.setdefault((namespace, category), SemanticIndex(len(vector)))
+                index.add(key, vector)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Hit rates per tier and the LLM latency that cache hits saved"""
+        with self._lock:
+            namespaces = {}
+            for namespace, stats in self._stats.items():
+                lookups = stats['exact_hits'] + stats['semantic_hits'] + stats['misses']
+                namespaces[namespace] = dict(stats, hit_rate=(
+                    (stats['exact_hits'] + stats['semantic_hits']) / lookups if lookups else 0.0
+                ))
+            return {'namespaces': namespaces, 'entries': len(self._entries)}
+
+    def _live_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry['expires_at'] <= time.time() or entry['knowledge_version'] != self._knowledge_version(entry['namespace']):
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            index = self._indexes.get((entry['namespace'], entry['category']))
+            if index is not None:
+                index.remove(key)
+
+    def _count(self, namespace: str, outcome: str, latency: float = 0.0) -> None:
+        stats = self._stats.setdefault(
+            namespace, {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0, 'latency_saved_seconds': 0.0}
+        )
+        stats[outcome] += 1
+        stats['latency_saved_seconds'] += latency
+
+llm_response_cache = LLMResponseCache()
@@ -0,0 +1,193 @@
+import functools
+import random
+import threading
+import time
+from typing import Dict, Any, Callable, Iterable, TypeVar
+from config.settings import settings
+from utils.logger import get_logger
+from utils.error_handlers import CircuitOpenError, is_retryable, retry_after
+
+logger = get_logger(__name__)
+
+T = TypeVar('T')
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class RetryPolicy:
+    """How often and how long to retry one service, and when its breaker opens"""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float, max_elapsed: float,
+                 failure_threshold: int, reset_seconds: float):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+    @classmethod
+    def for_service(cls, service: str) -> "RetryPolicy":
+        """settings.retry_policy_defaults overridden by settings.retry_policies[service]"""
+        return cls(**dict(settings.retry_policy_defaults, **settings.retry_policies.get(service, {})))
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter, so callers that failed together do not retry together"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+class CircuitBreaker:
+    """Stops calling a service that keeps failing, and probes it again after a pause.
+
+    failure_threshold consecutive transient failures open the breaker, and
+    calls then fail fast with CircuitOpenError for reset_seconds (or for as
+    long as the service's Retry-After asked, if that is longer). After
+    that one probe call is let through (half open). If it succeeds the
+    breaker closes, and if it fails the breaker opens again.
+    """
+
+    def __init__(self, service: str, policy: RetryPolicy):
+        self.service = service
+        self.policy = policy
+        self.state = CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self._stats = {'opened': 0, 'short_circuited': 0}
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless the service may be called now"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() >= self.open_until:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self._stats['short_circuited'] += 1
+            remaining = max(0.0, self.open_until - time.monotonic())
+        raise CircuitOpenError(f"{self.service} is unavailable, circuit open for another {remaining:.0f}s")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("Circuit closed", service=self.service)
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, open_for: float = None) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.policy.failure_threshold or open_for:
+                if self.state != OPEN:
+                    self._stats['opened'] += 1
+                    logger.warning("Circuit opened", service=self.service, failures=self.failures,
+                                   seconds=max(self.policy.reset_seconds, open_for or 0))
+                self.state = OPEN
+                self.open_until = time.monotonic() + max(self.policy.reset_seconds, open_for or 0)
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, state=self.state, state_code=STATE_CODES[self.state],
+                        consecutive_failures=self.failures)
+
+class RetryEngine:
+    """Retries transient failures of external services and keeps a circuit breaker per service.
+
+    Whether an error is worth retrying comes from utils.error_handlers.is_retryable,
+    the same rule handle_error reports as ``retryable``. A retry waits for
+    the server's Retry-After if it sent one, and otherwise for an
+    exponential backoff with jitter. No retry is made past the policy's
+    max_attempts or max_elapsed, or when Retry-After asks for more than
+    max_delay; the breaker then stays open that long instead. Client errors
+    show the service is up and do not count against its breaker.
+    """
+
+    def __init__(self):
+        self.policies: Dict[str, RetryPolicy] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def breaker(self, service: str) -> CircuitBreaker:
+        with self._lock:
+            if service not in self.breakers:
+                self.policies[service] = RetryPolicy.for_service(service)
+                self.breakers[service] = CircuitBreaker(service, self.policies[service])
+                self._stats[service] = {'calls': 0, 'retries': 0, 'failures': 0, 'recovered': 0}
+            return self.breakers[service]
+
+    def call(self, service: str, operation: str, fn: Callable[[], T], idempotent: bool = True) -> T:
+        """Run fn under the service's retry policy and circuit breaker"""
+        breaker = self.breaker(service)
+        policy = self.policies[service]
+        stats = self._stats[service]
+        started = time.monotonic()
+        attempt = 0
+        self._count(stats, 'calls')
+        while True:
+            attempt += 1
+            breaker.before_call()
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    # The service answered; the request itself was wrong
+                    breaker.record_success()
+                    self._count(stats, 'failures')
+                    raise
+                wait = retry_after(e)
+                breaker.record_failure(open_for=wait if wait is not None and wait > policy.max_delay else None)
+                delay = policy.backoff(attempt) if wait is None else wait
+                if (not is_retryable(e, idempotent) or attempt >= policy.max_attempts or breaker.is_open
+                        or delay > policy.max_delay or time.monotonic() - started + delay > policy.max_elapsed):
+                    self._count(stats, 'failures')
+                    raise
+                self._count(stats, 'retries')
+                logger.warning("Retrying service call", service=service, operation=operation,
+                               attempt=attempt, delay_seconds=round(delay, 3), error=str(e))
+                time.sleep(delay)
+            else:
+                breaker.record_success()
+                if attempt > 1:
+                    self._count(stats, 'recovered')
+                return result
+
+    def _count(self, stats: Dict[str, int], key: str) -> None:
+        with self._lock:
+            stats[key] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Per service: calls, retries, failures after retries, and breaker state"""
+        with self._lock:
+            services = {service: dict(stats) for service, stats in self._stats.items()}
+            breakers = dict(self.breakers)
+        for service, breaker in breakers.items():
+            services[service].update(breaker.get_metrics())
+        return services
+
+retry_engine = RetryEngine()
+
+def with_retries(service: str, non_idempotent: Iterable[str] = ()):
+    """Retry a tool's _run(operation, **kwargs) under the service's policy and breaker.
+
+    Operations in non_idempotent (sending, creating records) are only retried
+    when the request was never processed.
+    """
+    non_idempotent = frozenset(non_idempotent)
+
+    def decorate(run):
+        @functools.wraps(run)
+        def wrapper(self, operation: str, **kwargs):
+            return retry_engine.call(service, operation, lambda: run(self, operation, **kwargs),
+                                     idempotent=operation not in non_idempotent)
+        return wrapper
+    return decorate
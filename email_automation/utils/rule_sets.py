@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+from config.settings import settings
+from utils.logger import get_logger
+from utils.rules import DEFAULT_SECTIONS, DEFAULT_RULES, RuleSet
+
+logger = get_logger(__name__)
+
+class RuleFileError(ValueError):
+    """A rule file that cannot be compiled; the rules in use stay in place"""
+
+def parse_rule_file(text: str, source: str = "rule file") -> RuleSet:
+    """Compile a JSON rule file over the built-in rules.
+
+    The file maps sections to keyword groups, e.g.
+    ``{"category": {"sales": ["pricing", "quote"]}, "email": {"sensitive": ["legal"]}}``.
+    A group in the file replaces the built-in group of that name. Sections
+    and groups the file leaves out keep their built-in keywords. Unknown
+    sections or groups are rejected, because the rules read groups by name
+    and a misspelled group would silently never match.
+    """
+    try:
+        document = json.loads(text)
+    except ValueError as e:
+        raise RuleFileError(f"{source} is not valid JSON: {e}")
+    if not isinstance(document, dict):
+        raise RuleFileError(f"{source} must be an object of sections")
+
+    sections = {name: dict(groups) for name, groups in DEFAULT_SECTIONS.items()}
+    for section, groups in document.items():
+        if section not in sections:
+            raise RuleFileError(f"Unknown rule section '{section}' in {source}")
+        if not isinstance(groups, dict):
+            raise RuleFileError(f"Rule section '{section}' in {source} must map groups to keyword lists")
+        for group, keywords in groups.items():
+            if group not in sections[section]:
+                raise RuleFileError(f"Unknown rule group '{section}.{group}' in {source}")
+            if not isinstance(keywords, list) or not all(isinstance(keyword, str) and keyword for keyword in keywords):
+                raise RuleFileError(f"Rule group '{section}.{group}' in {source} must be a list of non-empty strings")
+            sections[section][group] = keywords
+
+    return RuleSet(sections, source=source)
+
+class RuleSetStore:
+    """The rule set in use, reloaded from the rule file when it changes.
+
+    A daemon thread checks the file's modification time and size every
+    rules_reload_seconds. A changed file is parsed and compiled off the email
+    path. The new set then replaces the old one in a single reference swap.
+    Emails already analyzed keep the set they started with. A file that does
+    not parse leaves the current set in place. Without a rule file the
+    built-in rules are used.
+    """
+
+    def __init__(self, path: str = None, reload_seconds: float = None):
+        self.path = path or settings.rules_path
+        self.reload_seconds = reload_seconds or settings.rules_reload_seconds
+        self._current: RuleSet = DEFAULT_RULES
+        self._file_state: Optional[Tuple[int, int]] = None
+        self.loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stats = {'loads': 0, 'reload_failures': 0}
+
+    @property
+    def current(self) -> RuleSet:
+        return self._current
+
+    def reload(self) -> bool:
+        """Load the rule file if it changed since the last load; True when a new set was swapped in"""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+                file_state = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                file_state = None
+            if file_state == self._file_state:
+                return False
+
+            if file_state is None:
+                rule_set = DEFAULT_RULES
+            else:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as rule_file:
+                        rule_set = parse_rule_file(rule_file.read(), source=self.path)
+                except (OSError, RuleFileError) as e:
+                    # Remember the broken file so it is reported once, not on every poll
+                    self._file_state = file_state
+                    self._stats['reload_failures'] += 1
+                    logger.warning("Rule file rejected, keeping the current rules", path=self.path, error=str(e))
+                    return False
+
+            previous = self._current
+            self._file_state = file_state
+            self._current = rule_set
+            self.loaded_at = time.time()
+            self._stats['loads'] += 1
+
+        changed = [name for name, fingerprint in rule_set.fingerprints.items()
+                   if previous.fingerprints[name] != fingerprint]
+        logger.info("Rules loaded", source=rule_set.source, version=rule_set.version, changed_sections=changed)
+        return True
+
+    def start(self) -> None:
+        """Load the rule file now and watch it for changes on a daemon thread"""
+        if self._thread is not None:
+            return
+        self.reload()
+
+        def watch():
+            while not self._stop.wait(self.reload_seconds):
+                try:
+                    self.reload()
+                except Exception as e:
+                    self._stats['reload_failures'] += 1
+                    logger.warning("Rule file check failed, keeping the current rules", error=str(e))
+
+        self._thread = threading.Thread(target=watch, name="rule-set-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching the rule file"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.reload_seconds)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Rule set version in use and how reloads went"""
+        with self._lock:
+            return dict(
+                self._stats,
+                version=self._current.version,
+                source=self._current.source,
+                age_seconds=round(time.time() - self.loaded_at, 1) if self.loaded_at else None
+            )
+
+rule_sets = RuleSetStore()
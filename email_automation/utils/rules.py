@@ -0,0 +1,120 @@
+import hashlib
+import json
+from typing import Dict, List, Tuple
+from utils.keyword_matcher import KeywordMatcher
+
+# Built-in rules. A rule file (utils.rule_sets) can override any group of any section.
+
+# Categorization rules, matched over subject and body together
+CATEGORY_RULES = {
+    # Sales indicators
+    'sales': ['pricing', 'quote', 'proposal', 'demo', 'partnership', 'service', 'solution'],
+    # Customer service indicators
+    'support': ['issue', 'problem', 'help', 'support', 'bug', 'error', 'question'],
+    # Importance indicators
+    'high_importance': ['urgent', 'asap', 'immediately', 'critical', 'executive', 'ceo'],
+    # Bulk and automated mail that never needs a drafted reply
+    'auto_reply': ['out of office', 'automatic reply', 'auto-reply', 'autoreply', 'delivery status notification'],
+    'promotional': ['unsubscribe', 'newsletter', 'view in browser', 'view this email in your browser',
+                    'manage your preferences', 'no longer wish to receive', 'special offer']
+}
+
+def rule_categorization(hits: Dict[str, List[str]]) -> Tuple[str, str]:
+    """Category and importance implied by category rule hits"""
+    if hits['sales']:
+        category = "Sales"
+    elif hits['support']:
+        category = "Customer Service"
+    else:
+        category = "Other"
+
+    if hits['high_importance']:
+        importance = "High"
+    elif category in ["Sales", "Customer Service"]:
+        importance = "Medium"
+    else:
+        importance = "Low"
+
+    return category, importance
+
+AUTOMATED_SENDER_RULES = {
+    'automated_sender': ['no-reply', 'noreply', 'do-not-reply', 'donotreply', 'mailer-daemon', 'notifications@']
+}
+
+POSITIVE_WORDS = ['good', 'great', 'excellent', 'happy', 'pleased', 'thank you']
+NEGATIVE_WORDS = ['bad', 'terrible', 'awful', 'unhappy', 'disappointed', 'angry']
+
+# Keyword rules for drafted responses, matched in a single pass per response
+RESPONSE_RULES = {
+    'spelling_errors': ['teh', 'recieve', 'occured', 'seperate', 'definately'],
+    'brand_violations': ['robotic', 'overly formal', 'casual slang'],
+    'guarantee': ['guarantee'],
+    'service': ['service'],
+    'support_hours': ['24/7 support'],
+    'unprofessional': ['lol', 'omg', 'hey guys', 'what\'s up'],
+    'action_items': ['please', 'you should', 'next steps', 'we will', 'i will'],
+    'empathy': ['sorry', 'understand', 'apologize'],
+    'follow_up': ['please', 'next steps', 'will'],
+    'positive': POSITIVE_WORDS,
+    'negative': NEGATIVE_WORDS
+}
+
+# Keyword rules for incoming email bodies
+EMAIL_RULES = {
+    'sensitive': ['legal', 'lawsuit', 'complaint', 'refund', 'cancel'],
+    'scheduling': ['schedule a call', 'schedule a meeting', 'schedule a demo', 'book a call', 'book a meeting',
+                   'set up a call', 'set up a meeting', 'hop on a call', 'jump on a call', 'find a time',
+                   'your availability', 'are you available', 'available for a call', 'meeting invite',
+                   'calendar invite'],
+    'positive': POSITIVE_WORDS,
+    'negative': NEGATIVE_WORDS
+}
+
+EXECUTIVE_SENDER_RULES = {
+    'executive': ['ceo', 'executive']
+}
+
+DEFAULT_SECTIONS: Dict[str, Dict[str, List[str]]] = {
+    'category': CATEGORY_RULES,
+    'automated_senders': AUTOMATED_SENDER_RULES,
+    'response': RESPONSE_RULES,
+    'email': EMAIL_RULES,
+    'executive': EXECUTIVE_SENDER_RULES
+}
+
+class RuleSet:
+    """Every keyword rule section compiled into a matcher.
+
+    A rule set is never modified after it is built. A reload builds a new one
+    and swaps it in whole, and an email keeps the set it was analyzed with.
+    Each section has its own fingerprint, so caches of results that depend on
+    one section survive edits to the others.
+    """
+
+    def __init__(self, sections: Dict[str, Dict[str, List[str]]], source: str = "defaults"):
+        self.source = source
+        self.sections = sections
+        self.category = KeywordMatcher(sections['category'])
+        self.automated_senders = KeywordMatcher(sections['automated_senders'])
+        self.response = KeywordMatcher(sections['response'])
+        self.email = KeywordMatcher(sections['email'])
+        self.executive = KeywordMatcher(sections['executive'])
+        self.fingerprints = {
+            name: hashlib.sha1(json.dumps(groups, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+            for name, groups in sections.items()
+        }
+        self.version = hashlib.sha1(json.dumps(self.fingerprints, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+    @property
+    def categorization_fingerprint(self) -> str:
+        """Version of the rules a categorization depends on"""
+        return f"{self.fingerprints['category']}{self.fingerprints['automated_senders']}"
+
+DEFAULT_RULES = RuleSet(DEFAULT_SECTIONS)
+
+# Compiled built-in rules, for callers that do not follow rule file reloads (benchmarks, scripts)
+CATEGORY_KEYWORDS = DEFAULT_RULES.category
+AUTOMATED_SENDERS = DEFAULT_RULES.automated_senders
+RESPONSE_KEYWORDS = DEFAULT_RULES.response
+EMAIL_KEYWORDS = DEFAULT_RULES.email
+EXECUTIVE_SENDERS = DEFAULT_RULES.executive
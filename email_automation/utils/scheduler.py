@@ -0,0 +1,112 @@
+import math
+import time
+from typing import Dict, Any, Optional
+from config.settings import settings
+
+class AdaptiveScheduler:
+    """Choose the delay and batch size of the next processing cycle from the observed inbox arrival rate"""
+
+    def __init__(self,
+                 min_interval: float = None,
+                 max_interval: float = None,
+                 backoff_factor: float = None,
+                 min_batch_size: int = None,
+                 max_batch_size: int = None,
+                 smoothing: float = None):
+        self.min_interval = settings.poll_min_interval if min_interval is None else min_interval
+        self.max_interval = settings.poll_max_interval if max_interval is None else max_interval
+        self.backoff_factor = settings.poll_backoff_factor if backoff_factor is None else backoff_factor
+        self.min_batch_size = settings.batch_size if min_batch_size is None else min_batch_size
+        self.max_batch_size = max(self.min_batch_size, settings.max_batch_size if max_batch_size is None else max_batch_size)
+        self.smoothing = settings.arrival_rate_smoothing if smoothing is None else smoothing
+
+        self.arrival_rate = 0.0  # messages per second (EWMA)
+        self.inbox_backlog = 0.0  # unfetched messages in the inbox
+        self.backlog_estimate = 0.0  # inbox backlog plus work queued in the pipeline
+        self.interval = self.min_interval
+        self.batch_size = self.min_batch_size
+        self.quiet_cycles = 0
+        self.cycles = 0
+        self._last_cycle_at: Optional[float] = None
+        self._cycle_period = 0.0
+
+    def record_cycle(self, fetched: int, batch_size: int, pending: int = 0, now: float = None) -> None:
+        """Update arrival rate, backlog and next interval from the outcome of a cycle.
+
+        ``pending`` is work fetched earlier that is still queued inside the pipeline.
+        """
+        now = time.monotonic() if now is None else now
+        elapsed = now - self._last_cycle_at if self._last_cycle_at is not None else None
+        self._last_cycle_at = now
+        self._cycle_period = elapsed or 0.0
+        self.cycles += 1
+
+        saturated = fetched >= batch_size
+
+        # A saturated fetch only gives a lower bound on arrivals, so it can raise
+        # the rate estimate but never lower it
+        if elapsed and elapsed > 0:
+            observed_rate = fetched / elapsed
+            if not saturated or observed_rate > self.arrival_rate:
+                self.arrival_rate += self.smoothing * (observed_rate - self.arrival_rate)
+
+        if saturated:
+            # Whatever we did not fetch is still waiting, plus what arrived meanwhile
+            arrived = self.arrival_rate * (elapsed or 0.0)
+            self.inbox_backlog = max(float(batch_size), self.inbox_backlog - fetched + arrived)
+            # Queued work is counted once per cycle and never carried into the next inbox estimate
+            self.backlog_estimate = self.inbox_backlog + pending
+            self.quiet_cycles = 0
+            self.interval = 0.0
+        elif pending > 0:
+            # The inbox is drained but queued work remains
+            self.inbox_backlog = 0.0
+            self.backlog_estimate = float(pending)
+            self.quiet_cycles = 0
+            self.interval = 0.0
+        elif fetched == 0:
+            self.inbox_backlog = 0.0
+            self.backlog_estimate = 0.0
+            self.quiet_cycles += 1
+            base = max(self.interval, self.min_interval)
+            self.interval = min(self.max_interval, base * self.backoff_factor)
+        else:
+            self.inbox_backlog = 0.0
+            self.backlog_estimate = 0.0
+            self.quiet_cycles = 0
+            self.interval = self._interval_for_rate()
+
+        self.batch_size = self._batch_size_for_load()
+
+    def next_interval(self) -> float:
+        """Seconds to wait before the next cycle (0 while backlog remains)"""
+        return self.interval
+
+    def next_batch_size(self) -> int:
+        """Number of messages to fetch in the next cycle"""
+        return self.batch_size
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Current scheduler state for monitoring"""
+        return {
+            'poll_interval_seconds': self.interval,
+            'batch_size': self.batch_size,
+            'backlog_estimate': self.backlog_estimate,
+            'arrival_rate_per_second': self.arrival_rate,
+            'quiet_cycles': self.quiet_cycles,
+            'cycles': self.cycles
+        }
+
+    def _interval_for_rate(self) -> float:
+        """Wait roughly as long as it takes for a minimum batch to arrive"""
+        if self.arrival_rate <= 0:
+            return self.min_interval
+        interval = self.min_batch_size / self.arrival_rate
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _batch_size_for_load(self) -> int:
+        """Size the next fetch for the backlog plus arrivals expected before it runs"""
+        # Back-to-back cycles are spaced by their own duration rather than a sleep
+        horizon = self.interval if self.interval > 0 else self._cycle_period
+        expected = self.backlog_estimate + self.arrival_rate * horizon
+        return int(min(self.max_batch_size, max(self.min_batch_size, math.ceil(expected))))
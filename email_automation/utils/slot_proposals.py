@@ -0,0 +1,104 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Tuple, Optional, Iterator
+from zoneinfo import ZoneInfo
+from config.settings import settings
+from utils.busy_intervals import BusyIntervalIndex, format_time
+
+class SlotProposer:
+    """Meeting slots to offer in scheduling replies, inside working hours and free on the calendar.
+
+    A batch allocates offers round-robin, so each email gets the earliest
+    slot left before any email gets its second one, and no slot is offered
+    twice. Offered slots stay on hold for slot_offer_hold_hours, so later
+    batches do not offer them to someone else while the first recipient
+    decides. Allocated offers wait in ``pending`` until the reply for that
+    email is drafted.
+    """
+
+    def __init__(self, duration_minutes: int = None, step_minutes: int = None, slots_per_email: int = None,
+                 hold_hours: float = None, min_notice_hours: float = None):
+        self.duration = (duration_minutes or settings.meeting_duration_minutes) * 60
+        self.step = (step_minutes or settings.slot_step_minutes) * 60
+        self.slots_per_email = slots_per_email or settings.slots_per_email
+        self.hold_seconds = (hold_hours or settings.slot_offer_hold_hours) * 3600
+        self.min_notice = (settings.slot_min_notice_hours if min_notice_hours is None else min_notice_hours) * 3600
+        self._holds: List[Tuple[float, float, float]] = []  # start, end, expires_at
+        self._pending: Dict[str, Tuple[float, List[Dict[str, str]]]] = {}
+        self._lock = threading.Lock()
+        self._stats = {'batches': 0, 'requests': 0, 'slots_offered': 0, 'short_offers': 0}
+
+    def working_windows(self, start: float, end: float) -> Iterator[Tuple[float, float]]:
+        """Working-hour windows in settings.timezone that overlap [start, end), in order"""
+        tz = ZoneInfo(settings.timezone)
+        day = datetime.fromtimestamp(start, tz).date()
+        while True:
+            opens = datetime(day.year, day.month, day.day, settings.working_hours_start, tzinfo=tz).timestamp()
+            if opens >= end:
+                return
+            if day.weekday() in settings.working_days:
+                closes = datetime(day.year, day.month, day.day, settings.working_hours_end, tzinfo=tz).timestamp()
+                if max(opens, start) < min(closes, end):
+                    yield max(opens, start), min(closes, end)
+            day += timedelta(days=1)
+
+    def propose(self, index: BusyIntervalIndex, request_ids: List[str],
+                count: int = None) -> Dict[str, List[Dict[str, str]]]:
+        """Allocate non-overlapping offers for every request from one busy-interval index"""
+        count = count or self.slots_per_email
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            busy = list(zip(index.starts, index.ends)) + [(start, end) for start, end, _ in self._holds]
+            scratch = BusyIntervalIndex(index.window_start, index.window_end, busy)
+
+            offers: Dict[str, List[Dict[str, str]]] = {request_id: [] for request_id in request_ids}
+            cursor = now + self.min_notice
+            windows = list(self.working_windows(cursor, index.window_end))
+            for _ in range(count):
+                for request_id in request_ids:
+                    # Taken slots only become busy, so the next free slot is never earlier
+                    slot = self._first_free(scratch, windows, cursor)
+                    if slot is None:
+                        break
+                    cursor = slot[0]
+                    scratch.add(*slot)
+                    self._holds.append((slot[0], slot[1], now + self.hold_seconds))
+                    offers[request_id].append({'start': format_time(slot[0]), 'end': format_time(slot[1])})
+
+            for request_id, slots in offers.items():
+                self._pending[request_id] = (now + self.hold_seconds, slots)
+            self._stats['batches'] += 1
+            self._stats['requests'] += len(request_ids)
+            self._stats['slots_offered'] += sum(len(slots) for slots in offers.values())
+            self._stats['short_offers'] += sum(1 for slots in offers.values() if len(slots) < count)
+            return offers
+
+    def take(self, request_id: str) -> Optional[List[Dict[str, str]]]:
+        """Offers allocated for a request by an earlier batch, if any"""
+        with self._lock:
+            pending = self._pending.pop(request_id, None)
+            return pending[1] if pending is not None else None
+
+    def _first_free(self, index: BusyIntervalIndex, windows: List[Tuple[float, float]],
+                    cursor: float) -> Optional[Tuple[float, float]]:
+        for opens, closes in windows:
+            if closes <= cursor:
+                continue
+            slots = index.free_slots(max(opens, cursor), closes, self.duration, 1, self.step)
+            if slots:
+                return slots[0]
+        return None
+
+    def _expire(self, now: float) -> None:
+        self._holds = [hold for hold in self._holds if hold[2] > now]
+        for request_id in [request_id for request_id, (expires_at, _) in self._pending.items() if expires_at <= now]:
+            del self._pending[request_id]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Offers made per batch and slots currently on hold"""
+        with self._lock:
+            return dict(self._stats, held_slots=len(self._holds), pending_requests=len(self._pending))
+
+slot_proposer = SlotProposer()
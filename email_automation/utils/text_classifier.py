@@ -0,0 +1,250 @@
+import json
+import os
+import time
+import zlib
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # optional: without NumPy/SciPy every email falls back to the keyword rules
+    np = None
+    sparse = None
+
+from config.settings import settings
+from utils.logger import get_logger
+from utils.document import analyze_email
+
+logger = get_logger(__name__)
+
+CATEGORIES = ["Sales", "Customer Service", "Other"]
+IMPORTANCE_LEVELS = ["High", "Medium", "Low"]
+HEADS = {'category': CATEGORIES, 'importance': IMPORTANCE_LEVELS}
+
+@lru_cache(maxsize=1 << 17)
+def feature_hash(feature: str) -> int:
+    # crc32 rather than hash(): hash() is salted per process and a saved model must stay valid
+    return zlib.crc32(feature.encode('utf-8'))
+
+class HashingVectorizer:
+    """Turn emails into a sparse matrix of hashed token, bigram and keyword-rule features.
+
+    Each row is sublinear term frequency (1 + log count) with signed hashing,
+    L2-normalized. The keyword rules enter as features ('rule:sales',
+    'rule:sales:pricing', ...), so the model learns how far to trust them.
+    Tokens are hashed once each (cached); bigram hashes are combined from the
+    token hashes with array arithmetic over the whole batch.
+    """
+
+    def __init__(self, n_features: int = None):
+        self.n_features = n_features or settings.categorization_model_features
+
+    def rule_features(self, email_data: Dict[str, Any]) -> List[str]:
+        features = []
+        analysis = analyze_email(email_data)
+        for name, keywords in analysis.category_hits.items():
+            if keywords:
+                features.append(f"rule:{name}")
+                features.extend(f"rule:{name}:{keyword}" for keyword in keywords)
+        if analysis.rules.automated_senders.match(email_data.get('from', ''))['automated_sender']:
+            features.append("rule:automated_sender")
+        return features
+
+    def transform(self, emails: List[Dict[str, Any]]) -> "sparse.csr_matrix":
+        token_hashes: List[int] = []
+        token_counts: List[int] = []
+        rule_hashes: List[int] = []
+        rule_counts: List[int] = []
+
+        for email_data in emails:
+            tokens = analyze_email(email_data).tokens
+            token_hashes.extend(map(feature_hash, tokens))
+            token_counts.append(len(tokens))
+            rules = self.rule_features(email_data)
+            rule_hashes.extend(map(feature_hash, rules))
+            rule_counts.append(len(rules))
+
+        row_ids = np.arange(len(emails))
+        tokens = np.asarray(token_hashes, dtype=np.uint32)
+        token_rows = np.repeat(row_ids, token_counts)
+
+        # Bigrams: adjacent tokens of the same email, FNV-style combination of their hashes
+        same_email = token_rows[:-1] == token_rows[1:]
+        bigrams = (tokens[:-1] * np.uint32(0x01000193)) ^ tokens[1:]
+
+        hashes = np.concatenate([tokens, bigrams[same_email], np.asarray(rule_hashes, dtype=np.uint32)])
+        rows = np.concatenate([token_rows, token_rows[:-1][same_email], np.repeat(row_ids, rule_counts)])
+        columns = (hashes % np.uint32(self.n_features)).astype(np.int32)
+        signs = np.where(hashes & np.uint32(0x80000000), 1.0, -1.0).astype(np.float32)
+
+        matrix = sparse.csr_matrix((signs, (rows, columns)), shape=(len(emails), self.n_features))
+        matrix.sum_duplicates()
+        matrix.eliminate_zeros()  # colliding features with opposite signs cancel out
+
+        # Sublinear term frequency, keeping the hash sign
+        matrix.data = np.sign(matrix.data) * (1.0 + np.log(np.abs(matrix.data)))
+
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix, dtype=np.float32)
+
+class LinearModel:
+    """Softmax regression heads for category and importance sharing one weight matrix.
+
+    Both heads are scored with a single sparse-dense product ``X @ W``; the
+    columns of W are split per head afterwards.
+    """
+
+    def __init__(self, n_features: int, heads: Dict[str, List[str]] = None):
+        self.heads = heads or HEADS
+        self.n_features = n_features
+        self.slices: Dict[str, slice] = {}
+        offset = 0
+        for head, labels in self.heads.items():
+            self.slices[head] = slice(offset, offset + len(labels))
+            offset += len(labels)
+        self.weights = np.zeros((n_features, offset), dtype=np.float32)
+        self.bias = np.zeros(offset, dtype=np.float32)
+
+    def predict_proba(self, matrix) -> Dict[str, "np.ndarray"]:
+        """Per-head class probabilities, one row per email"""
+        scores = matrix @ self.weights + self.bias
+        return {head: _softmax(scores[:, columns]) for head, columns in self.slices.items()}
+
+    def fit(self, matrix, labels: Dict[str, "np.ndarray"], epochs: int = 30, learning_rate: float = 2.0,
+            l2: float = 1e-6, batch_size: int = 256, seed: int = 0) -> List[float]:
+        """Mini-batch gradient descent on the summed cross-entropy of all heads; returns loss per epoch"""
+        rng = np.random.default_rng(seed)
+        rows = matrix.shape[0]
+        targets = np.zeros((rows, self.weights.shape[1]), dtype=np.float32)
+        for head, columns in self.slices.items():
+            targets[np.arange(rows), columns.start + labels[head]] = 1.0
+
+        losses = []
+        for epoch in range(epochs):
+            step = learning_rate / (1.0 + epoch * 0.2)
+            order = rng.permutation(rows)
+            loss = 0.0
+            for start in range(0, rows, batch_size):
+                batch = order[start:start + batch_size]
+                batch_matrix = matrix[batch]
+                probabilities = self.predict_proba(batch_matrix)
+
+                gradient = np.empty((len(batch), self.weights.shape[1]), dtype=np.float32)
+                for head, columns in self.slices.items():
+                    gradient[:, columns] = probabilities[head] - targets[batch][:, columns]
+                    loss -= float(np.log(np.maximum(
+                        (probabilities[head] * targets[batch][:, columns]).sum(axis=1), 1e-12)).sum())
+
+                self.weights *= (1.0 - step * l2)
+                self.weights -= step * np.asarray(batch_matrix.T @ gradient) / len(batch)
+                self.bias -= step * gradient.mean(axis=0)
+            losses.append(loss / rows)
+        return losses
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as handle:
+            np.savez_compressed(handle, weights=self.weights, bias=self.bias,
+                                heads=np.array(json.dumps(self.heads)))
+
+    @classmethod
+    def load(cls, path: str) -> "LinearModel":
+        with np.load(path) as data:
+            model = cls(data['weights'].shape[0], json.loads(str(data['heads'])))
+            model.weights = data['weights']
+            model.bias = data['bias']
+        return model
+
+def _softmax(scores: "np.ndarray") -> "np.ndarray":
+    shifted = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+class BatchCategorizer:
+    """Score category and importance for many emails at once with the trained linear model.
+
+    The model is loaded lazily from ``categorization_model_path``. Emails it is
+    not confident about, or every email when no model (or NumPy/SciPy) is
+    available, get None so the caller falls back to the keyword rules.
+    """
+
+    def __init__(self, model_path: str = None, min_confidence: float = None):
+        self.model_path = model_path or settings.categorization_model_path
+        self.min_confidence = settings.categorization_model_min_confidence if min_confidence is None else min_confidence
+        self._model = None
+        self._vectorizer = None
+        self._load_attempted = False
+        self._stats = {'batches': 0, 'emails': 0, 'model_decisions': 0, 'rule_fallbacks': 0, 'seconds': 0.0}
+
+    @property
+    def available(self) -> bool:
+        if not self._load_attempted:
+            self._load_attempted = True
+            self._load()
+        return self._model is not None
+
+    def _load(self) -> None:
+        if np is None:
+            logger.info("NumPy/SciPy not installed, batch categorization uses keyword rules")
+            return
+        if not os.path.exists(self.model_path):
+            logger.info("No categorization model found, batch categorization uses keyword rules",
+                       path=self.model_path)
+            return
+        try:
+            self._model = LinearModel.load(self.model_path)
+            self._vectorizer = HashingVectorizer(self._model.n_features)
+            logger.info("Categorization model loaded", path=self.model_path, features=self._model.n_features)
+        except Exception as e:
+            logger.error("Failed to load categorization model", path=self.model_path, error=str(e))
+
+    def predict(self, emails: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """One categorization per email, or None where the keyword rules should decide"""
+        if not emails:
+            return []
+        if not self.available:
+            self._stats['rule_fallbacks'] += len(emails)
+            return [None] * len(emails)
+
+        started = time.perf_counter()
+        probabilities = self._model.predict_proba(self._vectorizer.transform(emails))
+        category_labels = self._model.heads['category']
+        importance_labels = self._model.heads['importance']
+        categories = probabilities['category'].argmax(axis=1)
+        importances = probabilities['importance'].argmax(axis=1)
+        confidences = np.minimum(probabilities['category'].max(axis=1), probabilities['importance'].max(axis=1))
+
+        results: List[Optional[Dict[str, Any]]] = []
+        for category_index, importance_index, confidence in zip(categories, importances, confidences):
+            if confidence < self.min_confidence:
+                results.append(None)
+                continue
+            category = category_labels[category_index]
+            importance = importance_labels[importance_index]
+            results.append({
+                'category': category,
+                'importance': importance,
+                'reasoning': f"Categorized as {category} by the batch model (confidence {confidence:.2f}). "
+                             f"Importance: {importance}",
+                'confidence': float(confidence)
+            })
+
+        decided = sum(1 for result in results if result is not None)
+        self._stats['batches'] += 1
+        self._stats['emails'] += len(emails)
+        self._stats['model_decisions'] += decided
+        self._stats['rule_fallbacks'] += len(emails) - decided
+        self._stats['seconds'] += time.perf_counter() - started
+        return results
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Share of emails the model decided and its scoring throughput"""
+        stats = dict(self._stats)
+        stats['model_loaded'] = self._model is not None
+        stats['emails_per_second'] = stats['emails'] / stats['seconds'] if stats['seconds'] else 0.0
+        return stats
+
+batch_categorizer = BatchCategorizer()
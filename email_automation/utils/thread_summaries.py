@@ -0,0 +1,114 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List
+from config.settings import settings
+from utils.tokenizer import count_tokens
+
+def summarize_message(message: Dict[str, Any]) -> str:
+    """One thread message's contribution to the thread summary"""
+    return f"From: {message.get('from', '')}\nSubject: {message.get('subject', '')}\nBody: {message.get('snippet', '')}"
+
+class ThreadSummaryStore:
+    """Per-thread message summaries, extended incrementally as replies arrive.
+
+    Each summarized message is one row keyed by (thread_id, position), so a
+    new reply only renders and inserts the messages after the stored last
+    message ID. If that ID no longer appears in the thread (e.g. a message
+    was deleted), the thread is rebuilt. An in-memory LRU of recent threads
+    sits in front of SQLite.
+    """
+
+    def __init__(self, path: str = None, memory_threads: int = None):
+        self.path = path or settings.thread_summary_path
+        self.memory_threads = memory_threads or settings.thread_summary_memory_threads
+        self._memory: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {'lookups': 0, 'up_to_date': 0, 'appended_messages': 0, 'rebuilt_threads': 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_summaries ("
+                "thread_id TEXT NOT NULL, position INTEGER NOT NULL, message_id TEXT NOT NULL, "
+                "summary TEXT NOT NULL, tokens INTEGER NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (thread_id, position)) WITHOUT ROWID"
+            )
+            self._conn = conn
+        return self._conn
+
+    def entries_for(self, thread_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Summary entries ({'message_id', 'summary', 'tokens'}) for a thread, oldest first"""
+        if not thread_id or not messages:
+            return []
+
+        with self._lock:
+            self._stats['lookups'] += 1
+            entries = self._load(thread_id)
+            message_ids = [message.get('id') for message in messages]
+
+            if entries and entries[-1]['message_id'] in message_ids:
+                start = message_ids.index(entries[-1]['message_id']) + 1
+                if start == len(messages):
+                    self._stats['up_to_date'] += 1
+                    return list(entries)
+            else:
+                if entries:
+                    self._stats['rebuilt_threads'] += 1
+                entries, start = [], 0
+
+            new_entries = []
+            for message in messages[start:]:
+                summary = summarize_message(message)
+                new_entries.append({'message_id': message.get('id'), 'summary': summary, 'tokens': count_tokens(summary)})
+            self._append(thread_id, len(entries), new_entries, replace=start == 0)
+            self._stats['appended_messages'] += len(new_entries)
+
+            entries = entries + new_entries
+            self._remember(thread_id, entries)
+            return list(entries)
+
+    def _load(self, thread_id: str) -> List[Dict[str, Any]]:
+        entries = self._memory.get(thread_id)
+        if entries is not None:
+            self._memory.move_to_end(thread_id)
+            return entries
+
+        rows = self._connection().execute(
+            "SELECT message_id, summary, tokens FROM thread_summaries WHERE thread_id = ? ORDER BY position",
+            (thread_id,)
+        ).fetchall()
+        entries = [{'message_id': row[0], 'summary': row[1], 'tokens': row[2]} for row in rows]
+        if entries:
+            self._remember(thread_id, entries)
+        return entries
+
+    def _append(self, thread_id: str, offset: int, entries: List[Dict[str, Any]], replace: bool) -> None:
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            if replace:
+                conn.execute("DELETE FROM thread_summaries WHERE thread_id = ?", (thread_id,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO thread_summaries "
+                "(thread_id, position, message_id, summary, tokens, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(thread_id, offset + i, entry['message_id'], entry['summary'], entry['tokens'], now)
+                 for i, entry in enumerate(entries)]
+            )
+
+    def _remember(self, thread_id: str, entries: List[Dict[str, Any]]) -> None:
+        self._memory[thread_id] = entries
+        self._memory.move_to_end(thread_id)
+        while len(self._memory) > self.memory_threads:
+            self._memory.popitem(last=False)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Lookups served without new work vs. messages summarized"""
+        return dict(self._stats, cached_threads=len(self._memory))
+
+thread_summaries = ThreadSummaryStore()
@@ -0,0 +1,23 @@
+import re
+
+# Words and single punctuation marks approximate BPE tokens for English text;
+# every further 8 characters of a long word count as one more token.
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+LONG_WORD_PIECE = re.compile(r"\w{8}(?=\w)")
+
+def count_tokens(text: str) -> int:
+    """Fast local token count for budgeting prompts (no model vocabulary needed)"""
+    return len(TOKEN_PATTERN.findall(text)) + len(LONG_WORD_PIECE.findall(text))
+
+def truncate_tokens(text: str, limit: int, marker: str = " [truncated]") -> str:
+    """Keep the head of text up to limit tokens"""
+    if count_tokens(text) <= limit:
+        return text
+
+    used, end = 0, 0
+    for match in TOKEN_PATTERN.finditer(text):
+        used += 1 + (len(match.group(0)) - 1) // 8
+        if used > limit:
+            break
+        end = match.end()
+    return (text[:end].rstrip() + marker).lstrip()
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Callable
+import requests
+import structlog
+from config.settings import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class Span:
+    """One timed operation of a trace, with attributes such as the API operation and payload size"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'start', 'end', 'attributes', 'status')
+
+    recording = True
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes
+        self.status = "ok"
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start / 1e9,
+            'duration_ms': round((self.end - self.start) / 1e6, 3),
+            'status': self.status,
+            'attributes': self.attributes
+        }
+
+class NullSpan:
+    """Stands in for spans of unsampled traces, and for spans opened outside any trace"""
+
+    recording = False
+
+    def set(self, **attributes) -> None:
+        pass
+
+NULL_SPAN = NullSpan()
+
+_current_span: ContextVar[Optional[Any]] = ContextVar('current_span', default=None)
+
+def payload_size(value: Any, depth: int = 3) -> int:
+    """Approximate payload size in characters: strings and bytes by length, containers summed"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if depth == 0:
+        return 0
+    if isinstance(value, dict):
+        return sum(payload_size(item, depth - 1) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(item, depth - 1) for item in value)
+    return 0
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+def to_otlp(spans: List[Span]) -> Dict[str, Any]:
+    """Spans as an OTLP/HTTP JSON ExportTraceServiceRequest"""
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': settings.trace_service_name}}]},
+        'scopeSpans': [{
+            'scope': {'name': 'email_automation'},
+            'spans': [{
+                'traceId': span.trace_id,
+                'spanId': span.span_id,
+                'parentSpanId': span.parent_id or "",
+                'name': span.name,
+                'kind': 1,
+                'startTimeUnixNano': str(span.start),
+                'endTimeUnixNano': str(span.end),
+                'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in span.attributes.items()],
+                'status': {'code': 1 if span.status == "ok" else 2}
+            } for span in spans]
+        }]
+    }]}
+
+class _Scope:
+    """Context manager that makes a span current for its block and finishes it on exit"""
+
+    __slots__ = ('tracer', 'span', 'token', 'log_context')
+
+    def __init__(self, tracer: "Tracer", span: Any, bind_logs: bool = False):
+        self.tracer = tracer
+        self.span = span
+        self.token = None
+        self.log_context = None
+        if bind_logs and span.recording:
+            self.log_context = structlog.contextvars.bound_contextvars(trace_id=span.trace_id)
+
+    def __enter__(self):
+        self.token = _current_span.set(self.span)
+        if self.log_context is not None:
+            self.log_context.__enter__()
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        _current_span.reset(self.token)
+        if self.log_context is not None:
+            self.log_context.__exit__(exc_type, exc, traceback)
+        if self.span.recording:
+            if exc_type is not None:
+                self.span.status = "error"
+                self.span.attributes['error.type'] = exc_type.__name__
+            self.tracer._finish(self.span)
+        return False
+
+class _NoScope:
+    """Context manager for spans that are not recorded and leave the current span as it is"""
+
+    def __enter__(self):
+        return NULL_SPAN
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+NO_SCOPE = _NoScope()
+
+class Tracer:
+    """Per-email traces of nested spans across agents, tools and LLM calls.
+
+    trace(key) opens the root span of a trace. The trace ID is derived from
+    the key (the email ID), so the fast path, categorization, the rest of
+    the pipeline and sending all land in one trace although they run at
+    different points of a cycle. span() opens a child of the current span.
+    The current span lives in a context variable, so nested calls need no
+    extra arguments. Log lines written inside a sampled trace carry its
+    trace_id.
+
+    Sampling is decided once per trace from the trace ID, at
+    trace_sample_rate. Spans of unsampled traces, and spans outside any
+    trace, are not recorded, and opening them costs one context variable
+    read. Finished spans are buffered and exported in batches every
+    trace_export_seconds by a daemon thread, as JSON lines to
+    trace_export_path and/or as OTLP/HTTP JSON to trace_otlp_endpoint.
+    """
+
+    def __init__(self, enabled: bool = None, sample_rate: float = None, export_path: str = None,
+                 otlp_endpoint: str = None):
+        self.enabled = settings.tracing_enabled if enabled is None else enabled
+        self.sample_rate = settings.trace_sample_rate if sample_rate is None else sample_rate
+        self.export_path = export_path if export_path is not None else settings.trace_export_path
+        self.otlp_endpoint = otlp_endpoint if otlp_endpoint is not None else settings.trace_otlp_endpoint
+        self._buffer: deque = deque()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._session = requests.Session() if self.otlp_endpoint else None
+        self._stats = {'traces': 0, 'sampled_traces': 0, 'spans': 0, 'dropped_spans': 0,
+                       'exported_spans': 0, 'export_failures': 0}
+
+    def trace(self, key: str, name: str, **attributes):
+        """Root span of the trace for key; a new trace even inside another one"""
+        if not self.enabled:
+            return NO_SCOPE
+        trace_id = hashlib.sha256(str(key).encode('utf-8')).hexdigest()[:32]
+        sampled = int(trace_id[:8], 16) < self.sample_rate * 0x100000000
+        with self._lock:
+            self._stats['traces'] += 1
+            self._stats['sampled_traces'] += sampled
+        # An unsampled root still becomes current, so its children are not attached to an outer trace
+        span = Span(trace_id, None, name, attributes) if sampled else NULL_SPAN
+        return _Scope(self, span, bind_logs=True)
+
+    def span(self, name: str, **attributes):
+        """Child of the current span, recorded only inside a sampled trace"""
+        parent = _current_span.get()
+        if parent is None or not parent.recording:
+            return NO_SCOPE
+        return _Scope(self, Span(parent.trace_id, parent.span_id, name, attributes))
+
+    def current_span(self):
+        return _current_span.get() or NULL_SPAN
+
+    def propagate(self, fn: Callable) -> Callable:
+        """Run fn (e.g. in a thread pool) as a child of the current span"""
+        parent = _current_span.get()
+        if parent is None or not parent.recording:
+            return fn
+
+        def run(*args, **kwargs):
+            token = _current_span.set(parent)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _current_span.reset(token)
+        return run
+
+    def _finish(self, span: Span) -> None:
+        span.end = time.time_ns()
+        with self._lock:
+            if len(self._buffer) >= settings.trace_max_buffered_spans:
+                self._stats['dropped_spans'] += 1
+                return
+            self._buffer.append(span)
+            self._stats['spans'] += 1
+
+    def export(self) -> int:
+        """Write out the buffered spans; returns how many were exported"""
+        with self._lock:
+            spans = list(self._buffer)
+            self._buffer.clear()
+        if not spans:
+            return 0
+        try:
+            if self.export_path:
+                with open(self.export_path, 'a', encoding='utf-8') as export_file:
+                    export_file.write("".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans))
+            if self._session is not None:
+                response = self._session.post(self.otlp_endpoint, json=to_otlp(spans),
+                                              timeout=settings.trace_export_timeout)
+                response.raise_for_status()
+        except Exception as e:
+            with self._lock:
+                self._stats['export_failures'] += 1
+            logger.warning("Trace export failed", spans=len(spans), error=str(e))
+            return 0
+        with self._lock:
+            self._stats['exported_spans'] += len(spans)
+        return len(spans)
+
+    def start(self) -> None:
+        """Export buffered spans every trace_export_seconds on a daemon thread"""
+        if not self.enabled or self._thread is not None:
+            return
+
+        def export_loop():
+            while not self._stop.wait(settings.trace_export_seconds):
+                self.export()
+            self.export()
+
+        self._thread = threading.Thread(target=export_loop, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the exporter after a final export"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=settings.trace_export_timeout)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Traces sampled, spans recorded and exported"""
+        with self._lock:
+            return dict(self._stats, buffered_spans=len(self._buffer))
+
+tracer = Tracer()